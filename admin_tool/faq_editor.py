@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import pandas as pd
 import os
+import queue
+import threading
 import requests
 
 # -----------------------------------------------
@@ -9,8 +11,14 @@ import requests
 # -----------------------------------------------
 BACKEND_URL = os.getenv("BACKEND_HOST", "https://your-render-app.onrender.com")
 BACKEND_RELOAD_URL = f"{BACKEND_URL}/reload-faq"
-BACKEND_SAVE_URL = f"{BACKEND_URL}/update-faq"
 BACKEND_FETCH_URL = f"{BACKEND_URL}/faq-data"
+BACKEND_ENTRY_URL = f"{BACKEND_URL}/faq"
+
+# Rows requested per /faq-data page
+FETCH_PAGE_SIZE = 1000
+
+# Seconds to wait for one backend request
+REQUEST_TIMEOUT = 15
 
 # -----------------------------------------------
 # Local CSV fallback (if backend unavailable)
@@ -18,6 +26,143 @@ BACKEND_FETCH_URL = f"{BACKEND_URL}/faq-data"
 CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "faq.csv")
 
 
+class VirtualTable(tk.Frame):
+    """
+    Treeview that only materializes the rows currently on screen.
+
+    The Treeview holds one item per visible line; scrolling re-fills those
+    items from the row list instead of inserting every row, so large FAQs
+    render instantly.
+    """
+
+    def __init__(self, master, columns, row_height: int = 20):
+        """
+        Args:
+            master: Parent widget.
+            columns: (key, heading, width) of each column.
+            row_height (int): Fallback height of one line in pixels.
+        """
+        super().__init__(master)
+        self.columns = [key for key, _, _ in columns]
+        self.rows = []
+        self.dirty = set()  # id() of rows with unsaved changes
+        self.top = 0  # Index of the first visible row
+        self.visible = 15  # Number of lines that fit on screen
+        self.selected = None  # Selected row index
+        self._selecting = False
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", selectmode="browse")
+        for key, heading, width in columns:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width)
+        self.tree.tag_configure("dirty", background="#fff3c4")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or row_height)
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1))  # X11 wheel
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible))
+
+    # -------------------- DATA --------------------
+    def set_rows(self, rows):
+        """Show a new row list (kept by reference) and forget the selection."""
+        self.rows = rows
+        self.dirty = set()
+        self.top = 0
+        self.selected = None
+        self.render()
+
+    def mark_dirty(self, row: dict):
+        """Highlight a row as changed locally."""
+        self.dirty.add(id(row))
+
+    def clear_dirty(self):
+        """Remove all change highlights."""
+        self.dirty = set()
+        self.render()
+
+    # -------------------- RENDERING --------------------
+    def render(self):
+        """Fill the visible items from rows[top:top + visible]."""
+        self.top = max(0, min(self.top, len(self.rows) - self.visible))
+        window = self.rows[self.top:self.top + self.visible]
+        items = self.tree.get_children()
+        for item in items[len(window):]:
+            self.tree.delete(item)
+        for _ in range(len(items), len(window)):
+            self.tree.insert("", tk.END)
+        items = self.tree.get_children()
+
+        self._selecting = True
+        try:
+            self.tree.selection_remove(self.tree.selection())
+            for offset, (item, row) in enumerate(zip(items, window)):
+                self.tree.item(
+                    item,
+                    values=[row.get(key, "") for key in self.columns],
+                    tags=("dirty",) if id(row) in self.dirty else (),
+                )
+                if self.top + offset == self.selected:
+                    self.tree.selection_set(item)
+        finally:
+            self._selecting = False
+
+        total = max(1, len(self.rows))
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+
+    def see(self, index: int):
+        """Scroll so a row is visible and select it."""
+        if index < self.top or index >= self.top + self.visible:
+            self.top = max(0, index - self.visible // 2)
+        self.selected = index
+        self.render()
+
+    # -------------------- EVENTS --------------------
+    def on_resize(self, event):
+        """Recompute how many lines fit after the window was resized."""
+        visible = max(1, (event.height - self.row_height) // self.row_height)  # Minus the heading
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """Handle drags and clicks on the scrollbar."""
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.rows))
+            self.render()
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.visible if unit == "pages" else 1))
+
+    def scroll(self, lines: int):
+        """Scroll by a number of lines."""
+        self.top += lines
+        self.render()
+        return "break"
+
+    def on_select(self, _event):
+        """Remember the selected row index when the user clicks an item."""
+        if self._selecting:
+            return
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.top + self.tree.index(selection[0])
+
+    def move_selection(self, step: int):
+        """Move the selection with the arrow keys, scrolling when needed."""
+        if self.rows:
+            current = self.selected if self.selected is not None else self.top - step
+            self.see(max(0, min(len(self.rows) - 1, current + step)))
+        return "break"
+
+
 class FAQEditor:
     """GUI editor for managing FAQ for chatbot in real-time."""
 
@@ -27,81 +172,258 @@ class FAQEditor:
         self.root.title("FAQ Editor (Real-time)")
         self.root.geometry("700x450")
 
-        # Treeview for displaying FAQ entries
-        self.tree = ttk.Treeview(root, columns=("Question", "Answer"), show="headings", height=15)
-        self.tree.heading("Question", text="Question")
-        self.tree.heading("Answer", text="Answer")
-        self.tree.column("Question", width=250)
-        self.tree.column("Answer", width=420)
-        self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+        # Lazily rendered table of FAQ entries
+        self.table = VirtualTable(root, [("question", "Question", 250), ("answer", "Answer", 420)])
+        self.table.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+
+        # Rows as last fetched, with local edits applied
+        self.rows = []
+        # Local edits not yet sent, as /faq requests in order
+        self.pending = []
+        # Version (ETag) of the backend data the rows are based on
+        self.etag = None
+        # True when the rows came from the local CSV instead of the backend
+        self.offline = False
+
+        # Backend calls run on a worker thread; results come back through this queue
+        self.session = requests.Session()
+        self.events = queue.Queue()
+        self.busy = False
 
         # Buttons frame
         frame = tk.Frame(root)
         frame.pack(fill=tk.X, padx=8, pady=4)
 
-        tk.Button(frame, text="Add", command=self.add_entry, width=10).pack(side=tk.LEFT, padx=4)
-        tk.Button(frame, text="Edit", command=self.edit_entry, width=10).pack(side=tk.LEFT, padx=4)
-        tk.Button(frame, text="Delete", command=self.delete_entry, width=10).pack(side=tk.LEFT, padx=4)
-        tk.Button(frame, text="Save", command=self.save_to_csv_and_backend, width=20).pack(side=tk.LEFT, padx=4)
-        tk.Button(frame, text="Reload Chatbot", command=self.reload_chatbot, width=15).pack(side=tk.RIGHT, padx=4)
-        tk.Button(frame, text="Fetch from Backend", command=self.fetch_faq, width=15).pack(side=tk.RIGHT, padx=4)
+        self.buttons = [
+            tk.Button(frame, text="Add", command=self.add_entry, width=10),
+            tk.Button(frame, text="Edit", command=self.edit_entry, width=10),
+            tk.Button(frame, text="Delete", command=self.delete_entry, width=10),
+            tk.Button(frame, text="Save", command=self.save_to_csv_and_backend, width=20),
+        ]
+        for button in self.buttons:
+            button.pack(side=tk.LEFT, padx=4)
+        for text, command in (("Reload Chatbot", self.reload_chatbot), ("Fetch from Backend", self.fetch_faq)):
+            button = tk.Button(frame, text=text, command=command, width=15)
+            button.pack(side=tk.RIGHT, padx=4)
+            self.buttons.append(button)
+
+        # Status bar with progress of backend calls
+        status = tk.Frame(root)
+        status.pack(fill=tk.X, padx=8, pady=(0, 6))
+        self.status = tk.Label(status, text="", anchor="w")
+        self.status.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress = ttk.Progressbar(status, length=180, mode="determinate")
+        self.progress.pack(side=tk.RIGHT)
+
+        self.root.after(50, self.poll_events)
 
         # Load FAQ initially
         self.fetch_faq()
 
+    # -------------------- BACKGROUND TASKS --------------------
+    def run_in_background(self, title: str, task, on_done):
+        """
+        Run task(progress) on a worker thread and call on_done(result, error)
+        on the Tk thread when it finishes. Only one task runs at a time.
+        """
+        if self.busy:
+            messagebox.showinfo("Busy", "Please wait for the current operation to finish")
+            return
+        self.busy = True
+        for button in self.buttons:
+            button.config(state=tk.DISABLED)
+        self.report(title, 0, 0)
+
+        def progress(text: str, done: int = 0, total: int = 0):
+            self.events.put(("progress", (text, done, total)))
+
+        def worker():
+            try:
+                self.events.put(("done", (on_done, task(progress), None)))
+            except Exception as e:
+                self.events.put(("done", (on_done, None, e)))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def poll_events(self):
+        """Apply progress reports and results from the worker thread."""
+        try:
+            while True:
+                kind, payload = self.events.get_nowait()
+                if kind == "progress":
+                    self.report(*payload)
+                else:
+                    on_done, result, error = payload
+                    self.busy = False
+                    for button in self.buttons:
+                        button.config(state=tk.NORMAL)
+                    self.report("", 0, 0)
+                    on_done(result, error)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_events)
+
+    def report(self, text: str, done: int, total: int):
+        """Show progress in the status bar."""
+        self.status.config(text=text)
+        if total:
+            self.progress.config(mode="determinate", maximum=total, value=done)
+        else:
+            self.progress.config(value=0)
+
     # -------------------- DATA HANDLING --------------------
     def fetch_faq(self):
         """Fetch FAQ from backend or fallback to local CSV."""
-        try:
-            res = requests.get(BACKEND_FETCH_URL, timeout=5)
-            if res.status_code == 200:
-                data = res.json()
-                self.df = pd.DataFrame(data)
-            else:
-                messagebox.showwarning("Warning", f"Failed to fetch from backend: {res.status_code}")
-                self.load_data()
-        except Exception:
+        if self.pending and not messagebox.askyesno("Unsaved changes", "Discard unsaved changes and fetch again?"):
+            return
+        etag = self.etag if self.rows and not self.pending and not self.offline else None
+        self.run_in_background("Fetching FAQ...", lambda progress: self.fetch_pages(etag, progress), self.on_fetched)
+
+    def fetch_pages(self, etag, progress):
+        """
+        Download /faq-data page by page (worker thread).
+
+        The first request carries the ETag of the last fetch, so unchanged
+        data costs a single 304. If the data changes between two pages the
+        download starts over.
+
+        Returns:
+            (int, list, str): Status code, rows fetched and their ETag.
+        """
+        for _ in range(3):
+            headers = {"If-None-Match": etag} if etag else {}
+            res = self.session.get(
+                BACKEND_FETCH_URL, params={"limit": FETCH_PAGE_SIZE}, headers=headers, timeout=REQUEST_TIMEOUT
+            )
+            if res.status_code != 200:
+                return res.status_code, [], None
+            new_etag = res.headers.get("ETag")
+            page = res.json()
+            rows = page["items"]
+            while page["next_cursor"] and res.status_code == 200:
+                progress(f"Fetching FAQ... {len(rows)} rows", 0, 0)
+                res = self.session.get(
+                    BACKEND_FETCH_URL,
+                    params={"limit": FETCH_PAGE_SIZE, "cursor": page["next_cursor"]},
+                    timeout=REQUEST_TIMEOUT,
+                )
+                if res.status_code == 200:
+                    page = res.json()
+                    rows.extend(page["items"])
+            if res.status_code != 409:  # 409: changed while paging
+                return res.status_code, rows, new_etag
+        return res.status_code, [], None
+
+    def on_fetched(self, result, error):
+        """Show fetched rows, or fall back to the local CSV."""
+        if error is not None:
             self.load_data()
             messagebox.showinfo("Info", "Loaded data from local CSV instead.")
+        else:
+            status, rows, etag = result
+            if status == 304:
+                self.status.config(text="FAQ is up to date")
+                return  # Unchanged since the last fetch
+            if status == 200:
+                self.rows, self.etag, self.offline = rows, etag, False
+            else:
+                messagebox.showwarning("Warning", f"Failed to fetch from backend: {status}")
+                self.load_data()
+        self.pending = []
         self.refresh_table()
 
     def reload_chatbot(self):
         """Send request to backend to reload chatbot FAQ."""
-        try:
-            res = requests.post(BACKEND_RELOAD_URL, timeout=5)
-            if res.status_code == 200:
+        def task(progress):
+            return self.session.post(BACKEND_RELOAD_URL, timeout=REQUEST_TIMEOUT)
+
+        def done(res, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Cannot connect to backend: {error}")
+            elif res.status_code == 200:
                 messagebox.showinfo("Success", "Backend chatbot reloaded successfully!")
             else:
                 messagebox.showerror("Error", f"Backend error: {res.status_code}\n{res.text}")
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Error", f"Cannot connect to backend: {e}")
 
-    def save_to_backend(self, df: pd.DataFrame):
-        """Send FAQ data to backend."""
-        try:
-            data = df.to_dict(orient="records")
-            res = requests.post(BACKEND_SAVE_URL, json=data, timeout=5)
-            if res.status_code == 200:
-                messagebox.showinfo("Success", "FAQ sent to backend successfully!")
-                self.reload_chatbot()
+        self.run_in_background("Reloading chatbot...", task, done)
+
+    def push_changes(self, changes, progress):
+        """
+        Send local edits to the backend one entry at a time (worker thread).
+
+        Returns:
+            (int, object): Number of edits applied and the failed response
+                (None if all succeeded).
+        """
+        if self.etag:
+            # Row numbers are only valid against the version they were made on
+            res = self.session.get(
+                BACKEND_FETCH_URL, params={"limit": 1}, headers={"If-None-Match": self.etag}, timeout=REQUEST_TIMEOUT
+            )
+            if res.status_code != 304:
+                return 0, res
+        for done, change in enumerate(changes):
+            progress(f"Saving change {done + 1} of {len(changes)}...", done, len(changes))
+            op = change["op"]
+            if op == "create":
+                res = self.session.post(BACKEND_ENTRY_URL, json=change["entry"], timeout=REQUEST_TIMEOUT)
+            elif op == "update":
+                res = self.session.put(f"{BACKEND_ENTRY_URL}/{change['row']}", json=change["entry"], timeout=REQUEST_TIMEOUT)
+            else:
+                res = self.session.delete(f"{BACKEND_ENTRY_URL}/{change['row']}", timeout=REQUEST_TIMEOUT)
+            if res.status_code != 200:
+                return done, res
+            self.etag = res.json().get("etag", self.etag)
+        return len(changes), None
+
+    def save_to_backend(self):
+        """Send the pending edits to the backend in the background."""
+        changes = list(self.pending)
+
+        def done(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Cannot connect to backend: {error}")
+                return
+            applied, failed = result
+            del self.pending[:applied]
+            if failed is None:
+                self.table.clear_dirty()
+                messagebox.showinfo("Success", f"{applied} change(s) sent to backend successfully!")
+            elif applied == 0 and failed.status_code == 200:
+                messagebox.showwarning(
+                    "Conflict", "The FAQ was changed on the backend since it was fetched.\n"
+                    "Fetch again and redo your changes."
+                )
             else:
-                messagebox.showerror("Error", f"Failed to send to backend: {res.status_code}\n{res.text}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Cannot connect to backend: {e}")
+                messagebox.showerror("Error", f"Failed to send to backend: {failed.status_code}\n{failed.text}")
+
+        self.run_in_background("Saving...", lambda progress: self.push_changes(changes, progress), done)
 
     def load_data(self):
         """Load FAQ from local CSV."""
         if os.path.exists(CSV_PATH):
-            self.df = pd.read_csv(CSV_PATH, dtype=str).fillna("")
+            self.rows = pd.read_csv(CSV_PATH, dtype=str).fillna("").to_dict(orient="records")
         else:
-            self.df = pd.DataFrame(columns=["question", "answer"])
+            self.rows = []
+        self.etag = None
+        self.offline = True
 
     def refresh_table(self):
-        """Refresh Treeview table with current DataFrame."""
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-        for _, row in self.df.iterrows():
-            self.tree.insert("", tk.END, values=(row["question"], row["answer"]))
+        """Show the current rows in the table."""
+        self.table.set_rows(self.rows)
+        self.status.config(text=f"{len(self.rows)} entries" + (" (local CSV)" if self.offline else ""))
+
+    def record_change(self, change: dict):
+        """Queue an edit for the backend, merging repeated edits of one row."""
+        last = self.pending[-1] if self.pending else None
+        if change["op"] == "update" and last and last["op"] in ("create", "update") and (
+            last["op"] == "update" and last["row"] == change["row"]
+            or last["op"] == "create" and change["row"] == len(self.rows) - 1
+        ):
+            last["entry"] = change["entry"]  # Same row edited again before saving
+        else:
+            self.pending.append(change)
+        self.status.config(text=f"{len(self.pending)} unsaved change(s)")
 
     # -------------------- GUI OPERATIONS --------------------
     def add_entry(self):
@@ -110,23 +432,25 @@ class FAQEditor:
 
     def edit_entry(self):
         """Edit the selected FAQ entry."""
-        sel = self.tree.selection()
-        if not sel:
+        index = self.table.selected
+        if index is None:
             messagebox.showwarning("Warning", "Please select a row first")
             return
-        values = self.tree.item(sel[0], "values")
-        self.open_editor("Edit Question", values[0], values[1], sel[0])
+        row = self.rows[index]
+        self.open_editor("Edit Question", row["question"], row["answer"], index)
 
     def delete_entry(self):
         """Delete the selected FAQ entry."""
-        sel = self.tree.selection()
-        if not sel:
+        index = self.table.selected
+        if index is None:
             messagebox.showwarning("Warning", "Please select a row first")
             return
-        for s in sel:
-            self.tree.delete(s)
+        del self.rows[index]
+        self.record_change({"op": "delete", "row": index})
+        self.table.selected = min(index, len(self.rows) - 1) if self.rows else None
+        self.table.render()
 
-    def open_editor(self, title: str, question: str, answer: str, item=None):
+    def open_editor(self, title: str, question: str, answer: str, index=None):
         """Open a popup editor for adding/editing FAQ entries."""
         win = tk.Toplevel(self.root)
         win.title(title)
@@ -148,28 +472,52 @@ class FAQEditor:
             if not q_text or not a_text:
                 messagebox.showwarning("Warning", "Please fill in both Question and Answer")
                 return
-            if item:
-                self.tree.item(item, values=(q_text, a_text))
+            entry = {"question": q_text, "answer": a_text}
+            if index is not None:
+                row = self.rows[index]
+                row.update(entry)
+                self.record_change({"op": "update", "row": index, "entry": entry})
+                target = index
             else:
-                self.tree.insert("", tk.END, values=(q_text, a_text))
+                row = dict(entry)
+                self.rows.append(row)
+                self.record_change({"op": "create", "entry": entry})
+                target = len(self.rows) - 1
+            self.table.mark_dirty(row)
+            self.table.see(target)
             win.destroy()
 
         tk.Button(win, text="Save", command=save_close).grid(row=2, column=0, columnspan=2, pady=12)
 
     def save_to_csv_and_backend(self):
-        """Save FAQ to local CSV and send to backend."""
-        data = []
-        for row in self.tree.get_children():
-            values = self.tree.item(row, "values")
-            data.append({"question": values[0], "answer": values[1]})
-        df = pd.DataFrame(data)
-
-        # Save CSV local
-        df.to_csv(CSV_PATH, index=False, encoding="utf-8-sig")
-        messagebox.showinfo("Success", "Saved to local CSV successfully")
-
-        # Save to backend
-        self.save_to_backend(df)
+        """
+        Send unsaved changes to the backend, or save the local CSV when the
+        data was loaded from it.
+        """
+        if not self.offline:
+            if not self.pending:
+                messagebox.showinfo("Info", "No changes to save")
+                return
+            self.save_to_backend()
+            return
+
+        rows = list(self.rows)
+
+        def task(progress):
+            # Save CSV local
+            pd.DataFrame(rows, columns=None if rows else ["question", "answer"]).to_csv(
+                CSV_PATH, index=False, encoding="utf-8-sig"
+            )
+
+        def done(_result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save local CSV: {error}")
+                return
+            self.pending = []
+            self.table.clear_dirty()
+            messagebox.showinfo("Success", "Saved to local CSV successfully")
+
+        self.run_in_background("Saving local CSV...", task, done)
 
 
 if __name__ == "__main__":
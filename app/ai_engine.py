@@ -1,86 +1,950 @@
-import os
+import time
+import logging
 import threading
-import pandas as pd
-from typing import List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+from app.faq_store import FileSignature, file_signature, iter_faq_rows, read_faq_pairs, read_faq_records, write_faq
+from app import metrics
+from app.faq_table import FAQTable, TableCursor, table_version
+from app.journal import FAQJournal, JournalPosition, apply_entries, is_continuation
+from app.matcher import BaseMatcher, FAQMatcher, normalize_key
+from app.overlay import FAQOverlay
+from app.snapshot import MappedSnapshot, default_snapshot_path, load_or_compile
+from app.sync import ReloadBroadcast
+from app.utils import (
+    DATA_PATH,
+    FAQ_RANKED_MODE,
+    FAQ_KEYWORD_MODE,
+    FAQ_RANKED_MIN_SCORE,
+    FAQ_RANKED_TOP_K,
+    FAQ_CACHE_SIZE,
+    FAQ_CACHE_TTL,
+    FAQ_SNAPSHOT,
+    FAQ_JOURNAL_COMPACT_ENTRIES,
+)
 
-# Default path to the FAQ CSV file
-DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "faq.csv")
+log = logging.getLogger("uvicorn.error")
+
+# Minimum number of seconds between two checks of the CSV file for changes
+DEFAULT_CHECK_INTERVAL = 1.0
+
+# Distinct messages below which get_answers() never starts a process pool
+BATCH_POOL_MIN_KEYS = 20000
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of answers with an optional time-to-live.
+
+    Keys include the snapshot generation, so entries computed against an
+    older FAQ version can never be returned after a reload.
+    """
+
+    def __init__(self, maxsize: int = FAQ_CACHE_SIZE, ttl: float = FAQ_CACHE_TTL) -> None:
+        """
+        Args:
+            maxsize (int): Maximum number of entries; 0 disables the cache.
+            ttl (float): Seconds an entry stays valid; 0 means no expiry.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """
+        Return the cached answer for key, or None on a miss.
+        """
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            answer, expires = entry
+            if self.ttl and time.monotonic() >= expires:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key: Hashable, answer: str) -> None:
+        """
+        Store an answer, evicting the least recently used entry if full.
+        """
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._data[key] = (answer, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Return cache size and hit/miss/eviction counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RankedAnswer(NamedTuple):
+    """A candidate answer from ranked matching with its similarity score."""
+
+    question: str
+    answer: str
+    score: float
+
+
+class Answer(NamedTuple):
+    """Answer to one message with the rule that produced it."""
+
+    answer: str
+    rule: str  # "exact", "partial", "keyword", "ranked", "miss" or "empty"
+    row: Optional[int] = None  # Position of the matched question
+    score: Optional[float] = None  # Similarity, for ranked matches
+
+
+# Fallbacks when there is no message, or no question matches it
+EMPTY = Answer("Sorry, I did not receive any message.", "empty")
+MISS = Answer("Sorry, I do not understand your question.", "miss")
+
+
+class FAQEdit(NamedTuple):
+    """Result of a single-entry FAQ edit."""
+
+    row: int  # Position of the created, updated or deleted row
+    generation: int  # Published shared generation (0 without a broadcast)
+
+
+@dataclass(frozen=True)
+class FAQSnapshot:
+    """
+    Immutable view of the FAQ data at one point in time.
+
+    A new snapshot is built on every reload and swapped in atomically,
+    so readers can use it without taking any lock.
+    """
+
+    qa_pairs: Sequence[Tuple[str, str]]
+    matcher: BaseMatcher
+    mapped: Optional[MappedSnapshot]  # Compiled snapshot backing qa_pairs/matcher, if used
+    fuzzy: Optional[Any]  # app.fuzzy.FuzzyIndex when ranked mode is enabled
+    keywords: Optional[Any]  # app.keywords.KeywordIndex when keyword mode is enabled
+    overlay: FAQOverlay  # Base index plus the journal edits applied on top of it
+    journal: Optional[JournalPosition]  # Part of the edit journal reflected, if any
+    generation: int
+    signature: FileSignature
+    build_seconds: float
+    loaded_at: float
 
 
 class FAQBot:
     """
     Rule-based FAQ bot that retrieves answers from a CSV file.
-    
+
     Features:
-    - Thread-safe loading of CSV data.
-    - Exact and partial matching for user messages.
-    - Automatic reloading of data for up-to-date responses.
+    - Lock-free reads from an immutable snapshot, memory-mapped from a
+      compiled file so worker processes share it.
+    - Indexed exact and partial matching for user messages, then keyword
+      matching over Thai-segmented words.
+    - Optional ranked fuzzy matching (character n-gram TF-IDF) as a fallback.
+    - LRU answer cache invalidated on every reload.
+    - Automatic reloading when the CSV file changes on disk; new indexes
+      are built without holding the lock readers or editors wait for, and
+      get_answer() never builds one itself.
+    - Single-entry edits through an append-only journal, applied to the
+      index incrementally and compacted into the CSV file periodically.
     """
 
-    def __init__(self, csv_path: str = DATA_PATH) -> None:
+    def __init__(
+        self,
+        csv_path: str = DATA_PATH,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+        ranked: bool = FAQ_RANKED_MODE,
+        min_score: float = FAQ_RANKED_MIN_SCORE,
+        top_k: int = FAQ_RANKED_TOP_K,
+        cache: Optional[AnswerCache] = None,
+        use_snapshot: bool = FAQ_SNAPSHOT,
+        broadcast: Optional[ReloadBroadcast] = None,
+        compact_after: int = FAQ_JOURNAL_COMPACT_ENTRIES,
+        keywords: bool = FAQ_KEYWORD_MODE,
+    ) -> None:
         """
         Initialize the FAQBot with a CSV path and load the FAQ data.
-        
+
         Args:
             csv_path (str): Path to the CSV file containing FAQs.
+            check_interval (float): Minimum seconds between two file change checks.
+            ranked (bool): Build a fuzzy index and use it when nothing else matches.
+            min_score (float): Minimum similarity for a ranked answer to be returned.
+            top_k (int): Default number of candidates returned by rank().
+            cache (Optional[AnswerCache]): Answer cache, sized from FAQ_CACHE_SIZE by default.
+            use_snapshot (bool): Serve from a compiled, memory-mapped snapshot
+                (<csv_path>.snap) shared by all worker processes.
+            broadcast (Optional[ReloadBroadcast]): Shared generation counter used
+                to propagate reloads to the other worker processes.
+            compact_after (int): Journal entries after which edits are
+                compacted into the CSV file.
+            keywords (bool): Build a keyword index and use it when the exact
+                and partial rules find nothing.
         """
         self.csv_path = csv_path
-        self.lock = threading.Lock()
+        self.check_interval = check_interval
+        self.ranked = ranked
+        self.keywords = keywords
+        self.min_score = min_score
+        self.top_k = top_k
+        self.cache = cache if cache is not None else AnswerCache()
+        self.snapshot_path = default_snapshot_path(csv_path) if use_snapshot else None
+        self.broadcast = broadcast
+        self.journal = FAQJournal(csv_path)
+        self.compact_after = compact_after
+        self.applied_generation = 0  # Shared (cross-worker) generation reflected by the snapshot
+        self.lock = threading.Lock()  # Serializes snapshot swaps and journal edits
+        self._build_lock = threading.Lock()  # One reload (index build) at a time
+        self._snapshot: Optional[FAQSnapshot] = None
+        self._next_check = 0.0
+        self._stat_checks = 0
+        self._reloads = 0
+        self._journal_applies = 0
+        self._compactions = 0
         self.load_data()
 
+    # ================== LOADING ==================
+    def _read_pairs(self) -> List[Tuple[str, str]]:
+        """
+        Read the CSV file as a list of stripped (question, answer) tuples.
+        If the file does not exist, return an empty dataset.
+        """
+        try:
+            return read_faq_pairs(self.csv_path)
+        except FileNotFoundError:
+            return []
+
+    def _build(self, signature: FileSignature) -> Tuple:
+        """
+        Build the index of the CSV file plus the journal edits, without
+        installing it. Slow for large FAQs and needs no lock.
+
+        Args:
+            signature (FileSignature): File signature taken before reading the file.
+
+        Returns:
+            Tuple: (overlay, mapped snapshot, journal position, signature,
+                start time) for _install_build().
+        """
+        started = time.perf_counter()
+        mapped = None
+        if self.snapshot_path:
+            try:
+                mapped = load_or_compile(self.csv_path, signature, self.snapshot_path)
+            except (OSError, ValueError) as e:
+                log.warning("FAQ snapshot unavailable (%s), indexing in memory instead", e)
+
+        if mapped is not None:
+            pairs, matcher = mapped.pairs, mapped.matcher
+        else:
+            pairs = tuple(self._read_pairs())
+            matcher = FAQMatcher([q for q, _ in pairs])
+
+        fuzzy = None
+        if self.ranked:
+            from app.fuzzy import FuzzyIndex  # NumPy/SciPy are only needed in ranked mode
+            fuzzy = FuzzyIndex([q for q, _ in pairs])
+
+        keywords = None
+        if self.keywords:
+            from app.keywords import KeywordIndex
+            keywords = KeywordIndex([q for q, _ in pairs])
+
+        # Edits made since the CSV file was last compacted
+        entries, position = self.journal.read(signature)
+        overlay = FAQOverlay(pairs, matcher, fuzzy, keywords).apply(entries)
+        return overlay, mapped, position, signature, started
+
+    def _install_build(self, build: Tuple) -> FAQSnapshot:
+        """Swap in the result of _build(). Must be called with self.lock held."""
+        overlay, mapped, position, signature, started = build
+        self._reloads += 1
+        snapshot = self._install(overlay, mapped, signature, position, started)
+        metrics.FAQ_RELOAD_SECONDS.labels("rebuild").observe(snapshot.build_seconds)
+        return snapshot
+
+    def _rebuild(self, signature: FileSignature) -> FAQSnapshot:
+        """
+        Build a new snapshot and swap it in. Must be called with self.lock held;
+        only editing paths do, reloads build outside the lock (_reload()).
+
+        Args:
+            signature (FileSignature): File signature taken before reading the file.
+
+        Returns:
+            FAQSnapshot: The newly installed snapshot.
+        """
+        return self._install_build(self._build(signature))
+
+    def _apply_journal(self) -> Optional[FAQSnapshot]:
+        """
+        Apply the journal entries appended since the current snapshot was
+        built, without rebuilding the index. Must be called with self.lock held.
+
+        Returns:
+            Optional[FAQSnapshot]: The new snapshot, or None if there was nothing to apply.
+        """
+        started = time.perf_counter()
+        snapshot = self._snapshot
+        entries, position = self.journal.read(snapshot.signature, snapshot.journal)
+        if not entries:
+            # Only a header (or a torn line) was read; the data is unchanged
+            self._snapshot = replace(snapshot, journal=position)
+            return None
+        self._journal_applies += 1
+        snapshot = self._install(snapshot.overlay.apply(entries), snapshot.mapped, snapshot.signature, position, started)
+        metrics.FAQ_RELOAD_SECONDS.labels("journal").observe(snapshot.build_seconds)
+        return snapshot
+
+    def _install(
+        self,
+        overlay: FAQOverlay,
+        mapped: Optional[MappedSnapshot],
+        signature: FileSignature,
+        journal: Optional[JournalPosition],
+        started: float,
+    ) -> FAQSnapshot:
+        """
+        Swap in a snapshot of an overlay. Must be called with self.lock held.
+
+        Returns:
+            FAQSnapshot: The newly installed snapshot.
+        """
+        previous = self._snapshot
+        snapshot = FAQSnapshot(
+            qa_pairs=overlay.pairs,
+            matcher=overlay.matcher,
+            mapped=mapped,
+            fuzzy=overlay.fuzzy,
+            keywords=overlay.keywords,
+            overlay=overlay,
+            journal=journal,
+            generation=previous.generation + 1 if previous else 1,
+            signature=signature,
+            build_seconds=time.perf_counter() - started,
+            loaded_at=time.time(),
+        )
+        self._snapshot = snapshot  # Single reference assignment is atomic
+        self.cache.clear()  # Old entries are unreachable anyway (keyed by generation)
+        return snapshot
+
+    def _catch_up(self, signature: FileSignature, journal_state: Optional[Tuple[int, int]]) -> bool:
+        """
+        Bring the snapshot up to date with the CSV file and the journal.
+        Must be called with self.lock held.
+
+        Args:
+            signature (FileSignature): Current signature of the CSV file.
+            journal_state (Optional[Tuple[int, int]]): Current FAQJournal.stat().
+
+        Returns:
+            bool: True if a new snapshot was installed.
+        """
+        snapshot = self._snapshot
+        if signature != snapshot.signature or not is_continuation(snapshot.journal, journal_state):
+            self._rebuild(signature)
+            return True
+        if not self._journal_current(snapshot, journal_state):
+            return self._apply_journal() is not None
+        return False
+
+    @staticmethod
+    def _journal_current(snapshot: FAQSnapshot, journal_state: Optional[Tuple[int, int]]) -> bool:
+        """Whether a snapshot reflects the whole journal file."""
+        position = snapshot.journal
+        if position is None:
+            return journal_state is None
+        return journal_state == (position.inode, position.offset)
+
+    def _reload(self, force: bool) -> None:
+        """
+        Bring the snapshot up to date with the CSV file and the journal,
+        rebuilding the index if the file changed (or always, with force).
+        Must be called with self._build_lock held but not self.lock.
+
+        The index is built without self.lock, which is only taken to swap
+        the result in and to apply journal entries appended meanwhile, so
+        editors and readers never wait for a build.
+        """
+        while True:
+            base = self._snapshot
+            signature = file_signature(self.csv_path)
+            stale = (
+                base is None
+                or signature != base.signature
+                or not is_continuation(base.journal, self.journal.stat())
+            )
+            build = self._build(signature) if force or stale else None
+            with self.lock:
+                if self._snapshot is not base:
+                    continue  # An edit installed a snapshot meanwhile: check again
+                if build is not None:
+                    self._install_build(build)
+                snapshot = self._snapshot
+                journal_state = self.journal.stat()
+                unchanged = snapshot.signature == file_signature(self.csv_path)
+                if unchanged and is_continuation(snapshot.journal, journal_state):
+                    if not self._journal_current(snapshot, journal_state):
+                        self._apply_journal()
+                    return
+            force = False  # The file changed again during the build: build once more
+
     def load_data(self) -> None:
         """
-        Load FAQ data into memory as a list of (question, answer) tuples.
-        If the file does not exist, initialize with an empty dataset.
-        Thread-safe to allow concurrent usage.
+        Unconditionally rebuild the in-memory snapshot from the CSV file.
+        Thread-safe: concurrent readers keep using the previous snapshot
+        until the new one is swapped in.
         """
+        with self._build_lock:
+            # Take the shared generation before reading so a concurrent
+            # publish is detected by the next refresh() instead of being missed
+            published = self.broadcast.current() if self.broadcast else self.applied_generation
+            self._reload(force=True)
+            with self.lock:
+                self.applied_generation = max(self.applied_generation, published)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _check_due(self, force: bool) -> bool:
+        """Whether a change check is due (at most once per check_interval, unless forced)."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        self._stat_checks += 1
+        return True
+
+    def _stale(self) -> Optional[int]:
+        """Shared generation to catch up with if the snapshot is out of date, else None."""
+        published = self.broadcast.current() if self.broadcast else self.applied_generation
+        if self._is_current(file_signature(self.csv_path), self.journal.stat(), published):
+            return None
+        return published
+
+    def _refresh_locked(self) -> bool:
+        """refresh() once a check is due. Must be called with self._build_lock held."""
+        published = self._stale()
+        if published is None:
+            return False  # Possibly reloaded by whoever held the lock before
+        # A newer shared generation with an unchanged file is a reload
+        # requested by another worker: rebuild anyway
+        self._reload(force=published > self.applied_generation)
         with self.lock:
+            self.applied_generation = max(self.applied_generation, published)
+        if self.broadcast:
+            self.broadcast.acknowledge(self.applied_generation)
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Rebuild the snapshot if the CSV file changed since it was loaded, or
+        if another worker published a reload through the shared broadcast.
+        The file is stat'ed at most once per check_interval. Blocks until
+        the new snapshot is installed; see refresh_in_background() for the
+        request path.
+
+        Args:
+            force (bool): Check the file now, ignoring check_interval.
+
+        Returns:
+            bool: True if a new snapshot was installed.
+        """
+        if not self._check_due(force) or self._stale() is None:
+            return False
+        with self._build_lock:
+            return self._refresh_locked()
+
+    def refresh_in_background(self) -> bool:
+        """
+        Non-blocking refresh() for the request path: when a check is due and
+        the snapshot is out of date, reload on a background thread and keep
+        answering from the current snapshot meanwhile. Does nothing while a
+        reload is already running.
+
+        Returns:
+            bool: True if a background reload was started.
+        """
+        if not self._check_due(False) or self._stale() is None:
+            return False
+        if not self._build_lock.acquire(blocking=False):
+            return False  # A reload is already running
+
+        def reload() -> None:
             try:
-                df = pd.read_csv(self.csv_path, dtype=str).fillna("")
-            except FileNotFoundError:
-                df = pd.DataFrame(columns=["question", "answer"])
-            self.qa_pairs: List[Tuple[str, str]] = [
-                (str(row["question"]).strip(), str(row["answer"]).strip())
-                for _, row in df.iterrows()
-            ]
+                self._refresh_locked()
+            except Exception:
+                log.exception("FAQ reload of %s failed", self.csv_path)
+            finally:
+                self._build_lock.release()
+
+        threading.Thread(target=reload, name="faq-reload", daemon=True).start()
+        return True
+
+    def _is_current(self, signature: FileSignature, journal_state: Optional[Tuple[int, int]], published: int) -> bool:
+        """Whether the snapshot reflects the CSV file, the journal and the shared generation."""
+        snapshot = self._snapshot
+        return (
+            signature == snapshot.signature
+            and self._journal_current(snapshot, journal_state)
+            and published <= self.applied_generation
+        )
+
+    @property
+    def snapshot(self) -> FAQSnapshot:
+        """Current immutable FAQ snapshot."""
+        return self._snapshot
+
+    @property
+    def qa_pairs(self) -> Sequence[Tuple[str, str]]:
+        """(question, answer) pairs of the current snapshot."""
+        return self._snapshot.qa_pairs
+
+    def stats(self) -> dict:
+        """
+        Return reload statistics for monitoring.
+
+        Returns:
+            dict: Generation, row count, build time and file check counters.
+        """
+        snapshot = self._snapshot
+        position = snapshot.journal
+        return {
+            "csv_path": self.csv_path,
+            "generation": snapshot.generation,
+            "rows": len(snapshot.qa_pairs),
+            "build_seconds": snapshot.build_seconds,
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self._reloads,
+            "stat_checks": self._stat_checks,
+            "check_interval": self.check_interval,
+            "shared_generation": self.applied_generation,
+            "ranked": snapshot.fuzzy is not None,
+            "keywords": snapshot.keywords is not None,
+            "mapped_snapshot": snapshot.mapped.path if snapshot.mapped else None,
+            "mapped_bytes": snapshot.mapped.size if snapshot.mapped else 0,
+            "journal": {
+                "entries": position.entries if position else 0,
+                "bytes": position.offset if position else 0,
+                "valid": position.valid if position else True,
+                "edited_rows": len(snapshot.overlay.changes),
+                "applies": self._journal_applies,
+                "compactions": self._compactions,
+                "compact_after": self.compact_after,
+            },
+            "cache": self.cache.stats(),
+        }
 
+    # ================== MATCHING ==================
     def get_answer(self, user_message: str) -> str:
         """
         Retrieve the best-matching answer for a user message.
-        Reloads the FAQ data each call to ensure the most recent data is used.
-        
+        Picks up changes to the CSV file without re-reading it on every call;
+        the reload runs in the background, never in the caller.
+
         Args:
             user_message (str): The input message from the user.
-        
+
         Returns:
             str: The corresponding answer, or a default response if no match is found.
         """
-        self.load_data()
+        self.refresh_in_background()
         if not user_message:
-            return "Sorry, I did not receive any message."
+            return EMPTY.answer
+
+        snapshot = self._snapshot
+        started = time.perf_counter()
+        key = normalize_key(user_message)
+        metrics.FAQ_NORMALIZE_SECONDS.labels().observe(time.perf_counter() - started)
+        cache_key = (snapshot.generation, key)
+        answer = self.cache.get(cache_key)
+        if answer is None:
+            metrics.FAQ_CACHE_LOOKUPS.labels("miss").inc()
+            answer = self._lookup(snapshot, key)
+            self.cache.put(cache_key, answer)
+        else:
+            metrics.FAQ_CACHE_LOOKUPS.labels("hit").inc()
+        return answer
+
+    def _lookup(self, snapshot: FAQSnapshot, key: str) -> str:
+        """
+        Match a normalized message against a snapshot, bypassing the cache.
+
+        Args:
+            snapshot (FAQSnapshot): Snapshot to match against.
+            key (str): Normalized user message.
+
+        Returns:
+            str: The corresponding answer, or a default response if no match is found.
+        """
+        started = time.perf_counter()
+        match = self._match_rules(snapshot, key)
+        if match is None and snapshot.fuzzy is not None:
+            best = snapshot.fuzzy.top_k(key, 1, self.min_score)
+            match = self._ranked(snapshot, best[0] if best else None)
+        if match is None:
+            match = MISS
+        metrics.FAQ_MATCH_SECONDS.labels(match.rule).observe(time.perf_counter() - started)
+        return match.answer
+
+    @staticmethod
+    def _match_rules(snapshot: FAQSnapshot, key: str) -> Optional[Answer]:
+        """
+        Apply the exact, partial and keyword rules to a normalized message.
 
-        msg = user_message.strip().lower()
+        Returns:
+            Optional[Answer]: The first rule's match, or None.
+        """
+        # Exact match first, then partial match (first question in file order wins)
+        result = snapshot.matcher.match(key)
+        if result is not None:
+            return Answer(snapshot.qa_pairs[result.index][1], result.rule, result.index)
+
+        # Keyword match: every word of a question occurs in the message
+        if snapshot.keywords is not None:
+            hit = snapshot.keywords.lookup(key)
+            if hit is not None:
+                return Answer(snapshot.qa_pairs[hit.index][1], "keyword", hit.index)
+        return None
+
+    @staticmethod
+    def _ranked(snapshot: FAQSnapshot, match: Optional[Any]) -> Optional[Answer]:
+        """Answer of a fuzzy RankedMatch (None when nothing scored high enough)."""
+        if match is None:
+            return None
+        return Answer(snapshot.qa_pairs[match.index][1], "ranked", match.index, match.score)
+
+    def get_answers(self, messages: Sequence[str], workers: int = 1) -> List[Answer]:
+        """
+        Answer many messages against one snapshot, e.g. to replay historical
+        traffic after an FAQ change.
+
+        Each distinct message is normalized and matched once, and ranked
+        fallbacks are scored together. The answer cache is not used.
 
-        # Check for exact match first
-        for question, answer in self.qa_pairs:
-            if question.lower() == msg:
-                return answer
+        Args:
+            messages (Sequence[str]): User messages.
+            workers (int): Processes to spread very large batches over
+                (see app.batch); 1 answers in this process.
 
-        # Check for partial match
-        for question, answer in self.qa_pairs:
-            q_lower = question.lower()
-            if q_lower and (q_lower in msg or msg in q_lower):
-                return answer
+        Returns:
+            List[Answer]: One answer per message, in order, with the rule
+                that matched and the matched row.
+        """
+        self.refresh()
+        snapshot = self._snapshot
+        slots: Dict[str, int] = {}
+        order: List[int] = []
+        for message in messages:
+            if not message:
+                order.append(-1)
+                continue
+            key = normalize_key(message)
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(slots)
+            order.append(slot)
+        keys = list(slots)
 
-        # Default fallback if no match
-        return "Sorry, I do not understand your question."
+        answers = None
+        if workers > 1 and len(keys) >= BATCH_POOL_MIN_KEYS:
+            from app.batch import answer_in_pool
+            answers = answer_in_pool(self, snapshot, keys, workers)
+        if answers is None:
+            answers = self.answer_keys(snapshot, keys)
+        return [answers[slot] if slot >= 0 else EMPTY for slot in order]
 
-    def reload_faq(self) -> None:
+    def answer_keys(self, snapshot: FAQSnapshot, keys: Sequence[str]) -> List[Answer]:
         """
-        Manually reload FAQ data from the CSV file.
+        Answer distinct normalized messages against a snapshot.
+
+        Args:
+            snapshot (FAQSnapshot): Snapshot to match against.
+            keys (Sequence[str]): Normalized messages.
+
+        Returns:
+            List[Answer]: One answer per key.
+        """
+        answers: List[Optional[Answer]] = [self._match_rules(snapshot, key) for key in keys]
+        fuzzy = snapshot.fuzzy
+        misses = [i for i, answer in enumerate(answers) if answer is None]
+        if misses and fuzzy is not None:
+            if hasattr(fuzzy, "best_many"):
+                best = fuzzy.best_many([keys[i] for i in misses], self.min_score)
+            else:
+                best = [(fuzzy.top_k(keys[i], 1, self.min_score) or [None])[0] for i in misses]
+            for i, match in zip(misses, best):
+                answers[i] = self._ranked(snapshot, match)
+        return [answer if answer is not None else MISS for answer in answers]
+
+    def rank(self, user_message: str, k: Optional[int] = None) -> List[RankedAnswer]:
+        """
+        Return the top-k fuzzy candidates for a message with their scores.
+        Candidates scoring below min_score are left out.
+
+        Args:
+            user_message (str): The input message from the user.
+            k (Optional[int]): Number of candidates, defaults to top_k.
+
+        Returns:
+            List[RankedAnswer]: Best candidate first.
+
+        Raises:
+            RuntimeError: If the bot was created without ranked mode.
+        """
+        self.refresh_in_background()
+        snapshot = self._snapshot
+        if snapshot.fuzzy is None:
+            raise RuntimeError("Ranked matching is disabled; create FAQBot with ranked=True")
+        matches = snapshot.fuzzy.top_k(user_message, self.top_k if k is None else k, self.min_score)
+        return [
+            RankedAnswer(snapshot.qa_pairs[m.index][0], snapshot.qa_pairs[m.index][1], m.score)
+            for m in matches
+        ]
+
+    # ================== EDITING ==================
+    def _publish(self) -> int:
+        """
+        Tell the other worker processes to catch up with this one.
+
+        Returns:
+            int: Published shared generation (0 without a broadcast).
+        """
+        if self.broadcast is None:
+            return 0
+        with self.lock:
+            self.applied_generation = self.broadcast.publish()
+        self.broadcast.acknowledge(self.applied_generation)
+        return self.applied_generation
+
+    def reload_faq(self) -> int:
+        """
+        Manually reload FAQ data from the CSV file and tell the other
+        worker processes to do the same.
+
+        Returns:
+            int: Published shared generation (0 without a broadcast); pass it
+                to broadcast.wait_for() to wait for the other workers.
         """
         self.load_data()
+        return self._publish()
 
+    def _edit(self, make_entry: Callable[[FAQSnapshot], Dict[str, object]]) -> FAQEdit:
+        """
+        Append one edit to the journal and apply it to the index in place.
+
+        Args:
+            make_entry (Callable[[FAQSnapshot], Dict[str, object]]): Builds the
+                journal entry from the up-to-date snapshot.
+
+        Returns:
+            FAQEdit: Edited row and published generation.
+
+        Raises:
+            IndexError: If the row does not exist.
+            ValueError: If the entry is malformed.
+        """
+        with self.journal.locked():
+            with self.lock:
+                signature = file_signature(self.csv_path)
+                self._catch_up(signature, self.journal.stat())
+                snapshot = self._snapshot
+                entry = make_entry(snapshot)
+                row = snapshot.overlay.check(entry)
+                if snapshot.journal is not None and not snapshot.journal.valid:
+                    # Left behind by an older CSV file; its edits were never applied
+                    self.journal.reset(signature)
+                    self._snapshot = replace(snapshot, journal=None)
+                self.journal.append(entry, signature)
+                self._catch_up(signature, self.journal.stat())
+                entries = self._snapshot.journal.entries
+            if entries >= self.compact_after:
+                self._compact_locked()
+        return FAQEdit(row, self._publish())
 
-# Global instance for use in other modules
-faq_bot = FAQBot()
+    def create_entry(self, question: str, answer: str) -> FAQEdit:
+        """
+        Append a question to the FAQ.
+
+        Args:
+            question (str): New question.
+            answer (str): Its answer.
+
+        Returns:
+            FAQEdit: Position of the new row and published generation.
+        """
+        return self._edit(lambda snapshot: {"op": "create", "question": question.strip(), "answer": answer.strip()})
+
+    def update_entry(self, row: int, question: Optional[str] = None, answer: Optional[str] = None) -> FAQEdit:
+        """
+        Change the question and/or answer of one row.
+
+        Args:
+            row (int): Position of the row (as listed by /faq-data).
+            question (Optional[str]): New question; None keeps the current one.
+            answer (Optional[str]): New answer; None keeps the current one.
+
+        Returns:
+            FAQEdit: The row and published generation.
+
+        Raises:
+            IndexError: If the row does not exist.
+        """
+        def make_entry(snapshot: FAQSnapshot) -> Dict[str, object]:
+            if not 0 <= row < len(snapshot.qa_pairs):
+                raise IndexError(f"FAQ row {row} does not exist")
+            current_question, current_answer = snapshot.qa_pairs[row]
+            return {
+                "op": "update",
+                "row": row,
+                "question": current_question if question is None else question.strip(),
+                "answer": current_answer if answer is None else answer.strip(),
+            }
+        return self._edit(make_entry)
+
+    def delete_entry(self, row: int) -> FAQEdit:
+        """
+        Remove one row; the rows after it move up by one.
+
+        Args:
+            row (int): Position of the row (as listed by /faq-data).
+
+        Returns:
+            FAQEdit: The deleted position and published generation.
+
+        Raises:
+            IndexError: If the row does not exist.
+        """
+        return self._edit(lambda snapshot: {"op": "delete", "row": row})
+
+    def _compact_locked(self) -> None:
+        """
+        Write the edited table to the CSV file and drop the journal.
+        Must be called while holding journal.locked() but not self.lock.
+        """
+        with self.lock:
+            signature = file_signature(self.csv_path)
+            self._catch_up(signature, self.journal.stat())
+            position = self._snapshot.journal
+            if position is None:
+                return
+            if position.valid and position.entries:
+                entries, _ = self.journal.read(signature)
+                try:
+                    records = read_faq_records(self.csv_path)
+                except FileNotFoundError:
+                    records = []
+                write_faq(self.csv_path, apply_entries(records, entries))
+                self._compactions += 1
+            self.journal.remove()
+            self._rebuild(file_signature(self.csv_path))
+
+    def compact(self) -> int:
+        """
+        Fold the journal into the CSV file now.
+
+        Returns:
+            int: Published shared generation (0 without a broadcast).
+        """
+        with self.journal.locked():
+            self._compact_locked()
+        return self._publish()
+
+    def data_version(self) -> str:
+        """
+        Version of the FAQ table on disk (CSV file plus journal), e.g. for ETags.
+        Identical in every worker process.
+        """
+        return table_version(file_signature(self.csv_path), self.journal.stat())
+
+    def open_table(self, after: Optional[TableCursor] = None) -> FAQTable:
+        """
+        Open a consistent, streamable view of the FAQ table for editor tools:
+        the CSV rows (with all their columns) with pending journal edits applied.
+
+        Args:
+            after (Optional[TableCursor]): Resume where an earlier page ended.
+
+        Returns:
+            FAQTable: Table to iterate (or close()); compare its version with
+                the cursor's to detect changes between pages.
+        """
+        with self.journal.locked():
+            signature = file_signature(self.csv_path)
+            journal_state = self.journal.stat()
+            entries, _ = self.journal.read(signature)
+            base_rows = 0
+            if signature is not None:
+                snapshot = self._snapshot
+                if snapshot.signature == signature:
+                    base_rows = snapshot.overlay.base_rows
+                else:
+                    base_rows = sum(1 for _ in iter_faq_rows(self.csv_path))
+            plan = FAQOverlay(range(base_rows), None).apply(entries) if entries else None
+            # Opened under the lock so a concurrent compaction cannot swap the file in between
+            return FAQTable(table_version(signature, journal_state), self.csv_path, base_rows, plan, after)
+
+    def replace_all(self, records: List[Dict[str, object]]) -> int:
+        """
+        Replace the whole FAQ (e.g. from the /update-faq endpoint).
+        Pending journal edits are discarded.
+
+        Args:
+            records (List[Dict[str, object]]): Rows with question and answer keys.
+
+        Returns:
+            int: Published shared generation (0 without a broadcast).
+        """
+        with self.journal.locked():
+            write_faq(self.csv_path, records)
+            self.journal.remove()
+        return self.reload_faq()
+
+
+# Guards the creation of the global instance
+_faq_bot_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Create the global instance for use in other modules (faq_bot) on first
+    access, so that importing this module, as batch worker processes do,
+    does not load data/faq.csv.
+    """
+    if name != "faq_bot":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _faq_bot_lock:
+        if "faq_bot" not in globals():
+            globals()["faq_bot"] = FAQBot(broadcast=ReloadBroadcast(DATA_PATH))
+    return globals()["faq_bot"]
@@ -0,0 +1,349 @@
+"""
+Reusable image attachments for [[IMAGE:<url>]] answers.
+
+Sending an image by URL makes Facebook download it again for every reply.
+Instead each image URL of the FAQ is uploaded once through the Attachment
+Upload API and replies reference the returned attachment_id.
+
+- run_attachment_sync() uploads the image URLs of the FAQ in the background
+  whenever the FAQ changes, so a new image is uploaded before it is needed.
+- The URL -> attachment_id map is kept in a JSON file (FB_ATTACHMENT_CACHE),
+  so it survives restarts and is shared by the worker processes. Only one
+  worker at a time runs the bulk upload; the others pick up its results.
+- An image that is not uploaded yet is sent by URL and uploaded alongside;
+  an attachment_id that Facebook no longer knows (error 100, "No matching
+  attachment found") is dropped and uploaded again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Collection, Dict, Iterable, Optional, Set, Tuple
+
+from app.faq_store import FileSignature, file_signature
+from app.messenger import attachment_payload, image_payload, messenger, scheduler
+from app.scheduler import SendScheduler
+from app.utils import FAQ_SYNC_INTERVAL, FB_ATTACHMENT_CACHE, FB_ATTACHMENT_CONCURRENCY, FB_ATTACHMENT_REUSE
+
+try:
+    import fcntl  # POSIX only; without it every worker uploads on its own
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+log = logging.getLogger("uvicorn.error")
+
+IMAGE_PREFIX = "[[IMAGE:"
+IMAGE_SUFFIX = "]]"
+
+# Seconds before an image whose upload failed is tried again
+UPLOAD_RETRY_INTERVAL = 30.0
+
+
+def image_url(answer: str) -> Optional[str]:
+    """
+    Image URL of an answer written as [[IMAGE: <url>]].
+
+    Args:
+        answer (str): FAQ answer.
+
+    Returns:
+        Optional[str]: The URL, or None for a text answer.
+    """
+    if isinstance(answer, str) and answer.startswith(IMAGE_PREFIX) and answer.endswith(IMAGE_SUFFIX):
+        return answer[len(IMAGE_PREFIX):-len(IMAGE_SUFFIX)].strip() or None
+    return None
+
+
+def is_unknown_attachment(result: dict) -> bool:
+    """
+    Whether a failed send was rejected because Facebook does not know its
+    attachment_id (400, error code 100, "No matching attachment found"),
+    rather than for another reason such as an invalid recipient.
+
+    Args:
+        result (dict): Fallback dict of a failed send (status and response text).
+
+    Returns:
+        bool: True if the attachment_id should be dropped and uploaded again.
+    """
+    if result.get("status") != 400:
+        return False
+    try:
+        error = json.loads(result.get("text") or "").get("error")
+    except (ValueError, AttributeError):
+        return False
+    return (
+        isinstance(error, dict)
+        and error.get("code") == 100
+        and "attachment" in str(error.get("message", "")).lower()
+    )
+
+
+def image_urls(pairs: Iterable[Tuple[str, str]]) -> Set[str]:
+    """Distinct image URLs among the answers of (question, answer) pairs."""
+    urls = set()
+    for _, answer in pairs:
+        url = image_url(answer)
+        if url:
+            urls.add(url)
+    return urls
+
+
+class AttachmentCache:
+    """
+    Image URL -> attachment_id map, persisted to a JSON file.
+
+    Features:
+    - Lookups from memory; the file is re-read when another worker changed it.
+    - At most one upload per URL in flight, and a bounded number overall.
+    - Failed uploads are retried after UPLOAD_RETRY_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        path: str = FB_ATTACHMENT_CACHE,
+        upload: Callable[[str], Awaitable[dict]] = messenger.upload_attachment,
+        concurrency: int = FB_ATTACHMENT_CONCURRENCY,
+        enabled: bool = FB_ATTACHMENT_REUSE,
+    ) -> None:
+        """
+        Args:
+            path (str): JSON file holding the map.
+            upload (Callable): Uploads one URL, returning the Graph API response.
+            concurrency (int): Maximum uploads in flight.
+            enabled (bool): False sends every image by URL, as before.
+        """
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.upload = upload
+        self.enabled = enabled
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._ids: Dict[str, str] = {}
+        self._signature: FileSignature = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._failed: Dict[str, float] = {}  # URL -> monotonic time of the failed upload
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.upload_errors = 0
+        self.rejected = 0
+        if enabled:
+            self.load()
+
+    # ================== PERSISTENCE ==================
+    def _read(self) -> Dict[str, str]:
+        """Map stored in the file, empty if it is missing or unreadable."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable attachment cache %s (%s)", self.path, e)
+            return {}
+        return {str(url): str(aid) for url, aid in data.items()} if isinstance(data, dict) else {}
+
+    def load(self) -> None:
+        """Merge in the file's entries if it changed since it was last read."""
+        signature = file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return
+        self._ids.update(self._read())
+        self._signature = signature
+
+    def save(self, removed: Optional[str] = None) -> None:
+        """
+        Write the map, merged with entries other workers added meanwhile
+        (temporary file + rename, so readers never see a partial file).
+
+        Args:
+            removed (Optional[str]): URL to drop from the file as well.
+        """
+        data = self._read()
+        data.update(self._ids)
+        data.pop(removed, None)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".attachments-", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=0, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("Could not save the attachment cache %s (%s)", self.path, e)
+            return
+        self._ids = data
+        self._signature = file_signature(self.path)
+
+    # ================== LOOKUP ==================
+    def get(self, url: str) -> Optional[str]:
+        """
+        attachment_id of an image URL.
+
+        Args:
+            url (str): Image URL.
+
+        Returns:
+            Optional[str]: The id, or None if the image is not uploaded yet.
+        """
+        if not self.enabled:
+            return None
+        attachment_id = self._ids.get(url)
+        if attachment_id is None:
+            self.load()  # Another worker may have uploaded it
+            attachment_id = self._ids.get(url)
+        if attachment_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return attachment_id
+
+    def forget(self, url: str) -> None:
+        """Drop an attachment_id Facebook no longer accepts."""
+        self.rejected += 1
+        if self._ids.pop(url, None) is not None:
+            self.save(removed=url)
+
+    # ================== UPLOADS ==================
+    async def _upload(self, url: str) -> Optional[str]:
+        """Upload one URL and remember its attachment_id (not saved yet)."""
+        async with self._semaphore:
+            result = await self.upload(url)
+        attachment_id = result.get("attachment_id")
+        if not attachment_id:
+            self.upload_errors += 1
+            self._failed[url] = time.monotonic()
+            log.warning("Image upload failed for %s: %s (status %s)", url, result.get("error"), result.get("status"))
+            return None
+        self.uploads += 1
+        self._failed.pop(url, None)
+        self._ids[url] = str(attachment_id)
+        return self._ids[url]
+
+    def _due(self, url: str) -> bool:
+        """Whether a URL needs an upload now (not cached, in flight or recently failed)."""
+        failed = self._failed.get(url)
+        return (
+            url not in self._ids
+            and url not in self._pending
+            and (failed is None or time.monotonic() - failed >= UPLOAD_RETRY_INTERVAL)
+        )
+
+    def schedule(self, url: str) -> None:
+        """Upload one URL in the background (an image sent by URL meanwhile)."""
+        if not self.enabled or not self._due(url):
+            return
+
+        async def upload_and_save() -> None:
+            try:
+                if await self._upload(url):
+                    self.save()
+            finally:
+                self._pending.pop(url, None)
+
+        self._pending[url] = asyncio.create_task(upload_and_save())
+
+    async def sync(self, urls: Collection[str]) -> bool:
+        """
+        Upload every URL that has no attachment_id yet (URLs whose upload
+        failed recently wait for UPLOAD_RETRY_INTERVAL).
+
+        Only one worker process uploads at a time; the others return False
+        and try again later, by when the file holds the ids they need.
+
+        Args:
+            urls (Collection[str]): Image URLs of the FAQ.
+
+        Returns:
+            bool: True once every URL has an attachment_id.
+        """
+        if not self.enabled:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            self.load()
+            missing = [url for url in urls if self._due(url)]
+            if missing:
+                log.info("Uploading %d new FAQ image(s)", len(missing))
+                results = await asyncio.gather(*(self._upload(url) for url in missing))
+                if any(results):
+                    self.save()
+            return all(url in self._ids for url in urls)
+        finally:
+            os.close(fd)  # Also releases the flock
+
+    def stats(self) -> dict:
+        """Cache size and lookup/upload counters."""
+        return {
+            "enabled": self.enabled,
+            "size": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "uploads": self.uploads,
+            "upload_errors": self.upload_errors,
+            "rejected": self.rejected,
+            "pending": len(self._pending),
+        }
+
+
+# Shared cache for the FastAPI app
+attachments = AttachmentCache()
+
+
+async def send_image_answer(
+    recipient_id: str, url: str, cache: AttachmentCache = attachments, sender: SendScheduler = scheduler,
+) -> dict:
+    """
+    Send an image answer by attachment_id, or by URL until it is uploaded.
+
+    Args:
+        recipient_id (str): Facebook user ID.
+        url (str): Image URL of the answer.
+        cache (AttachmentCache): attachment_ids of the sending page.
+        sender (SendScheduler): Send scheduler of the sending page.
+
+    Returns:
+        dict: JSON response from Facebook Graph API or fallback dict on error.
+    """
+    attachment_id = cache.get(url)
+    if attachment_id is not None:
+        result = await sender.send(recipient_id, attachment_payload(recipient_id, attachment_id))
+        if not is_unknown_attachment(result):
+            return result
+        # Unknown or expired attachment: upload again, send by URL this time
+        cache.forget(url)
+    cache.schedule(url)
+    return await sender.send(recipient_id, image_payload(recipient_id, url))
+
+
+async def run_attachment_sync(bot, cache: AttachmentCache = attachments, interval: float = FAQ_SYNC_INTERVAL) -> None:
+    """
+    Upload the images of new FAQ versions in the background, retrying until
+    every image has an attachment_id. Runs until cancelled.
+
+    Args:
+        bot (FAQBot): Bot whose answers are watched.
+        cache (AttachmentCache): Cache to fill.
+        interval (float): Seconds between checks for a new FAQ version.
+    """
+    synced = None  # Generation of the last snapshot whose images were all uploaded
+    scanned, urls = None, set()
+    while True:
+        try:
+            snapshot = bot.snapshot
+            if snapshot.generation != synced:
+                if snapshot.generation != scanned:
+                    urls = await asyncio.to_thread(image_urls, snapshot.qa_pairs)
+                    scanned = snapshot.generation
+                if await cache.sync(urls):
+                    synced = snapshot.generation
+        except Exception:
+            log.exception("FAQ image upload failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,137 @@
+"""
+Process pool for answering very large message batches (FAQBot.get_answers).
+
+The pool is started on the first large batch and kept for the next ones.
+Each worker process opens its own FAQBot on the same CSV file once, in the
+pool initializer; with the memory-mapped snapshot this only maps the shared
+file. A chunk is answered only if the worker sees exactly the FAQ version
+(CSV signature and journal position) of the caller's snapshot, after a
+reload if the worker is behind, so the whole batch is answered against one
+snapshot. Otherwise, or if the pool fails, the caller answers in-process.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+log = logging.getLogger("uvicorn.error")
+
+# Chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+# FAQBot of this worker process, set by _init_worker()
+_worker_bot = None
+
+# Pool shared by all batches of this server process, what it was started
+# for (CSV file and matching options) and its number of processes
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def snapshot_identity(snapshot) -> Tuple:
+    """FAQ version a snapshot reflects: CSV signature and journal position."""
+    position = snapshot.journal
+    return snapshot.signature, (position.inode, position.offset) if position else None
+
+
+def _init_worker(csv_path: str, options: dict) -> None:
+    """Open the worker's FAQBot, mapping the shared snapshot."""
+    from app.ai_engine import AnswerCache, FAQBot
+
+    global _worker_bot
+    _worker_bot = FAQBot(csv_path, cache=AnswerCache(maxsize=0), **options)
+
+
+def _answer_chunk(identity: Tuple, keys: Sequence[str]) -> Optional[list]:
+    """Answer one chunk of normalized messages; None if the worker's FAQ differs."""
+    snapshot = _worker_bot.snapshot
+    if snapshot_identity(snapshot) != identity:
+        _worker_bot.refresh(force=True)  # The FAQ changed since the pool started
+        snapshot = _worker_bot.snapshot
+        if snapshot_identity(snapshot) != identity:
+            return None
+    return _worker_bot.answer_keys(snapshot, keys)
+
+
+def _get_pool(csv_path: str, options: dict, workers: int) -> ProcessPoolExecutor:
+    """
+    Return the shared pool, starting it on first use. It is replaced when
+    the bot's settings change or a batch asks for more processes.
+    """
+    global _pool, _pool_key, _pool_workers
+    key = (csv_path, tuple(sorted(options.items())))
+    with _pool_lock:
+        if _pool is None or _pool_key != key or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # Batches already submitted still finish
+            # Spawned, not forked: the server process has threads and held locks
+            _pool = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(csv_path, options),
+            )
+            _pool_key, _pool_workers = key, workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken pool, so the next batch starts a new one."""
+    global _pool, _pool_key, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_key, _pool_workers = None, None, 0
+    pool.shutdown(wait=False)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (on server shutdown), cancelling queued chunks."""
+    global _pool, _pool_key, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_key, _pool_workers = _pool, None, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def answer_in_pool(bot, snapshot, keys: Sequence[str], workers: int) -> Optional[List]:
+    """
+    Answer distinct normalized messages across worker processes.
+
+    Args:
+        bot (FAQBot): Bot whose CSV file and matching options the workers use.
+        snapshot (FAQSnapshot): Snapshot the answers must correspond to.
+        keys (Sequence[str]): Normalized messages.
+        workers (int): Number of processes.
+
+    Returns:
+        Optional[List[Answer]]: One answer per key, or None if the batch has
+            to be answered in-process instead.
+    """
+    options = {
+        "use_snapshot": bot.snapshot_path is not None,
+        "ranked": bot.ranked,
+        "keywords": bot.keywords,
+        "min_score": bot.min_score,
+    }
+    size = -(-len(keys) // (workers * CHUNKS_PER_WORKER))  # Ceiling division
+    chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+    identity = snapshot_identity(snapshot)
+    pool = None
+    try:
+        pool = _get_pool(bot.csv_path, options, workers)
+        parts = list(pool.map(_answer_chunk, [identity] * len(chunks), chunks))
+    except (OSError, RuntimeError, BrokenProcessPool) as e:
+        # RuntimeError: the pool was replaced or shut down under this batch
+        if pool is not None and isinstance(e, BrokenProcessPool):
+            _discard_pool(pool)
+        log.warning("Batch process pool failed (%s), answering in-process", e)
+        return None
+    if any(part is None for part in parts):
+        log.info("Batch pool workers could not load this FAQ version, answering in-process")
+        return None
+    return [answer for part in parts for answer in part]
@@ -0,0 +1,215 @@
+"""
+Opt-in capture of webhook traffic for replay (tools/replay.py).
+
+With WEBHOOK_CAPTURE_DIR set, every /webhook body and every answer the bot
+chose are appended as JSON lines to requests-<pid>.jsonl in that directory
+(one file per worker process):
+
+    {"ts": 1700000000.123456, "type": "webhook", "payload": {...}}
+    {"ts": 1700000000.234567, "type": "answer", "mid": "...", "sender": "...", "text": "...", "answer": "..."}
+
+The request path only puts a record on a bounded in-memory queue; a
+background thread formats and writes the records in batches and rotates
+the file once it reaches WEBHOOK_CAPTURE_MAX_BYTES. When the writer falls
+behind, records are dropped and counted rather than slowing the handler.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.utils import (
+    WEBHOOK_CAPTURE_DIR,
+    WEBHOOK_CAPTURE_MAX_BYTES,
+    WEBHOOK_CAPTURE_BACKUPS,
+    WEBHOOK_CAPTURE_BUFFER,
+)
+
+log = logging.getLogger("uvicorn.error")
+
+# Records written per batch at most, and seconds between flushes of a busy file
+WRITE_BATCH = 512
+FLUSH_INTERVAL = 1.0
+
+_STOP = object()  # Queue sentinel telling the writer thread to finish
+
+
+class TrafficCapture:
+    """
+    Buffered JSON-lines writer for webhook payloads and answers.
+
+    Features:
+    - Non-blocking record_*() calls; a full buffer drops records.
+    - Batched writes on a daemon thread, flushed at least every FLUSH_INTERVAL.
+    - Size-based rotation keeping `backups` older files (<file>.1 is the newest).
+    """
+
+    def __init__(
+        self,
+        directory: str = WEBHOOK_CAPTURE_DIR,
+        max_bytes: int = WEBHOOK_CAPTURE_MAX_BYTES,
+        backups: int = WEBHOOK_CAPTURE_BACKUPS,
+        buffer: int = WEBHOOK_CAPTURE_BUFFER,
+    ) -> None:
+        """
+        Configure the capture; nothing is written until start().
+
+        Args:
+            directory (str): Directory of the capture files; empty disables capture.
+            max_bytes (int): File size at which the file is rotated.
+            backups (int): Rotated files kept.
+            buffer (int): Records that may wait for the writer.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = max(1, backups)
+        self.path: Optional[str] = None
+        self._queue: "queue.Queue" = queue.Queue(max(1, buffer))
+        self._thread: Optional[threading.Thread] = None
+        self.records = 0
+        self.dropped = 0
+        self.bytes = 0
+        self.rotations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """True while records are being captured."""
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Open this process's capture file and start the writer thread."""
+        if not self.directory or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"requests-{os.getpid()}.jsonl")
+        self._thread = threading.Thread(target=self._run, name="webhook-capture", daemon=True)
+        self._thread.start()
+        log.info("Capturing webhook traffic to %s", self.path)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write the buffered records and stop the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.warning("Webhook capture buffer still full on shutdown")
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ================== RECORDING ==================
+    def _put(self, record: Tuple) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_webhook(self, body: bytes) -> None:
+        """
+        Capture one webhook request body.
+
+        Args:
+            body (bytes): Raw body, already known to be valid JSON.
+        """
+        if self._thread is not None:
+            self._put(("webhook", time.time(), body))
+
+    def record_answer(self, mid: Optional[str], sender_id: str, text: str, answer: str) -> None:
+        """
+        Capture the answer chosen for one message.
+
+        Args:
+            mid (Optional[str]): Message id.
+            sender_id (str): Facebook user ID of the sender.
+            text (str): Message text.
+            answer (str): Answer sent, as written in the FAQ.
+        """
+        if self._thread is not None:
+            self._put(("answer", time.time(), (mid, sender_id, text, answer)))
+
+    # ================== WRITER ==================
+    @staticmethod
+    def _format(record: Tuple) -> bytes:
+        """One JSON line for a queued record."""
+        kind, ts, data = record
+        if kind == "webhook":
+            if b"\n" in data or b"\r" in data:
+                data = json.dumps(json.loads(data), ensure_ascii=False).encode("utf-8")
+            return b'{"ts": %.6f, "type": "webhook", "payload": %s}\n' % (ts, data)
+        mid, sender_id, text, answer = data
+        line = {"ts": round(ts, 6), "type": "answer", "mid": mid, "sender": sender_id, "text": text, "answer": answer}
+        return json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def _rotate(self, f):
+        """Close the full file, shift the rotated ones and open a new file."""
+        f.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+        return open(self.path, "ab")
+
+    def _run(self) -> None:
+        """Writer thread: drain the queue in batches until the stop sentinel."""
+        f = open(self.path, "ab")
+        size = f.tell()
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    batch: List = [self._queue.get(timeout=FLUSH_INTERVAL)]
+                except queue.Empty:
+                    f.flush()
+                    continue
+                while len(batch) < WRITE_BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(record is _STOP for record in batch)
+                for record in batch:
+                    if record is _STOP:
+                        continue
+                    try:
+                        line = self._format(record)
+                    except (ValueError, TypeError):
+                        self.dropped += 1
+                        continue
+                    if size and size + len(line) > self.max_bytes:
+                        f = self._rotate(f)
+                        size = 0
+                    f.write(line)
+                    size += len(line)
+                    self.records += 1
+                    self.bytes += len(line)
+                now = time.monotonic()
+                if stop or self._queue.empty() or now - last_flush >= FLUSH_INTERVAL:
+                    f.flush()
+                    last_flush = now
+                if stop:
+                    return
+        except OSError:
+            log.exception("Webhook capture stopped")
+        finally:
+            f.close()
+
+    def stats(self) -> dict:
+        """Capture file and record counters."""
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "records": self.records,
+            "dropped": self.dropped,
+            "bytes": self.bytes,
+            "rotations": self.rotations,
+        }
+
+
+# Shared capture for the FastAPI app, started by the lifespan
+capture = TrafficCapture()
@@ -0,0 +1,187 @@
+"""
+Suppression of webhook events that Facebook delivers more than once.
+
+Facebook redelivers a webhook when it does not get a timely 200, so under
+load the same message can arrive several times, often at a different
+uvicorn worker than the original. Message ids (message.mid) seen recently
+are remembered in a time-windowed table; a repeated id is dropped before
+any matching or outbound work.
+
+The table is a memory-mapped file next to the FAQ CSV (`<csv>.dedup`),
+shared by all worker processes and updated under flock; without a path it
+lives in memory private to the process. It is set-associative: an id
+hashes to one bucket of up to BUCKET_WAYS slots, each holding a 64-bit
+hash of the id and the time it expires, and a full bucket evicts its least
+recently seen id.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.utils import WEBHOOK_DEDUP_SIZE, WEBHOOK_DEDUP_TTL
+
+try:
+    import fcntl  # POSIX only; without it workers may race on a bucket
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+MAGIC = b"FAQDDUP1"
+
+# Slots per bucket: eviction is least-recently-seen within a bucket
+BUCKET_WAYS = 8
+
+# magic, buckets, ways
+HEADER = struct.Struct("<8sII")
+
+# Hash of the id (0 = empty slot), wall-clock expiry (shared across processes)
+SLOT = struct.Struct("<Qd")
+
+
+class MessageDeduplicator:
+    """
+    Memory-bounded set of recently seen message ids.
+
+    Features:
+    - At most maxsize ids; a full bucket evicts its least recently seen id.
+    - Ids are forgotten ttl seconds after they were last seen.
+    - Shared by all worker processes when backed by a file.
+    - Counters of checked and suppressed events (per process).
+    """
+
+    def __init__(
+        self, maxsize: int = WEBHOOK_DEDUP_SIZE, ttl: float = WEBHOOK_DEDUP_TTL, path: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            maxsize (int): Maximum number of ids remembered; 0 disables deduplication.
+            ttl (float): Seconds an id is remembered after it was last seen.
+            path (Optional[str]): Table file shared with the other workers;
+                private memory if None.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.ways = max(1, min(BUCKET_WAYS, maxsize))
+        self.buckets = max(1, maxsize // self.ways)
+        self._bucket = struct.Struct("<" + "Qd" * self.ways)
+        self._size = HEADER.size + self.buckets * self._bucket.size
+        self._fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
+        self._table: Optional[mmap.mmap] = None
+        if maxsize > 0:
+            self._table = self._open_file(path) if path else mmap.mmap(-1, self._size)
+        self.checked = 0
+        self.suppressed = 0
+        self.evictions = 0
+
+    def _open_file(self, path: str) -> mmap.mmap:
+        """Map the shared table, creating or resetting it if needed."""
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        header = HEADER.pack(MAGIC, self.buckets, self.ways)
+        with self._locked():
+            if os.pread(self._fd, HEADER.size, 0) != header:
+                # New file, or one laid out for another WEBHOOK_DEDUP_SIZE: start
+                # empty. Never left smaller, so a worker that still maps the old
+                # layout cannot fault
+                size = max(self._size, os.fstat(self._fd).st_size)
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+            return mmap.mmap(self._fd, self._size)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the table lock (across threads and, for a file, worker processes)."""
+        with self._thread_lock:
+            if self._fd is None or fcntl is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _locate(self, mid: str):
+        """(id hash, bucket offset) of a message id."""
+        key = int.from_bytes(hashlib.blake2b(mid.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        return key, HEADER.size + (key % self.buckets) * self._bucket.size
+
+    def is_duplicate(self, mid: Optional[str]) -> bool:
+        """
+        Check a message id and remember it.
+
+        Args:
+            mid (Optional[str]): message.mid of the event; events without one
+                are never treated as duplicates.
+
+        Returns:
+            bool: True if the id was already seen within the window.
+        """
+        if not mid or self._table is None:
+            return False
+        self.checked += 1
+        key, offset = self._locate(mid)
+        now = time.time()
+        with self._locked():
+            slots = self._bucket.unpack_from(self._table, offset)
+            target = None
+            duplicate = False
+            for way in range(self.ways):
+                slot_key, expires = slots[2 * way], slots[2 * way + 1]
+                if slot_key == key and expires > now:
+                    target, duplicate = way, True
+                    break
+                if target is None and (slot_key == 0 or expires <= now):
+                    target = way  # Free or expired; keep looking for the id itself
+            if target is None:
+                target = min(range(self.ways), key=lambda way: slots[2 * way + 1])  # Least recently seen
+                self.evictions += 1
+            SLOT.pack_into(self._table, offset + target * SLOT.size, key, now + self.ttl)
+        if duplicate:
+            self.suppressed += 1
+        return duplicate
+
+    def forget(self, mid: Optional[str]) -> None:
+        """
+        Forget a message id, e.g. when its event was dropped, so a
+        redelivery is processed.
+        """
+        if not mid or self._table is None:
+            return
+        key, offset = self._locate(mid)
+        with self._locked():
+            for way in range(self.ways):
+                if SLOT.unpack_from(self._table, offset + way * SLOT.size)[0] == key:
+                    SLOT.pack_into(self._table, offset + way * SLOT.size, 0, 0.0)
+
+    def __len__(self) -> int:
+        """Number of ids currently remembered (by all workers sharing the table)."""
+        if self._table is None:
+            return 0
+        now = time.time()
+        with self._locked():
+            return sum(
+                1 for key, expires in SLOT.iter_unpack(self._table[HEADER.size:self._size])
+                if key and expires > now
+            )
+
+    def stats(self) -> dict:
+        """
+        Return size and suppression counters.
+        """
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "shared": self._fd is not None,
+            "checked": self.checked,
+            "suppressed": self.suppressed,
+            "evictions": self.evictions,
+        }
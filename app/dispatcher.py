@@ -0,0 +1,245 @@
+"""
+Background processing of webhook messaging events.
+
+The webhook handler only parses and enqueues events; a pool of asyncio
+workers takes them off the queues. Each sender is pinned to one worker
+shard, and a worker starts every event as its own task, chained after the
+sender's previous event. So the replies to a single user are sent in the
+order the messages arrived, while a slow or retrying send only holds up
+that user's later messages, not the rest of the shard.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from app.utils import (
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_ENQUEUE_TIMEOUT,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_MAX_IN_FLIGHT,
+)
+
+log = logging.getLogger("uvicorn.error")
+
+
+class WebhookEvent(NamedTuple):
+    """One incoming message to answer."""
+
+    sender_id: str
+    text: str
+    received_at: float  # time.monotonic() when the webhook was received
+    mid: Optional[str] = None  # message.mid, if Facebook sent one
+    page_id: Optional[str] = None  # entry["id"], the page the message was sent to
+
+
+class WebhookDispatcher:
+    """
+    Bounded, sharded work queue for webhook events.
+
+    Features:
+    - One bounded queue per worker; a sender always maps to the same worker.
+    - Events handled concurrently, up to max_in_flight, in order per sender.
+    - Backpressure: enqueue waits for space up to a timeout, then drops.
+    - Graceful drain of queued and running events on shutdown.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[WebhookEvent], Awaitable[None]],
+        workers: int = WEBHOOK_WORKERS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+        enqueue_timeout: float = WEBHOOK_ENQUEUE_TIMEOUT,
+        max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT,
+    ) -> None:
+        """
+        Configure the dispatcher; workers are started with start().
+
+        Args:
+            handler (Callable): Coroutine function answering one event.
+            workers (int): Number of worker tasks (and queue shards).
+            queue_size (int): Total capacity across all shards.
+            enqueue_timeout (float): Seconds to wait for queue space before dropping.
+            max_in_flight (int): Events being handled at once (including
+                events waiting for the same sender's earlier ones); the
+                queues fill up beyond that.
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.shard_size = max(1, -(-queue_size // self.workers))  # Ceiling division
+        self.enqueue_timeout = enqueue_timeout
+        self.max_in_flight = max(1, max_in_flight)
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._active: Set[asyncio.Task] = set()
+        self._last: Dict[str, asyncio.Task] = {}  # Sender -> their latest event task
+        self._running = False
+
+        # Counters for backpressure monitoring
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.blocked = 0  # Enqueues that had to wait for space
+        self.inline = 0   # Events handled directly because workers were not running
+        self.max_depth = 0
+        self.queue_wait_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        """True while workers accept new events."""
+        return self._running
+
+    def depth(self) -> int:
+        """Number of events waiting in all shards."""
+        return sum(q.qsize() for q in self._queues)
+
+    async def start(self) -> None:
+        """Create the queues and worker tasks in the running event loop."""
+        if self._running:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = [
+            asyncio.create_task(self._worker(q), name=f"webhook-worker-{i}")
+            for i, q in enumerate(self._queues)
+        ]
+        self._running = True
+
+    async def stop(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """
+        Stop accepting events, wait for queued and running events to finish,
+        then stop workers.
+
+        Args:
+            timeout (float): Maximum seconds to wait for the events to drain.
+        """
+        if not self._running:
+            return
+        self._running = False
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Webhook drain timed out with %d events left", self.depth() + len(self._active))
+        for task in self._tasks + list(self._active):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._active, return_exceptions=True)
+        self._tasks = []
+
+    async def _drain(self) -> None:
+        """Wait until the queues are empty and every started event is done."""
+        await asyncio.gather(*(q.join() for q in self._queues))
+        while self._active:
+            await asyncio.wait(list(self._active))
+
+    async def submit(
+        self, sender_id: str, text: str, mid: Optional[str] = None, page_id: Optional[str] = None,
+    ) -> bool:
+        """
+        Queue an event for background processing.
+
+        Falls back to handling the event inline when workers are not running
+        (e.g. scripts or tests that bypass the app lifespan).
+
+        Args:
+            sender_id (str): Facebook user ID of the sender.
+            text (str): Message text.
+            mid (Optional[str]): Message id, passed on to the handler.
+            page_id (Optional[str]): Page the message was sent to.
+
+        Returns:
+            bool: False if the event was dropped because the queue stayed full.
+        """
+        event = WebhookEvent(sender_id, text, time.monotonic(), mid, page_id)
+        if not self._running:
+            self.inline += 1
+            await self._handle(event)
+            return True
+
+        queue = self._queues[hash(sender_id) % self.workers]
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.blocked += 1
+            try:
+                await asyncio.wait_for(queue.put(event), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                log.warning("Webhook queue full, dropped message from %s", sender_id)
+                return False
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.depth())
+        return True
+
+    async def _handle(self, event: WebhookEvent) -> None:
+        """Run the handler for one event, counting failures instead of raising."""
+        try:
+            await self.handler(event)
+            self.processed += 1
+        except Exception:
+            self.failed += 1
+            log.exception("Failed to process webhook event from %s", event.sender_id)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """Start one shard's events in arrival order, waiting for a free slot."""
+        while True:
+            event = await queue.get()
+            try:
+                await self._slots.acquire()
+                self.queue_wait_total += time.monotonic() - event.received_at
+                previous = self._last.get(event.sender_id)
+                task = asyncio.create_task(self._run(event, previous))
+                self._last[event.sender_id] = task
+                self._active.add(task)
+                task.add_done_callback(functools.partial(self._finished, event.sender_id))
+            finally:
+                queue.task_done()
+
+    async def _run(self, event: WebhookEvent, previous: Optional[asyncio.Task]) -> None:
+        """Handle an event once the sender's previous event is done."""
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await self._handle(event)
+        finally:
+            self._slots.release()
+
+    def _finished(self, sender_id: str, task: asyncio.Task) -> None:
+        self._active.discard(task)
+        if self._last.get(sender_id) is task:
+            del self._last[sender_id]
+
+    def stats(self, reset_max: bool = False) -> dict:
+        """
+        Return queue and backpressure statistics.
+
+        Args:
+            reset_max (bool): Reset the depth high-water mark after reading it.
+
+        Returns:
+            dict: Depth, capacity and event counters.
+        """
+        queued = self.processed + self.failed - self.inline
+        stats = {
+            "running": self._running,
+            "workers": self.workers,
+            "capacity": self.shard_size * self.workers,
+            "depth": self.depth(),
+            "in_flight": len(self._active),
+            "max_in_flight": self.max_in_flight,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "inline": self.inline,
+            "avg_queue_wait": self.queue_wait_total / queued if queued > 0 else 0.0,
+        }
+        if reset_max:
+            self.max_depth = self.depth()
+        return stats
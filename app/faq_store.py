@@ -0,0 +1,209 @@
+"""
+Lightweight reader/writer for the FAQ CSV file.
+
+Streams the file with the standard csv module instead of pandas, while
+reproducing what `pd.read_csv(path, dtype=str).fillna("")` returned:
+- a UTF-8 byte order mark is ignored (files are written as utf-8-sig);
+- blank lines are skipped;
+- missing cells and pandas' default NA markers ("NA", "null", "nan", ...)
+  become empty strings;
+- other values are kept verbatim (no whitespace stripping).
+
+open_faq_rows() also reports the byte offset after each row, so a reader
+can resume from the middle of the file (cursor pagination) without parsing
+the rows before it again.
+"""
+
+import csv
+import os
+import tempfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Column names used by the FAQ file
+FAQ_COLUMNS = ["question", "answer"]
+
+# Strings pandas.read_csv treats as missing values by default
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+})
+
+# (mtime_ns, size, inode) of the CSV file, or None if it does not exist
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    """
+    Return a cheap fingerprint of a file used to detect modifications.
+
+    Args:
+        path (str): Path of the file to inspect.
+
+    Returns:
+        FileSignature: (mtime_ns, size, inode) or None if the file is missing.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _record(header: List[str], row: List[str]) -> Dict[str, str]:
+    """Map a CSV row onto the header, with NA markers as empty strings."""
+    values = [("" if v in NA_VALUES else v) for v in row[:len(header)]]
+    values.extend([""] * (len(header) - len(values)))
+    return dict(zip(header, values))
+
+
+def iter_faq_rows(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream the rows of a FAQ CSV file as dicts keyed by header name.
+
+    Args:
+        path (str): Path of the CSV file.
+
+    Yields:
+        Dict[str, str]: One row; every header column is present.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = None
+        for row in reader:
+            if not row:
+                continue  # Blank line
+            if header is None:
+                header = row
+                continue
+            yield _record(header, row)
+
+
+def _offset_lines(f: BinaryIO, offset: List[int]) -> Iterator[str]:
+    """Decoded lines of a binary file; offset[0] tracks the bytes consumed."""
+    for raw in iter(f.readline, b""):
+        text = raw.decode("utf-8")
+        if offset[0] == 0 and text.startswith("\ufeff"):
+            text = text[1:]  # Byte order mark
+        offset[0] += len(raw)
+        yield text
+
+
+def _offset_rows(f: BinaryIO, start: int) -> Iterator[Tuple[Dict[str, str], int]]:
+    """Rows of an open FAQ file with the offset just past each one."""
+    with f:
+        offset = [0]
+        # csv.reader pulls exactly the lines of one record per row, so the
+        # offset is at a record boundary whenever a row is returned
+        reader = csv.reader(_offset_lines(f, offset))
+        header = next((row for row in reader if row), None)
+        if header is None:
+            return
+        if start > offset[0]:
+            f.seek(start)
+            offset[0] = start
+            reader = csv.reader(_offset_lines(f, offset))
+        for row in reader:
+            if row:
+                yield _record(header, row), offset[0]
+
+
+def open_faq_rows(path: str, start: int = 0) -> Iterator[Tuple[Dict[str, str], int]]:
+    """
+    Open a FAQ CSV file and stream its rows with their end offsets.
+
+    The file is opened before this returns, so the rows come from the file
+    as it is now even if it is replaced while they are being read.
+
+    Args:
+        path (str): Path of the CSV file.
+        start (int): Offset returned with an earlier row of the same file;
+            reading resumes with the row after it.
+
+    Returns:
+        Iterator[Tuple[Dict[str, str], int]]: (row, offset just past it).
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    return _offset_rows(open(path, "rb"), start)
+
+
+def read_faq_records(path: str) -> List[Dict[str, str]]:
+    """
+    Read all rows of a FAQ CSV file, e.g. for the /faq-data endpoint.
+
+    Args:
+        path (str): Path of the CSV file.
+
+    Returns:
+        List[Dict[str, str]]: Rows in file order.
+    """
+    return list(iter_faq_rows(path))
+
+
+def read_faq_pairs(path: str) -> List[Tuple[str, str]]:
+    """
+    Read the FAQ file as stripped (question, answer) tuples.
+
+    Args:
+        path (str): Path of the CSV file.
+
+    Returns:
+        List[Tuple[str, str]]: Pairs in file order.
+    """
+    return [
+        (row.get("question", "").strip(), row.get("answer", "").strip())
+        for row in iter_faq_rows(path)
+    ]
+
+
+def write_faq(path: str, records: Iterable[Dict[str, object]]) -> int:
+    """
+    Atomically write FAQ records as a utf-8-sig CSV file.
+
+    The file is written to a temporary file in the same directory and then
+    renamed over the target, so readers never see a partial file. Columns
+    are the union of all record keys in first-seen order (question and
+    answer first), and None values are written as empty cells.
+
+    Args:
+        path (str): Destination CSV path.
+        records (Iterable[Dict[str, object]]): Rows to write.
+
+    Returns:
+        int: Number of rows written.
+    """
+    records = list(records)
+    columns = list(FAQ_COLUMNS)
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777  # Keep the permissions of the file we replace
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(prefix=".faq-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(columns)
+            for record in records:
+                writer.writerow(["" if record.get(c) is None else str(record.get(c)) for c in columns])
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return len(records)
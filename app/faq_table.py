@@ -0,0 +1,196 @@
+"""
+Streaming, versioned view of the FAQ table for editor tools (/faq-data).
+
+The table is the CSV file with the pending journal edits applied. It is
+streamed row by row from the file instead of being loaded into memory, and
+carries a version string (derived from the CSV and journal file state, so
+it is the same in every worker process) used as ETag and to validate
+pagination cursors.
+"""
+
+import base64
+import hashlib
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from app.faq_store import FileSignature, open_faq_rows
+from app.overlay import FAQOverlay
+
+# Rows serialized per chunk of the streamed JSON body
+CHUNK_ROWS = 256
+
+
+def table_version(signature: FileSignature, journal_state: Optional[Tuple[int, int]]) -> str:
+    """
+    Version of the FAQ table as stored on disk.
+
+    Args:
+        signature (FileSignature): Signature of the CSV file.
+        journal_state (Optional[Tuple[int, int]]): FAQJournal.stat().
+
+    Returns:
+        str: Short hex digest; changes whenever the table may have changed.
+    """
+    return hashlib.blake2b(repr((signature, journal_state)).encode(), digest_size=8).hexdigest()
+
+
+class TableCursor(NamedTuple):
+    """Where the next page of the table starts."""
+
+    version: str  # Table version the cursor belongs to
+    row_id: int   # Next row: CSV row number, or journal-appended row id after them
+    offset: int   # Byte offset of that row in the CSV file
+
+    def encode(self) -> str:
+        """Opaque token for the API."""
+        raw = f"{self.version}:{self.row_id}:{self.offset}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "TableCursor":
+        """
+        Parse a token created by encode().
+
+        Raises:
+            ValueError: If the token is malformed.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            version, row_id, offset = raw.split(":")
+            cursor = cls(version, int(row_id), int(offset))
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor") from None
+        if cursor.row_id < 0 or cursor.offset < 0:
+            raise ValueError("Invalid cursor")
+        return cursor
+
+
+class FAQTable:
+    """
+    One consistent pass over the FAQ table, opened by FAQBot.open_table().
+
+    Iterating yields (record, cursor of the following row).
+    """
+
+    def __init__(
+        self,
+        version: str,
+        csv_path: str,
+        base_rows: int,
+        plan: Optional[FAQOverlay],
+        start: Optional[TableCursor] = None,
+    ) -> None:
+        """
+        Open the CSV file at the cursor position.
+
+        Args:
+            version (str): table_version() of the files being read.
+            csv_path (str): FAQ CSV file.
+            base_rows (int): Number of rows in the CSV file.
+            plan (Optional[FAQOverlay]): Journal edits over the CSV rows, if any.
+            start (Optional[TableCursor]): Resume after an earlier page.
+        """
+        self.version = version
+        self.base_rows = base_rows
+        self.plan = plan
+        self._row_id = start.row_id if start else 0
+        self._offset = start.offset if start else 0
+        self._rows: Iterator[Tuple[Dict[str, str], int]] = iter(())
+        if self._row_id < base_rows:
+            try:
+                self._rows = open_faq_rows(csv_path, self._offset)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Close the CSV file if the table was not read to the end."""
+        close = getattr(self._rows, "close", None)
+        if close is not None:
+            close()
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, str], TableCursor]]:
+        changes = self.plan.changes if self.plan is not None else {}
+        row_id, offset = self._row_id, self._offset
+        try:
+            for record, offset in self._rows:
+                pair = changes[row_id] if row_id in changes else record
+                row_id += 1
+                if pair is None:
+                    continue  # Deleted
+                if pair is not record:
+                    record = dict(record, question=pair[0], answer=pair[1])
+                yield record, TableCursor(self.version, row_id, offset)
+            if self.plan is not None:
+                for row_id in range(max(row_id, self.base_rows), self.plan.next_id):
+                    pair = changes.get(row_id)
+                    if pair is not None:
+                        yield {"question": pair[0], "answer": pair[1]}, TableCursor(self.version, row_id + 1, offset)
+        finally:
+            self.close()
+
+
+def _dumps(record: Dict[str, str]) -> str:
+    return json.dumps(record, ensure_ascii=False)
+
+
+def iter_json(table: FAQTable, limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Serialize a table as a streamed JSON body.
+
+    Without a limit the body is the plain list of rows. With a limit it is
+    one page: {"version": ..., "items": [...], "next_cursor": ...}, where
+    next_cursor is null on the last page.
+
+    Args:
+        table (FAQTable): Opened table.
+        limit (Optional[int]): Page size.
+
+    Yields:
+        bytes: UTF-8 chunks of the body.
+    """
+    rows = iter(table)
+    next_cursor = None
+    yield (b"[" if limit is None else b'{"version": "%s", "items": [' % table.version.encode())
+    try:
+        count = 0
+        batch = []
+        last_cursor = None
+        for record, cursor in rows:
+            if limit is not None and count == limit:
+                next_cursor = last_cursor  # A further row exists
+                break
+            batch.append(_dumps(record))
+            last_cursor = cursor
+            count += 1
+            if len(batch) == CHUNK_ROWS:
+                yield ((", " if count > CHUNK_ROWS else "") + ", ".join(batch)).encode("utf-8")
+                batch = []
+        if batch:
+            yield ((", " if count > len(batch) else "") + ", ".join(batch)).encode("utf-8")
+    finally:
+        table.close()
+    if limit is None:
+        yield b"]"
+    else:
+        token = json.dumps(next_cursor.encode() if next_cursor else None)
+        yield ('], "next_cursor": %s}' % token).encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compress a streamed body chunk by chunk.
+
+    Args:
+        chunks (Iterable[bytes]): Uncompressed body.
+        level (int): zlib compression level.
+
+    Yields:
+        bytes: gzip stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
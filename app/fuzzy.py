@@ -0,0 +1,241 @@
+"""
+Ranked fuzzy matching for FAQ questions.
+
+Questions are embedded once per FAQ snapshot as L2-normalized character
+n-gram TF-IDF vectors in a sparse matrix. A message is scored against every
+question with one sparse matrix-vector product, which tolerates typos and
+works for Thai text without word boundaries.
+"""
+
+import math
+from collections import Counter
+from typing import Collection, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.matcher import normalize_key
+
+# Character n-gram lengths used for the vectors
+NGRAM_RANGE: Tuple[int, int] = (2, 3)
+
+
+class RankedMatch(NamedTuple):
+    """A question index with its cosine similarity to the message."""
+
+    index: int
+    score: float
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = NGRAM_RANGE) -> Counter:
+    """
+    Count the character n-grams of a normalized text.
+
+    The text is padded with spaces so word boundaries become features too.
+
+    Args:
+        text (str): Normalized text.
+        ngram_range (Tuple[int, int]): Minimum and maximum n-gram length.
+
+    Returns:
+        Counter: n-gram -> occurrence count.
+    """
+    padded = f" {text} "
+    low, high = ngram_range
+    grams = Counter()
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+
+class FuzzyIndex:
+    """
+    Character n-gram TF-IDF index over the questions of one FAQ snapshot.
+    """
+
+    def __init__(self, questions: Sequence[str], ngram_range: Tuple[int, int] = NGRAM_RANGE) -> None:
+        """
+        Vectorize all questions.
+
+        Args:
+            questions (Sequence[str]): Questions in FAQ file order.
+            ngram_range (Tuple[int, int]): Minimum and maximum n-gram length.
+        """
+        self.ngram_range = ngram_range
+        self.size = len(questions)
+
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[float] = []
+        for row, question in enumerate(questions):
+            key = normalize_key(question)
+            if not key:
+                continue  # Empty questions can never be ranked
+            for gram, count in char_ngrams(key, ngram_range).items():
+                rows.append(row)
+                cols.append(vocab.setdefault(gram, len(vocab)))
+                counts.append(count)
+
+        # Smoothed inverse document frequency, as in scikit-learn
+        df = np.bincount(np.asarray(cols, dtype=np.int64), minlength=len(vocab))
+        self.idf = np.log((1.0 + self.size) / (1.0 + df)) + 1.0
+        self.unknown_idf = math.log(1.0 + self.size) + 1.0
+
+        # Stored column-wise so a query only touches the postings of its n-grams
+        weights = np.asarray(counts, dtype=np.float64) * self.idf[cols]
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(self.size, len(vocab)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0.0] = 1.0
+        self.matrix = sparse.csc_matrix(sparse.diags(1.0 / norms) @ matrix)
+        self.vocab = vocab
+
+    def __len__(self) -> int:
+        """Number of questions in the index."""
+        return self.size
+
+    def text_vector(self, key: str) -> Dict[str, float]:
+        """
+        L2-normalized TF-IDF vector of a normalized text in this index's space.
+
+        n-grams missing from the vocabulary get the highest IDF, so they still
+        lower the similarity to every question.
+
+        Args:
+            key (str): Normalized text.
+
+        Returns:
+            Dict[str, float]: n-gram -> weight (empty for an empty text).
+        """
+        vector = {}
+        for gram, count in char_ngrams(key, self.ngram_range).items():
+            col = self.vocab.get(gram)
+            vector[gram] = count * (float(self.idf[col]) if col is not None else self.unknown_idf)
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {gram: w / norm for gram, w in vector.items()} if norm else {}
+
+    def _touched_scores(self, message: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score only the questions sharing at least one n-gram with the message.
+
+        Args:
+            message (str): Raw user message.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ascending question indices and their scores.
+        """
+        cols: List[int] = []
+        weights: List[float] = []
+        for gram, weight in self.text_vector(normalize_key(message)).items():
+            col = self.vocab.get(gram)
+            if col is not None:
+                cols.append(col)
+                weights.append(weight)
+        if not cols:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Sparse mat-vec restricted to the query's columns
+        m = self.matrix
+        cols = np.asarray(cols)
+        starts = m.indptr[cols]
+        lengths = m.indptr[cols + 1] - starts
+        # Positions of all stored entries of the selected columns, in one array
+        picks = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        contrib = m.data[picks] * np.repeat(np.asarray(weights), lengths)
+        rows, inverse = np.unique(m.indices[picks], return_inverse=True)
+        return rows, np.bincount(inverse, weights=contrib)
+
+    def scores(self, message: str) -> np.ndarray:
+        """
+        Cosine similarity of the message to every question.
+
+        Args:
+            message (str): Raw user message.
+
+        Returns:
+            np.ndarray: One score per question, in FAQ file order.
+        """
+        rows, touched = self._touched_scores(message)
+        scores = np.zeros(self.size)
+        scores[rows] = touched
+        return scores
+
+    def top_k(
+        self, message: str, k: int = 3, min_score: float = 0.0, exclude: Optional[Collection[int]] = None
+    ) -> List[RankedMatch]:
+        """
+        Return the k best-scoring questions for a message.
+
+        Args:
+            message (str): Raw user message.
+            k (int): Maximum number of results.
+            min_score (float): Results scoring below this are dropped.
+            exclude (Optional[Collection[int]]): Question indices to leave out.
+
+        Returns:
+            List[RankedMatch]: Best first; ties keep FAQ file order.
+        """
+        if k <= 0 or self.size == 0:
+            return []
+        rows, scores = self._touched_scores(message)
+        keep = scores >= min_score
+        if exclude:
+            keep &= ~np.isin(rows, np.fromiter(exclude, dtype=np.int64, count=len(exclude)))
+        rows, scores = rows[keep], scores[keep]
+        if len(scores) > k:
+            # Keep everything tied with the k-th best score so ties resolve by index
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth - 1e-12
+            rows, scores = rows[keep], scores[keep]
+        # Rounded so equal questions tie exactly despite floating-point noise
+        order = np.lexsort((rows, -np.round(scores, 12)))[:k]
+        return [RankedMatch(int(rows[i]), float(scores[i])) for i in order if scores[i] > 0.0]
+
+    def best_many(self, messages: Sequence[str], min_score: float = 0.0, chunk: int = 1024) -> List[Optional[RankedMatch]]:
+        """
+        Best question for each of many messages, scored with one sparse
+        matrix product per chunk of messages.
+
+        Args:
+            messages (Sequence[str]): Raw user messages.
+            min_score (float): Results scoring below this are dropped.
+            chunk (int): Messages scored per product (bounds memory).
+
+        Returns:
+            List[Optional[RankedMatch]]: top_k(message, 1, min_score)[0] per
+                message, None where top_k() would return nothing.
+        """
+        results: List[Optional[RankedMatch]] = []
+        transposed = self.matrix.T.tocsr() if self.size else None
+        for start in range(0, len(messages), chunk):
+            part = messages[start:start + chunk]
+            rows: List[int] = []
+            cols: List[int] = []
+            weights: List[float] = []
+            for i, message in enumerate(part):
+                for gram, weight in self.text_vector(normalize_key(message)).items():
+                    col = self.vocab.get(gram)
+                    if col is not None:
+                        rows.append(i)
+                        cols.append(col)
+                        weights.append(weight)
+            if transposed is None or not rows:
+                results.extend([None] * len(part))
+                continue
+            query = sparse.csr_matrix((weights, (rows, cols)), shape=(len(part), len(self.vocab)))
+            scores = (query @ transposed).tocsr()
+            for i in range(len(part)):
+                lo, hi = scores.indptr[i], scores.indptr[i + 1]
+                values = scores.data[lo:hi]
+                keep = (values >= min_score) & (values > 0.0)
+                if not keep.any():
+                    results.append(None)
+                    continue
+                values, indices = values[keep], scores.indices[lo:hi][keep]
+                # Same tie rule as top_k(): rounded score, then smallest index
+                rounded = np.round(values, 12)
+                ties = np.flatnonzero(rounded == rounded.max())
+                best = ties[np.argmin(indices[ties])]
+                results.append(RankedMatch(int(indices[best]), float(values[best])))
+        return results
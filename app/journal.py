@@ -0,0 +1,279 @@
+"""
+Append-only journal of single-entry FAQ edits.
+
+Create/update/delete requests are appended to `<csv>.journal` (one JSON
+object per line, fsync'ed) instead of rewriting the whole CSV file. The
+first line records the signature of the CSV file the edits apply to, so a
+journal left behind by a replaced or hand-edited CSV is ignored instead of
+being replayed onto the wrong rows. Compaction writes the edited table back
+to the CSV atomically and removes the journal.
+
+Entries address rows by their position in the table at the time of the edit:
+
+    {"op": "create", "question": "...", "answer": "..."}
+    {"op": "update", "row": 3, "question": "...", "answer": "..."}
+    {"op": "delete", "row": 3}
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.faq_store import FileSignature
+
+try:
+    import fcntl  # POSIX only; without it only threads of one process are serialized
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+log = logging.getLogger("uvicorn.error")
+
+# Journal operations
+OPERATIONS = ("create", "update", "delete")
+
+
+class JournalPosition(NamedTuple):
+    """How much of a journal file a snapshot reflects."""
+
+    inode: int
+    offset: int   # Bytes of complete lines consumed
+    entries: int  # Edits applied from this file
+    valid: bool   # The header matched the CSV file the snapshot was built from
+
+
+def _decode_signature(value) -> FileSignature:
+    """Signature stored in a journal header (JSON list or null)."""
+    return tuple(value) if value is not None else None
+
+
+def check_entry(entry: Dict[str, object], rows: int) -> int:
+    """
+    Validate one journal entry against a table.
+
+    Args:
+        entry (Dict[str, object]): Journal entry.
+        rows (int): Number of rows the entry is applied to.
+
+    Returns:
+        int: Position of the row the entry creates, updates or deletes.
+
+    Raises:
+        ValueError: If the entry is malformed.
+        IndexError: If the row does not exist.
+    """
+    op = entry.get("op")
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown FAQ journal operation: {op!r}")
+    if op != "delete" and not (isinstance(entry.get("question"), str) and isinstance(entry.get("answer"), str)):
+        raise ValueError(f"FAQ {op} needs a question and an answer")
+    if op == "create":
+        return rows
+    row = entry.get("row")
+    if not isinstance(row, int) or isinstance(row, bool):
+        raise ValueError(f"FAQ {op} needs a row number")
+    if not 0 <= row < rows:
+        raise IndexError(f"FAQ row {row} does not exist")
+    return row
+
+
+def apply_entries(records: List[Dict[str, str]], entries: List[Dict[str, object]]) -> List[Dict[str, str]]:
+    """
+    Apply journal entries to CSV records in place (used by compaction).
+
+    Invalid entries are skipped, as they are when the journal is replayed.
+
+    Args:
+        records (List[Dict[str, str]]): Rows read from the CSV file.
+        entries (List[Dict[str, object]]): Journal entries in order.
+
+    Returns:
+        List[Dict[str, str]]: The same list, edited.
+    """
+    for entry in entries:
+        try:
+            row = check_entry(entry, len(records))
+        except (ValueError, IndexError):
+            continue
+        op = entry["op"]
+        if op == "create":
+            records.append({"question": entry["question"], "answer": entry["answer"]})
+        elif op == "update":
+            records[row]["question"] = entry["question"]
+            records[row]["answer"] = entry["answer"]
+        else:
+            del records[row]
+    return records
+
+
+def is_continuation(position: Optional[JournalPosition], state: Optional[Tuple[int, int]]) -> bool:
+    """
+    Whether the journal file on disk only grew since position was read.
+
+    Args:
+        position (Optional[JournalPosition]): Position a snapshot reflects
+            (None if there was no journal file).
+        state (Optional[Tuple[int, int]]): Current FAQJournal.stat().
+
+    Returns:
+        bool: False if the journal was removed or replaced in the meantime.
+    """
+    if state is None:
+        return position is None
+    if position is None:
+        return True  # A new journal; it is read from its first line
+    return position.inode == state[0] and position.offset <= state[1]
+
+
+class FAQJournal:
+    """
+    Write-ahead journal of FAQ edits stored next to the CSV file.
+    """
+
+    def __init__(self, csv_path: str) -> None:
+        """
+        Args:
+            csv_path (str): FAQ CSV file the edits apply to.
+        """
+        self.csv_path = csv_path
+        self.path = csv_path + ".journal"
+        self.lock_path = self.path + ".lock"
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Hold the journal write lock (across threads and worker processes).
+
+        Every change to the journal or to the CSV file it belongs to is made
+        while holding it.
+        """
+        with self._thread_lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)  # Also releases the flock
+
+    def stat(self) -> Optional[Tuple[int, int]]:
+        """
+        Cheap change check of the journal file.
+
+        Returns:
+            Optional[Tuple[int, int]]: (inode, size), or None if there is no journal.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size)
+
+    def read(self, signature: FileSignature, position: Optional[JournalPosition] = None) -> Tuple[List[dict], Optional[JournalPosition]]:
+        """
+        Read the entries appended after a position.
+
+        Only complete lines are consumed, so an append in progress (or torn
+        by a crash) is picked up later or ignored.
+
+        Args:
+            signature (FileSignature): Signature of the CSV file the entries
+                would be applied to.
+            position (Optional[JournalPosition]): Position returned by an
+                earlier read of the same file, or None to read it all.
+
+        Returns:
+            Tuple[List[dict], Optional[JournalPosition]]: New entries (none if
+                the journal belongs to another version of the CSV file) and the
+                new position (None if there is no journal).
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], None
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            if position is None or position.inode != inode:
+                position = JournalPosition(inode, 0, 0, False)
+            f.seek(position.offset)
+            data = f.read()
+
+        consumed = data.rfind(b"\n") + 1
+        valid = position.valid
+        entries = []
+        for line in data[:consumed].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                log.warning("Skipping unreadable line in %s", self.path)
+                continue
+            if "base" in entry:
+                valid = _decode_signature(entry["base"]) == signature
+                if not valid:
+                    log.warning("Ignoring %s: it was written for another version of %s", self.path, self.csv_path)
+            elif valid:
+                entries.append(entry)
+        return entries, JournalPosition(inode, position.offset + consumed, position.entries + len(entries), valid)
+
+    def append(self, entry: Dict[str, object], signature: FileSignature) -> None:
+        """
+        Durably append one entry. Must be called while holding locked().
+
+        A missing journal is created with a header for the current CSV
+        file, and a line torn by an earlier crash is cut off first.
+
+        Args:
+            entry (Dict[str, object]): Journal entry.
+            signature (FileSignature): Signature of the CSV file.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                data = os.pread(fd, size, 0)
+                size = data.rfind(b"\n") + 1
+                os.ftruncate(fd, size)
+            lines = []
+            if size == 0:
+                lines.append({"base": signature})
+            lines.append(entry)
+            data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            os.pwrite(fd, data.encode("utf-8"), size)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def reset(self, signature: FileSignature) -> None:
+        """
+        Atomically replace the journal with an empty one for the current
+        CSV file. Must be called while holding locked().
+
+        Args:
+            signature (FileSignature): Signature of the CSV file.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".faq-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"base": signature}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def remove(self) -> None:
+        """Delete the journal (after compaction). Must be called while holding locked()."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
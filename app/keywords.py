@@ -0,0 +1,108 @@
+"""
+Keyword matching for FAQ questions through an inverted word index.
+
+Questions and messages are split into words by the Thai-aware segmenter
+(app.textnorm). A question matches a message when every one of its content
+words occurs in the message, in any order and with any words in between,
+which catches rephrasings that neither the exact nor the substring rule
+sees. The most specific question (most words) wins, ties in file order.
+
+Each question is filed under its rarest word only, so a lookup touches the
+short lists of the message's words and its cost grows with the message
+length rather than with the number of questions.
+"""
+
+from typing import Collection, Dict, FrozenSet, List, NamedTuple, Optional, Sequence
+
+from app.matcher import NO_MATCH, normalize_key
+from app.textnorm import ThaiSegmenter, default_segmenter
+
+# Politeness particles and function words that never count as keywords
+STOPWORDS = frozenset([
+    "ครับ", "ค่ะ", "คะ", "จ้า", "จ้ะ", "นะ", "น่ะ", "ไหม", "มั้ย", "หรือ", "หรอ", "เหรอ", "บ้าง",
+    "ด้วย", "หน่อย", "เลย", "ก็", "คือ", "ที่", "ซึ่ง", "และ", "กับ", "ของ", "ให้", "ได้", "มี", "เป็น",
+    "จะ", "ผม", "ดิฉัน", "ฉัน", "หนู", "เรา", "คุณ", "ท่าน",
+    "a", "an", "the", "is", "are", "am", "do", "does", "i", "you", "we", "to", "of", "for",
+    "in", "on", "at", "and", "or", "it", "my", "your", "please",
+])
+
+
+class KeywordMatch(NamedTuple):
+    """A question index with the number of its keywords found in the message."""
+
+    index: int
+    words: int
+
+
+class KeywordIndex:
+    """
+    Inverted index from keywords to the questions of one FAQ snapshot.
+    """
+
+    def __init__(self, questions: Sequence[str], segmenter: Optional[ThaiSegmenter] = None) -> None:
+        """
+        Segment all questions and build the index.
+
+        Args:
+            questions (Sequence[str]): Questions in FAQ file order.
+            segmenter (Optional[ThaiSegmenter]): Word segmenter, the shared
+                default_segmenter() if not given.
+        """
+        self.segmenter = segmenter or default_segmenter()
+        self.size = len(questions)
+        self._words: List[FrozenSet[str]] = [self.words(normalize_key(q)) for q in questions]
+
+        frequency: Dict[str, int] = {}
+        for words in self._words:
+            for word in words:
+                frequency[word] = frequency.get(word, 0) + 1
+
+        # Rarest word (ties: smallest string, so the choice is stable) -> rows, ascending
+        self._anchored: Dict[str, List[int]] = {}
+        for row, words in enumerate(self._words):
+            if words:
+                anchor = min(words, key=lambda w: (frequency[w], w))
+                self._anchored.setdefault(anchor, []).append(row)
+
+    def __len__(self) -> int:
+        """Number of questions in the index."""
+        return self.size
+
+    def words(self, key: str) -> FrozenSet[str]:
+        """
+        Keywords of a normalized text.
+
+        Args:
+            key (str): Normalized question or message.
+
+        Returns:
+            FrozenSet[str]: Distinct words, without stopwords.
+        """
+        return frozenset(w for w in self.segmenter.tokenize(key) if w not in STOPWORDS)
+
+    def lookup(
+        self, key: str, exclude: Optional[Collection[int]] = None, words: Optional[FrozenSet[str]] = None
+    ) -> Optional[KeywordMatch]:
+        """
+        Find the most specific question whose keywords all occur in a message.
+
+        Args:
+            key (str): Normalized message.
+            exclude (Optional[Collection[int]]): Question indices to leave out.
+            words (Optional[FrozenSet[str]]): words(key), if already computed.
+
+        Returns:
+            Optional[KeywordMatch]: Best question, or None.
+        """
+        if words is None:
+            words = self.words(key)
+        best_row, best_words = NO_MATCH, 0
+        for word in words:
+            for row in self._anchored.get(word, ()):
+                needed = self._words[row]
+                count = len(needed)
+                if count < best_words or (count == best_words and row > best_row):
+                    continue
+                if needed <= words and not (exclude and row in exclude):
+                    best_row, best_words = row, count
+        return None if best_row == NO_MATCH else KeywordMatch(best_row, best_words)
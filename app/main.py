@@ -1,32 +1,59 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
 
 # Import routers
-from app.routes import router as api_router
+from app.routes import router as api_router, dispatcher
 from app.webhook import router as webhook_router
 
 # Import global FAQBot instance
 from app.ai_engine import faq_bot
+from app.messenger import messenger
+from app.sync import run_sync_loop
+from app.attachments import attachments, run_attachment_sync
+from app.capture import capture
+from app.metrics import METRICS_DIR, run_flush_loop
+from app.tenants import tenants
+from app.batch import shutdown_pool
+
+
+# ================= LIFESPAN =================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start-up and shutdown hooks: run the webhook workers, the cross-worker
+    FAQ sync loop, the FAQ image uploads, the optional traffic capture and
+    the metrics flushes, then drain the workers, flush the capture and the
+    metrics, stop the per-page image uploads, close the outbound connection
+    pool and stop the batch worker processes on exit.
+    """
+    capture.start()
+    await dispatcher.start()
+    sync_task = asyncio.create_task(run_sync_loop(faq_bot)) if faq_bot.broadcast else None
+    upload_task = asyncio.create_task(run_attachment_sync(faq_bot)) if attachments.enabled else None
+    metrics_task = asyncio.create_task(run_flush_loop()) if METRICS_DIR else None
+    yield
+    await dispatcher.stop()
+    await asyncio.to_thread(capture.stop)
+    if metrics_task is not None:
+        metrics_task.cancel()  # Flushes once more
+        await asyncio.gather(metrics_task, return_exceptions=True)
+    if upload_task is not None:
+        upload_task.cancel()
+        await asyncio.gather(upload_task, return_exceptions=True)
+    if sync_task is not None:
+        sync_task.cancel()
+        await asyncio.gather(sync_task, return_exceptions=True)
+        faq_bot.broadcast.retire()
+    await tenants.close()
+    await messenger.aclose()
+    await asyncio.to_thread(shutdown_pool)
+
 
 # ================= FASTAPI APP =================
-app = FastAPI(title="FAQ Chatbot")
+app = FastAPI(title="FAQ Chatbot", lifespan=lifespan)
 
 # Include API and webhook routers
 app.include_router(api_router)
 app.include_router(webhook_router)
-
-
-# ================== ENDPOINTS ==================
-@app.post("/reload-faq")
-async def reload_faq() -> JSONResponse:
-    """
-    Reload the FAQ data from the CSV file.
-
-    Returns:
-        JSONResponse: Success message or error details.
-    """
-    try:
-        faq_bot.reload_faq()
-        return JSONResponse(content={"message": "FAQ reloaded successfully"}, status_code=200)
-    except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
@@ -0,0 +1,456 @@
+"""
+Indexed matching engine for FAQ questions.
+
+The index is built once per FAQ snapshot and reproduces the original
+first-match-wins rules of FAQBot without scanning every question:
+
+1. Exact match: the normalized message equals a normalized question.
+2. Partial match: the first question (in file order) that is contained in
+   the message, or that contains the message.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.textnorm import normalize_text
+
+# Sentinel meaning "no question matched"; larger than any question index
+NO_MATCH = 2**31 - 1
+
+# Separator placed between questions in the reverse-lookup corpus
+SEPARATOR = "\x00"
+
+# Transition keys are (state << CHAR_BITS) | ord(char); code points fit in 21 bits
+CHAR_BITS = 21
+
+# Bigram posting lists longer than this are verified with one corpus search instead
+MAX_VERIFY_CANDIDATES = 64
+
+
+class MatchResult(NamedTuple):
+    """Index of the matched question and the rule that matched it."""
+
+    index: int
+    rule: str  # "exact" or "partial"
+
+
+def normalize_key(text: str) -> str:
+    """
+    Normalize a question or message into its lookup key.
+
+    Args:
+        text (str): Raw question or user message.
+
+    Returns:
+        str: Key from textnorm.normalize_text() (NFC, invisible characters
+            removed, Thai marks folded, lowercased, whitespace collapsed).
+    """
+    return normalize_text(text)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton reporting the smallest question index among all
+    patterns that occur in a text, in a single pass over the text.
+
+    Transitions live in one flat dict keyed by (state, code point) instead of
+    a dict per node, which keeps memory reasonable for large FAQ sets.
+
+    Besides the folded smallest id, each state keeps the id of the pattern
+    ending exactly there and a link to the next state on its failure chain
+    that ends a pattern, so every pattern occurrence can be enumerated.
+    """
+
+    def __init__(self, patterns: Sequence[str], ids: Sequence[int]) -> None:
+        """
+        Build the automaton.
+
+        Args:
+            patterns (Sequence[str]): Non-empty patterns to search for.
+            ids (Sequence[int]): Question index reported for each pattern.
+        """
+        delta: Dict[int, int] = {}
+        out = array("i", [NO_MATCH])
+        depth = array("i", [0])
+        edges = array("q", [0])  # Incoming transition key of each state (root: unused)
+
+        # 1. Build the trie; states are numbered in creation order
+        for pattern, pid in zip(patterns, ids):
+            state = 0
+            for ch in pattern:
+                key = (state << CHAR_BITS) | ord(ch)
+                nxt = delta.get(key)
+                if nxt is None:
+                    nxt = len(out)
+                    delta[key] = nxt
+                    out.append(NO_MATCH)
+                    depth.append(depth[state] + 1)
+                    edges.append(key)
+                state = nxt
+            if pid < out[state]:
+                out[state] = pid
+        own = array("i", out)
+
+        # 2. Compute failure links in breadth-first (depth) order and fold
+        #    outputs along them so each state knows its best reachable id
+        fail = array("i", bytes(4 * len(out)))
+        link = array("i", bytes(4 * len(out)))  # Nearest failure-chain state ending a pattern
+        char_mask = (1 << CHAR_BITS) - 1
+        for child in sorted(range(1, len(out)), key=depth.__getitem__):
+            key = edges[child]
+            parent = key >> CHAR_BITS
+            if parent == 0:
+                continue  # Depth-1 states fail to the root
+            ch = key & char_mask
+            f = fail[parent]
+            while True:
+                target = delta.get((f << CHAR_BITS) | ch)
+                if target is not None:
+                    break
+                if f == 0:
+                    target = 0
+                    break
+                f = fail[f]
+            fail[child] = target
+            link[child] = target if own[target] != NO_MATCH else link[target]
+            if out[target] < out[child]:
+                out[child] = out[target]
+
+        self.delta = delta
+        self.fail = fail
+        self.out = out
+        self.own = own
+        self.link = link
+
+    def __len__(self) -> int:
+        """Number of states in the automaton."""
+        return len(self.out)
+
+    def search(self, text: str) -> int:
+        """
+        Return the smallest id of any pattern contained in text.
+
+        Args:
+            text (str): Text to scan.
+
+        Returns:
+            int: Smallest matching id, or NO_MATCH.
+        """
+        delta, fail, out = self.delta, self.fail, self.out
+        state = 0
+        best = NO_MATCH
+        for ch in text:
+            c = ord(ch)
+            while True:
+                nxt = delta.get((state << CHAR_BITS) | c)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if out[state] < best:
+                best = out[state]
+                if best == 0:
+                    break
+        return best
+
+    def search_excluding(self, text: str, exclude: Collection[int], same_next: Sequence[int]) -> int:
+        """
+        Return the smallest id of any pattern contained in text, leaving out
+        excluded ids.
+
+        Occurrences are enumerated through the output links; an excluded id
+        gives way to the next id of an equal pattern.
+
+        Args:
+            text (str): Text to scan.
+            exclude (Collection[int]): Ids to leave out.
+            same_next (Sequence[int]): Next id with the same pattern, or NO_MATCH.
+
+        Returns:
+            int: Smallest matching id, or NO_MATCH.
+        """
+        delta, fail, out, own, link = self.delta, self.fail, self.out, self.own, self.link
+        state = 0
+        best = NO_MATCH
+        for ch in text:
+            c = ord(ch)
+            while True:
+                nxt = delta.get((state << CHAR_BITS) | c)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            hit = state if own[state] != NO_MATCH else link[state]
+            while hit and out[hit] < best:  # out[] bounds every id further down the chain
+                pid = own[hit]
+                while pid in exclude:
+                    pid = same_next[pid]
+                if pid < best:
+                    best = pid
+                hit = link[hit]
+        return best
+
+
+def same_key_chain(keys: Sequence[str]) -> array:
+    """
+    Link every row to the next row with the same key.
+
+    Args:
+        keys (Sequence[str]): Normalized questions in file order.
+
+    Returns:
+        array: Next row with an equal key per row, or NO_MATCH.
+    """
+    chain = array("i", [NO_MATCH]) * len(keys)
+    following: Dict[str, int] = {}
+    for row in range(len(keys) - 1, -1, -1):
+        chain[row] = following.get(keys[row], NO_MATCH)
+        following[keys[row]] = row
+    return chain
+
+
+def bigram_key(a: str, b: str) -> int:
+    """Pack two characters into one integer key."""
+    return (ord(a) << CHAR_BITS) | ord(b)
+
+
+def scan_rules(key: str, rows: Iterable[Tuple[int, str]]) -> Tuple[int, int]:
+    """
+    Apply the exact and partial rules by linear scan.
+
+    Used for the few rows that are not covered by a prebuilt index.
+
+    Args:
+        key (str): Normalized message.
+        rows (Iterable[Tuple[int, str]]): (row id, normalized question) pairs.
+
+    Returns:
+        Tuple[int, int]: Smallest exact row id and smallest partial row id
+            (NO_MATCH when there is none).
+    """
+    exact = partial = NO_MATCH
+    for row, question in rows:
+        if question == key:
+            exact = min(exact, row)
+        elif question and (question in key or key in question):
+            partial = min(partial, row)
+    return exact, partial
+
+
+class BaseMatcher:
+    """
+    Matching rules shared by all index implementations.
+
+    Subclasses provide key(), exact(), _contained() and _containing().
+    Every lookup can leave out a set of rows, which the overlay uses for
+    rows whose edits replace them.
+    """
+
+    def key(self, row: int) -> str:
+        """
+        Normalized question of a row.
+
+        Args:
+            row (int): Question index.
+
+        Returns:
+            str: The lookup key the index was built from.
+        """
+        raise NotImplementedError
+
+    def exact(self, key: str, exclude: Optional[Collection[int]] = None) -> Optional[int]:
+        """
+        Look up the first question equal to a normalized key.
+
+        Args:
+            key (str): Normalized message.
+            exclude (Optional[Collection[int]]): Question indices to leave out.
+
+        Returns:
+            Optional[int]: Question index or None.
+        """
+        raise NotImplementedError
+
+    def _contained(self, key: str, exclude: Optional[Collection[int]] = None) -> int:
+        """Smallest index of a non-empty question contained in key, or NO_MATCH."""
+        raise NotImplementedError
+
+    def _containing(self, key: str, limit: int, exclude: Optional[Collection[int]] = None) -> int:
+        """Smallest question index below limit whose text contains key, or NO_MATCH."""
+        raise NotImplementedError
+
+    def partial(self, key: str, exclude: Optional[Collection[int]] = None) -> Optional[int]:
+        """
+        Find the first question that is contained in, or contains, the key.
+
+        Args:
+            key (str): Normalized message.
+            exclude (Optional[Collection[int]]): Question indices to leave out.
+
+        Returns:
+            Optional[int]: Question index or None.
+        """
+        best = self._contained(key, exclude)
+        best = min(best, self._containing(key, best, exclude))
+        return None if best == NO_MATCH else best
+
+    def match(self, key: str) -> Optional[MatchResult]:
+        """
+        Apply the exact rule, then the partial rule.
+
+        Args:
+            key (str): Normalized message.
+
+        Returns:
+            Optional[MatchResult]: Matched question and rule, or None.
+        """
+        index = self.exact(key)
+        if index is not None:
+            return MatchResult(index, "exact")
+        index = self.partial(key)
+        if index is not None:
+            return MatchResult(index, "partial")
+        return None
+
+
+class FAQMatcher(BaseMatcher):
+    """
+    In-memory match index over the questions of one FAQ snapshot.
+
+    - Exact matches use a hash index of normalized questions.
+    - "Question contained in message" uses an Aho-Corasick automaton.
+    - "Message contained in question" uses a bigram inverted index to verify
+      only questions sharing the message's rarest bigram, falling back to one
+      C-level substring search over all questions joined in file order (the
+      first hit is also the first matching question).
+    """
+
+    def __init__(self, questions: Sequence[str]) -> None:
+        """
+        Build the index.
+
+        Args:
+            questions (Sequence[str]): Questions in FAQ file order.
+        """
+        keys = [normalize_key(q) for q in questions]
+        self._keys = keys
+
+        # Exact index: first occurrence wins
+        self._exact: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            self._exact.setdefault(key, i)
+        self._same_next = same_key_chain(keys)
+
+        # Empty questions never take part in partial matching
+        ids = [i for i, key in enumerate(keys) if key]
+        patterns = [keys[i] for i in ids]
+
+        self._automaton = AhoCorasick(patterns, ids)
+
+        # Reverse lookup corpus: "q0\x00q1\x00..." with start offsets per slot
+        self._corpus = SEPARATOR.join(patterns)
+        self._corpus_ids = array("i", ids)
+        self._starts = array("l")
+        offset = 0
+        for pattern in patterns:
+            self._starts.append(offset)
+            offset += len(pattern) + 1
+        # A separator inside a question would break the slot boundaries
+        self._corpus_safe = not any(SEPARATOR in p for p in patterns)
+        self._patterns = patterns
+
+        # Bigram -> ascending corpus slots of the questions containing it
+        self._bigrams: Dict[str, array] = {}
+        for slot, pattern in enumerate(patterns):
+            for gram in {pattern[i:i + 2] for i in range(len(pattern) - 1)}:
+                postings = self._bigrams.get(gram)
+                if postings is None:
+                    postings = self._bigrams[gram] = array("i")
+                postings.append(slot)
+
+    def __len__(self) -> int:
+        """Number of questions indexed."""
+        return len(self._keys)
+
+    def key(self, row: int) -> str:
+        """See BaseMatcher.key()."""
+        return self._keys[row]
+
+    def exact(self, key: str, exclude: Optional[Collection[int]] = None) -> Optional[int]:
+        """See BaseMatcher.exact()."""
+        row = self._exact.get(key)
+        if exclude:
+            while row in exclude:
+                row = self._same_next[row]
+            if row == NO_MATCH:
+                return None
+        return row
+
+    def _contained(self, key: str, exclude: Optional[Collection[int]] = None) -> int:
+        """Smallest index of a non-empty question contained in key, or NO_MATCH."""
+        if exclude:
+            return self._automaton.search_excluding(key, exclude, self._same_next)
+        return self._automaton.search(key)
+
+    def _containing(self, key: str, limit: int, exclude: Optional[Collection[int]] = None) -> int:
+        """
+        Smallest question index below limit whose text contains key.
+
+        Args:
+            key (str): Normalized message.
+            limit (int): Only questions with a smaller index are considered.
+            exclude (Optional[Collection[int]]): Question indices to leave out.
+
+        Returns:
+            int: Question index or NO_MATCH.
+        """
+        exclude = exclude or ()
+        ids = self._corpus_ids
+        if not ids:
+            return NO_MATCH
+        end_slot = bisect_left(ids, limit)
+        if end_slot == 0:
+            return NO_MATCH
+
+        # Every question containing key contains all of its bigrams, so the
+        # rarest bigram's posting list is a complete candidate set
+        if len(key) >= 2:
+            candidates = None
+            for i in range(len(key) - 1):
+                postings = self._bigrams.get(key[i:i + 2])
+                if postings is None:
+                    return NO_MATCH
+                if candidates is None or len(postings) < len(candidates):
+                    candidates = postings
+            if len(candidates) <= MAX_VERIFY_CANDIDATES:
+                patterns = self._patterns
+                for slot in candidates:
+                    if slot >= end_slot:
+                        break
+                    if key in patterns[slot] and ids[slot] not in exclude:
+                        return ids[slot]
+                return NO_MATCH
+
+        if not self._corpus_safe or SEPARATOR in key:
+            for slot in range(end_slot):
+                if key in self._patterns[slot] and ids[slot] not in exclude:
+                    return ids[slot]
+            return NO_MATCH
+
+        end = self._starts[end_slot] if end_slot < len(ids) else len(self._corpus)
+        start = 0
+        while True:
+            pos = self._corpus.find(key, start, end)
+            if pos < 0:
+                return NO_MATCH
+            slot = bisect_right(self._starts, pos) - 1
+            if ids[slot] not in exclude:
+                return ids[slot]
+            if slot + 1 == len(ids):
+                return NO_MATCH
+            start = self._starts[slot + 1]  # Resume the search after the excluded question
@@ -1,11 +1,307 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+import httpx
 import requests
-from app.utils import PAGE_ACCESS_TOKEN, FB_API_URL  # Securely import tokens and URLs
+from app.utils import (  # Securely import tokens and URLs
+    PAGE_ACCESS_TOKEN,
+    FB_API_URL,
+    FB_MAX_CONNECTIONS,
+    FB_MAX_CONCURRENCY,
+    FB_MAX_RETRIES,
+    FB_TIMEOUT,
+    FB_ATTACHMENT_URL,
+)
+from app import metrics
+from app.scheduler import SendScheduler
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ================== PAYLOADS ==================
+
+def text_payload(recipient_id: str, text: str) -> dict:
+    """Build the Graph API payload for a text message."""
+    return {
+        "recipient": {"id": recipient_id},
+        "message": {"text": text}
+    }
+
+
+def image_payload(recipient_id: str, image_url: str) -> dict:
+    """Build the Graph API payload for an image message."""
+    return {
+        "recipient": {"id": recipient_id},
+        "message": {
+            "attachment": {
+                "type": "image",
+                "payload": {"url": image_url, "is_reusable": True}
+            }
+        }
+    }
+
+
+def attachment_payload(recipient_id: str, attachment_id: str, kind: str = "image") -> dict:
+    """Build the Graph API payload for a message reusing an uploaded attachment."""
+    return {
+        "recipient": {"id": recipient_id},
+        "message": {
+            "attachment": {
+                "type": kind,
+                "payload": {"attachment_id": attachment_id}
+            }
+        }
+    }
+
+
+def upload_payload(image_url: str) -> dict:
+    """Build the Attachment Upload API payload for a reusable image."""
+    return {
+        "message": {
+            "attachment": {
+                "type": "image",
+                "payload": {"url": image_url, "is_reusable": True}
+            }
+        }
+    }
+
+
+def payload_kind(payload: dict) -> str:
+    """Message kind of a payload for metrics: "image" or "text"."""
+    attachment = payload.get("message", {}).get("attachment")
+    return attachment.get("type", "attachment") if isinstance(attachment, dict) else "text"
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds.
+
+    Args:
+        headers: Response headers.
+
+    Returns:
+        Optional[float]: Delay in seconds, or None if absent or not numeric.
+    """
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def response_json(res) -> dict:
+    """
+    Body of a successful Graph API response.
+
+    Args:
+        res: httpx or requests response with a 2xx/3xx status.
+
+    Returns:
+        dict: The decoded JSON object, or {"status": ...} when the body is
+            empty or not a JSON object (the send still succeeded).
+    """
+    try:
+        data = res.json()
+    except ValueError:
+        return {"status": res.status_code}
+    return data if isinstance(data, dict) else {"status": res.status_code}
+
+
+# ================== ASYNC CLIENT ==================
+
+class MessengerClient:
+    """
+    Non-blocking Messenger Graph API client.
+
+    Features:
+    - One shared httpx.AsyncClient with a keep-alive connection pool.
+    - Bounded number of requests in flight.
+    - Retries on network errors, 429 and 5xx with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        api_url: str = FB_API_URL,
+        attachment_url: str = FB_ATTACHMENT_URL,
+        access_token: str = PAGE_ACCESS_TOKEN,
+        max_connections: int = FB_MAX_CONNECTIONS,
+        max_concurrency: int = FB_MAX_CONCURRENCY,
+        max_retries: int = FB_MAX_RETRIES,
+        timeout: float = FB_TIMEOUT,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+    ) -> None:
+        """
+        Configure the client; the connection pool is opened on first use.
+
+        Args:
+            api_url (str): Graph API send endpoint (FB_API_URL).
+            attachment_url (str): Attachment Upload API endpoint (FB_ATTACHMENT_URL).
+            access_token (str): Page access token.
+            max_connections (int): Size of the keep-alive connection pool.
+            max_concurrency (int): Maximum requests in flight at once.
+            max_retries (int): Retries after the first attempt.
+            timeout (float): Per-request timeout in seconds.
+            backoff_base (float): Backoff of the first retry in seconds.
+            backoff_max (float): Upper bound of a single backoff in seconds.
+        """
+        self.api_url = api_url
+        self.attachment_url = attachment_url
+        self.access_token = access_token
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before a retry, using exponential backoff with full jitter.
+
+        Args:
+            attempt (int): Number of attempts already made (1 for the first retry).
+
+        Returns:
+            float: Seconds to wait.
+        """
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    async def post(
+        self,
+        payload: dict,
+        max_retries: Optional[int] = None,
+        url: Optional[str] = None,
+        kind: Optional[str] = None,
+        access_token: Optional[str] = None,
+    ) -> dict:
+        """
+        Send a payload to the Graph API, retrying transient failures.
+
+        Args:
+            payload (dict): Message payload.
+            max_retries (Optional[int]): Override of the client's retry count.
+            url (Optional[str]): Endpoint, the send API (api_url) by default.
+            kind (Optional[str]): Metrics label, payload_kind(payload) by default.
+            access_token (Optional[str]): Token of the sending page, the
+                client's access_token by default.
+
+        Returns:
+            dict: JSON response from Facebook Graph API or fallback dict on error.
+                The fallback also carries "retryable" and, when the API sent
+                one, "retry_after".
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        params = {"access_token": access_token or self.access_token}
+        client = self._get_client()
+        send_seconds = metrics.MESSENGER_SEND_SECONDS
+        url = url or self.api_url
+        kind = kind or payload_kind(payload)
+        attempt = 0
+        while True:
+            res = None
+            delay = None
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        res = await client.post(url, params=params, json=payload)
+                    finally:
+                        status = str(res.status_code) if res is not None else "error"
+                        send_seconds.labels(kind, status).observe(time.perf_counter() - started)
+                if res.status_code < 400:
+                    return response_json(res)
+                error = f"HTTP {res.status_code}"
+                retryable = res.status_code in RETRY_STATUSES
+                delay = retry_after_seconds(res.headers)
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+                retryable = True
+
+            attempt += 1
+            if not retryable or attempt > retries:
+                return {
+                    "error": error,
+                    "status": getattr(res, "status_code", None),
+                    "text": getattr(res, "text", ""),
+                    "retryable": retryable,
+                    "retry_after": delay,
+                }
+            await asyncio.sleep(max(delay or 0.0, self.backoff(attempt)))
+
+    async def send_text(self, recipient_id: str, text: str) -> dict:
+        """Send a text message without the scheduler; see send_text_async()."""
+        return await self.post(text_payload(recipient_id, text))
+
+    async def send_image(self, recipient_id: str, image_url: str) -> dict:
+        """Send an image message without the scheduler; see send_image_async()."""
+        return await self.post(image_payload(recipient_id, image_url))
+
+    async def send_attachment(self, recipient_id: str, attachment_id: str) -> dict:
+        """Send an uploaded image without the scheduler; see send_attachment_async()."""
+        return await self.post(attachment_payload(recipient_id, attachment_id))
+
+    async def upload_attachment(self, image_url: str, access_token: Optional[str] = None) -> dict:
+        """
+        Upload an image by URL for reuse in later messages.
+
+        Args:
+            image_url (str): URL Facebook downloads the image from.
+            access_token (Optional[str]): Token of the page that will send it
+                (attachment ids are only valid for that page).
+
+        Returns:
+            dict: {"attachment_id": ...} or fallback dict on error.
+        """
+        return await self.post(
+            upload_payload(image_url), url=self.attachment_url, kind="upload", access_token=access_token
+        )
+
+    async def aclose(self) -> None:
+        """Close the connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared client for the FastAPI app
+messenger = MessengerClient()
+
+
+async def _post_once(payload: dict) -> dict:
+    """Single attempt through the shared client; the scheduler owns retries."""
+    return await messenger.post(payload, max_retries=0)
+
+
+# Rate limiter and retry queue in front of every outbound send
+scheduler = SendScheduler(_post_once)
+
 
 # ================== FACEBOOK MESSENGER FUNCTIONS ==================
 
-def send_text(recipient_id: str, text: str) -> dict:
+async def send_text(recipient_id: str, text: str) -> dict:
     """
     Send a text message to a Facebook user via Messenger Graph API.
+    Goes through the send scheduler (rate limit, pacing and retries).
 
     Args:
         recipient_id (str): Facebook user ID to send the message to.
@@ -14,24 +310,62 @@ def send_text(recipient_id: str, text: str) -> dict:
     Returns:
         dict: JSON response from Facebook Graph API or fallback dict on error.
     """
-    payload = {
-        "recipient": {"id": recipient_id},
-        "message": {"text": text}
-    }
-    params = {"access_token": PAGE_ACCESS_TOKEN}
+    return await scheduler.send(recipient_id, text_payload(recipient_id, text))
+
+
+async def send_image(recipient_id: str, image_url: str) -> dict:
+    """
+    Send an image message to a Facebook user via Messenger Graph API.
+    Goes through the send scheduler (rate limit, pacing and retries).
+
+    Args:
+        recipient_id (str): Facebook user ID to send the image to.
+        image_url (str): URL of the image to send.
 
+    Returns:
+        dict: JSON response from Facebook Graph API or fallback dict on error.
+    """
+    return await scheduler.send(recipient_id, image_payload(recipient_id, image_url))
+
+
+# ================== SYNCHRONOUS API (scripts) ==================
+
+# Keep-alive session shared by the blocking helpers
+_session = requests.Session()
+
+
+def _post_sync(payload: dict) -> dict:
+    """Blocking single-attempt POST to the Graph API."""
+    params = {"access_token": PAGE_ACCESS_TOKEN}
+    res = None
     try:
-        res = requests.post(FB_API_URL, params=params, json=payload, timeout=5)
+        res = _session.post(FB_API_URL, params=params, json=payload, timeout=FB_TIMEOUT)
         res.raise_for_status()  # Raise HTTPError if request failed
-        return res.json()
     except requests.RequestException as e:
         # Return fallback info in case of network or HTTP error
         return {"error": str(e), "status": getattr(res, "status_code", None), "text": getattr(res, "text", "")}
+    return response_json(res)
+
+
+def send_text_sync(recipient_id: str, text: str) -> dict:
+    """
+    Send a text message to a Facebook user via Messenger Graph API.
+    Blocking, for scripts outside the event loop; the app uses send_text().
+
+    Args:
+        recipient_id (str): Facebook user ID to send the message to.
+        text (str): Text content of the message.
+
+    Returns:
+        dict: JSON response from Facebook Graph API or fallback dict on error.
+    """
+    return _post_sync(text_payload(recipient_id, text))
 
 
-def send_image(recipient_id: str, image_url: str) -> dict:
+def send_image_sync(recipient_id: str, image_url: str) -> dict:
     """
     Send an image message to a Facebook user via Messenger Graph API.
+    Blocking, for scripts outside the event loop; the app uses send_image().
 
     Args:
         recipient_id (str): Facebook user ID to send the image to.
@@ -40,20 +374,4 @@ def send_image(recipient_id: str, image_url: str) -> dict:
     Returns:
         dict: JSON response from Facebook Graph API or fallback dict on error.
     """
-    payload = {
-        "recipient": {"id": recipient_id},
-        "message": {
-            "attachment": {
-                "type": "image",
-                "payload": {"url": image_url, "is_reusable": True}
-            }
-        }
-    }
-    params = {"access_token": PAGE_ACCESS_TOKEN}
-
-    try:
-        res = requests.post(FB_API_URL, params=params, json=payload, timeout=5)
-        res.raise_for_status()
-        return res.json()
-    except requests.RequestException as e:
-        return {"error": str(e), "status": getattr(res, "status_code", None), "text": getattr(res, "text", "")}
+    return _post_sync(image_payload(recipient_id, image_url))
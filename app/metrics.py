@@ -0,0 +1,330 @@
+"""
+Latency histograms and counters, exposed in the Prometheus text format on
+/metrics.
+
+Updates are a bucket search and a few additions under a per-series lock,
+cheap enough for the per-message hot path. Each worker process keeps its
+own values in memory. With METRICS_DIR set, every worker also writes them
+to <pid>.json in that directory every METRICS_FLUSH_INTERVAL seconds (and
+on shutdown), and a scrape sums the files of all workers, like the
+multiprocess mode of prometheus_client. Files of exited workers are kept so
+counters never go backwards; the directory is emptied when the server
+starts (run.py).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.utils import METRICS_DIR, METRICS_FLUSH_INTERVAL
+
+log = logging.getLogger("uvicorn.error")
+
+# Upper bounds (seconds) of the latency buckets, from 10us to 10s
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Every metric created in this process, in creation order
+_REGISTRY: List["_Metric"] = []
+_FLUSH_LOCK = threading.Lock()  # Scrapes and the flush loop write the same file
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return ",".join(pairs)
+
+
+class _Metric:
+    """Named metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Series for one combination of label values (created on first use).
+
+        Args:
+            *values (str): One value per label name, in order.
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def values(self) -> Dict[Tuple[str, ...], object]:
+        """Current value of every series of this process, by label values."""
+        return {key: self._value(child) for key, child in list(self._children.items())}
+
+    def _value(self, child) -> object:
+        raise NotImplementedError
+
+    def _add(self, total: Optional[object], value: object) -> object:
+        """Sum of two values of one series (total is None for the first)."""
+        raise NotImplementedError
+
+    def render(self, series: Dict[Tuple[str, ...], object]) -> List[str]:
+        """Lines of this metric in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(series.items()):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: Tuple[str, ...], value) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Add to the counter."""
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. of events."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def _value(self, child) -> float:
+        return child.value
+
+    def _add(self, total, value) -> float:
+        return (total or 0.0) + value
+
+    def _render_value(self, key, value) -> List[str]:
+        labels = f"{{{_label_text(self.labelnames, key)}}}" if key else ""
+        return [f"{self.name}{labels} {_format_value(value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot: above the highest bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation (seconds for latency histograms)."""
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Consistent copy of (bucket counts, sum)."""
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _value(self, child) -> Tuple[List[int], float]:
+        return child.snapshot()
+
+    def _add(self, total, value) -> Tuple[List[int], float]:
+        counts, total_sum = value
+        if total is None:
+            return list(counts), total_sum
+        return [a + b for a, b in zip(total[0], counts)], total[1] + total_sum
+
+    def _render_value(self, key, value) -> List[str]:
+        counts, total = value
+        labels = _label_text(self.labelnames, key)
+        prefix = labels + "," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+        lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+# ================== WORKER AGGREGATION ==================
+
+def flush(directory: str = METRICS_DIR) -> None:
+    """
+    Write the values of this process to <pid>.json in the metrics directory.
+
+    Args:
+        directory (str): Shared metrics directory; nothing is written if empty.
+    """
+    if not directory:
+        return
+    data = {metric.name: [[list(key), value] for key, value in metric.values().items()] for metric in _REGISTRY}
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = path + ".tmp"
+    with _FLUSH_LOCK:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+def collect(directory: str = METRICS_DIR) -> Dict[str, Dict[Tuple[str, ...], object]]:
+    """
+    Values of every metric, summed over all worker processes.
+
+    Args:
+        directory (str): Shared metrics directory; only this process is
+            counted if empty.
+
+    Returns:
+        Dict[str, Dict[Tuple[str, ...], object]]: Metric name -> label values -> value.
+    """
+    if not directory:
+        return {metric.name: metric.values() for metric in _REGISTRY}
+    flush(directory)  # This worker's file is current; the others are at most one interval old
+    metrics = {metric.name: metric for metric in _REGISTRY}
+    totals: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in metrics}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # Removed or replaced while listing
+        for metric_name, series in data.items():
+            metric = metrics.get(metric_name)
+            if metric is None:
+                continue  # Written by another version of the app
+            total = totals[metric_name]
+            for key, value in series:
+                key = tuple(key)
+                total[key] = metric._add(total.get(key), value)
+    return totals
+
+
+async def run_flush_loop(directory: str = METRICS_DIR, interval: float = METRICS_FLUSH_INTERVAL) -> None:
+    """
+    Flush this worker's values every interval, and once more when cancelled.
+
+    Args:
+        directory (str): Shared metrics directory.
+        interval (float): Seconds between flushes.
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(flush, directory)
+            except OSError:
+                log.exception("Could not flush metrics to %s", directory)
+    finally:
+        flush(directory)
+
+
+def render(directory: str = METRICS_DIR) -> str:
+    """
+    All metrics in the Prometheus text exposition format, summed over the
+    workers when a metrics directory is configured.
+
+    Args:
+        directory (str): Shared metrics directory.
+
+    Returns:
+        str: Body for a text/plain; version=0.0.4 response.
+    """
+    values = collect(directory)
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render(values[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+# Content type of render()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ================== HOT PATH METRICS ==================
+
+WEBHOOK_PARSE_SECONDS = Histogram(
+    "webhook_parse_seconds", "Time to decode the JSON body of a webhook request.",
+)
+WEBHOOK_EVENTS = Counter(
+    "webhook_events_total", "Messaging events received, by outcome (queued, dropped, duplicate, ignored).", ["result"],
+)
+FAQ_NORMALIZE_SECONDS = Histogram(
+    "faq_normalize_seconds", "Time to normalize a user message into a match key.",
+)
+FAQ_CACHE_LOOKUPS = Counter(
+    "faq_cache_lookups_total", "Answer cache lookups, by result.", ["result"],
+)
+FAQ_MATCH_SECONDS = Histogram(
+    "faq_match_seconds", "Time to match a message against the FAQ (cache misses only), by result.", ["result"],
+)
+FAQ_RELOAD_SECONDS = Histogram(
+    "faq_reload_seconds", "Time to install a new FAQ snapshot, by kind (rebuild or journal).", ["kind"],
+)
+MESSENGER_SEND_SECONDS = Histogram(
+    "messenger_send_seconds", "Duration of one Graph API send attempt, by message kind and HTTP status.",
+    ["kind", "status"],
+)
+FAQ_TENANT_EVENTS = Counter(
+    "faq_tenant_events_total", "Per-page FAQ bot lookups and unloads, by result (hit, load, evict).", ["result"],
+)
+FAQ_TENANT_LOAD_SECONDS = Histogram(
+    "faq_tenant_load_seconds", "Time to load the FAQ bot of a page on its first message.",
+)
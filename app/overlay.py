@@ -0,0 +1,297 @@
+"""
+Incremental FAQ edits layered over an immutable match index.
+
+Rebuilding the match index (and the memory-mapped snapshot) costs time
+proportional to the whole FAQ, so journal edits are applied as an overlay
+instead: the base index is left untouched and queried with the updated
+and deleted rows excluded, rows that were updated or appended are matched
+by a short linear scan, and the results are merged so the first matching
+row in table order still wins.
+Compaction folds the overlay back into the CSV file.
+
+Rows keep a stable id: base rows use their index in the base table and
+appended rows continue after it. Ids stay in table order, so the position
+of a row is its rank among the live ids.
+"""
+
+import logging
+from bisect import bisect_left
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.journal import check_entry
+from app.matcher import NO_MATCH, BaseMatcher, MatchResult, normalize_key, scan_rules
+
+log = logging.getLogger("uvicorn.error")
+
+
+class FAQOverlay:
+    """
+    Immutable FAQ table: a base index plus the edits applied on top of it.
+    """
+
+    def __init__(
+        self,
+        pairs: Sequence[Tuple[str, str]],
+        matcher: BaseMatcher,
+        fuzzy: Optional[Any] = None,
+        keywords: Optional[Any] = None,
+    ) -> None:
+        """
+        Start an overlay without edits.
+
+        Args:
+            pairs (Sequence[Tuple[str, str]]): Base (question, answer) pairs.
+            matcher (BaseMatcher): Match index over the base questions.
+            fuzzy (Optional[FuzzyIndex]): Ranked index over the base questions.
+            keywords (Optional[KeywordIndex]): Keyword index over the base questions.
+        """
+        self.base_pairs = pairs
+        self.base_matcher = matcher
+        self.base_fuzzy = fuzzy
+        self.base_keywords = keywords
+        self.base_rows = len(pairs)
+        self.changes: Dict[int, Optional[Tuple[str, str]]] = {}  # Row id -> new pair, None if deleted
+        self.order: Optional[List[int]] = None  # Live row ids; None while it is range(base_rows)
+        self.next_id = self.base_rows
+        self.entries = 0
+        self._dirty: List[Tuple[int, str]] = []  # (row id, normalized question) of live changed rows
+
+    def __len__(self) -> int:
+        """Number of rows in the edited table."""
+        return self.base_rows if self.order is None else len(self.order)
+
+    # ================== ROW IDS ==================
+    def row_id(self, position: int) -> int:
+        """Stable id of the row at a table position."""
+        return position if self.order is None else self.order[position]
+
+    def position(self, row_id: int) -> int:
+        """Table position of a live row id."""
+        return row_id if self.order is None else bisect_left(self.order, row_id)
+
+    def pair(self, row_id: int) -> Tuple[str, str]:
+        """(question, answer) of a live row id."""
+        if row_id in self.changes:
+            return self.changes[row_id]
+        return self.base_pairs[row_id]
+
+    # ================== EDITS ==================
+    def check(self, entry: Dict[str, object]) -> int:
+        """
+        Validate a journal entry against this table; see journal.check_entry().
+        """
+        return check_entry(entry, len(self))
+
+    def apply(self, entries: List[Dict[str, object]]) -> "FAQOverlay":
+        """
+        Return a new overlay with journal entries applied.
+
+        Invalid entries are logged and skipped.
+
+        Args:
+            entries (List[Dict[str, object]]): Journal entries in order.
+
+        Returns:
+            FAQOverlay: The edited table; this one is left unchanged.
+        """
+        edited = FAQOverlay(self.base_pairs, self.base_matcher, self.base_fuzzy, self.base_keywords)
+        edited.changes = dict(self.changes)
+        edited.order = list(self.order) if self.order is not None else None
+        edited.next_id = self.next_id
+        edited.entries = self.entries
+
+        for entry in entries:
+            try:
+                position = edited.check(entry)
+            except (ValueError, IndexError) as e:
+                log.warning("Skipping FAQ journal entry %s: %s", entry, e)
+                continue
+            op = entry["op"]
+            if op != "update" and edited.order is None:
+                edited.order = list(range(edited.base_rows))
+            if op == "create":
+                edited.changes[edited.next_id] = (entry["question"], entry["answer"])
+                edited.order.append(edited.next_id)
+                edited.next_id += 1
+            elif op == "update":
+                edited.changes[edited.row_id(position)] = (entry["question"], entry["answer"])
+            else:
+                edited.changes[edited.order.pop(position)] = None
+            edited.entries += 1
+
+        edited._dirty = sorted(
+            (row_id, normalize_key(pair[0]))
+            for row_id, pair in edited.changes.items() if pair is not None
+        )
+        return edited
+
+    # ================== VIEWS ==================
+    @property
+    def pairs(self) -> Sequence[Tuple[str, str]]:
+        """(question, answer) pairs of the edited table."""
+        return OverlayPairs(self) if self.changes else self.base_pairs
+
+    @property
+    def matcher(self) -> BaseMatcher:
+        """Match index of the edited table."""
+        return OverlayMatcher(self) if self.changes else self.base_matcher
+
+    @property
+    def fuzzy(self) -> Optional[Any]:
+        """Ranked index of the edited table, if the base has one."""
+        if self.base_fuzzy is None or not self.changes:
+            return self.base_fuzzy
+        return OverlayFuzzy(self)
+
+    @property
+    def keywords(self) -> Optional[Any]:
+        """Keyword index of the edited table, if the base has one."""
+        if self.base_keywords is None or not self.changes:
+            return self.base_keywords
+        return OverlayKeywords(self)
+
+
+class OverlayPairs(SequenceABC):
+    """Read-only sequence of the (question, answer) pairs of an overlay."""
+
+    def __init__(self, overlay: FAQOverlay) -> None:
+        self._overlay = overlay
+
+    def __len__(self) -> int:
+        return len(self._overlay)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("FAQ row out of range")
+        return self._overlay.pair(self._overlay.row_id(position))
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for position in range(len(self)):
+            yield self[position]
+
+
+class OverlayMatcher(BaseMatcher):
+    """
+    Exact and partial matching over an overlay.
+
+    The base index answers with the changed rows excluded, the changed rows
+    are scanned, and the smaller row id wins.
+    """
+
+    def __init__(self, overlay: FAQOverlay) -> None:
+        self._overlay = overlay
+        self._base = overlay.base_matcher
+        self._excluded = frozenset(row_id for row_id in overlay.changes if row_id < overlay.base_rows)
+
+    def __len__(self) -> int:
+        return len(self._overlay)
+
+    def key(self, row: int) -> str:
+        """See BaseMatcher.key()."""
+        row_id = self._overlay.row_id(row)
+        pair = self._overlay.changes.get(row_id)
+        return normalize_key(pair[0]) if pair is not None else self._base.key(row_id)
+
+    def _merge(self, base_hit: Optional[int], dirty_hit: int) -> int:
+        """First row id of a base hit and a changed row hit, or NO_MATCH."""
+        return dirty_hit if base_hit is None else min(base_hit, dirty_hit)
+
+    def exact(self, key: str) -> Optional[int]:
+        """See BaseMatcher.exact()."""
+        exact, _ = scan_rules(key, self._overlay._dirty)
+        row_id = self._merge(self._base.exact(key, self._excluded), exact)
+        return None if row_id == NO_MATCH else self._overlay.position(row_id)
+
+    def partial(self, key: str) -> Optional[int]:
+        """See BaseMatcher.partial()."""
+        exact, partial = scan_rules(key, self._overlay._dirty)
+        row_id = self._merge(self._base.partial(key, self._excluded), min(exact, partial))
+        return None if row_id == NO_MATCH else self._overlay.position(row_id)
+
+    def match(self, key: str) -> Optional[MatchResult]:
+        """See BaseMatcher.match(); the changed rows are scanned once."""
+        exact, partial = scan_rules(key, self._overlay._dirty)
+        row_id = self._merge(self._base.exact(key, self._excluded), exact)
+        if row_id != NO_MATCH:
+            return MatchResult(self._overlay.position(row_id), "exact")
+        row_id = self._merge(self._base.partial(key, self._excluded), partial)
+        if row_id != NO_MATCH:
+            return MatchResult(self._overlay.position(row_id), "partial")
+        return None
+
+
+class OverlayFuzzy:
+    """
+    Ranked matching over an overlay.
+
+    Changed rows are excluded from the base index and scored separately
+    with the base vocabulary and IDF weights.
+    """
+
+    def __init__(self, overlay: FAQOverlay) -> None:
+        base = overlay.base_fuzzy
+        self._overlay = overlay
+        self._base = base
+        self._excluded = [row_id for row_id in overlay.changes if row_id < overlay.base_rows]
+        self._vectors = {row_id: base.text_vector(key) for row_id, key in overlay._dirty if key}
+
+    def __len__(self) -> int:
+        return len(self._overlay)
+
+    def top_k(self, message: str, k: int = 3, min_score: float = 0.0) -> list:
+        """See FuzzyIndex.top_k(); indices are table positions of the overlay."""
+        from app.fuzzy import RankedMatch
+
+        if k <= 0:
+            return []
+        results = [
+            (m.score, m.index)
+            for m in self._base.top_k(message, k, min_score, exclude=self._excluded)
+        ]
+        query = self._base.text_vector(normalize_key(message))
+        for row_id, vector in self._vectors.items():
+            score = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+            if score > 0.0 and score >= min_score:
+                results.append((score, row_id))
+        # Rounded so equal questions scored by the two paths still tie by position
+        results.sort(key=lambda r: (-round(r[0], 12), r[1]))
+        return [RankedMatch(self._overlay.position(row_id), score) for score, row_id in results[:k]]
+
+
+class OverlayKeywords:
+    """
+    Keyword matching over an overlay.
+
+    Changed rows are excluded from the base index and their keywords are
+    checked one by one.
+    """
+
+    def __init__(self, overlay: FAQOverlay) -> None:
+        base = overlay.base_keywords
+        self._overlay = overlay
+        self._base = base
+        self._excluded = frozenset(row_id for row_id in overlay.changes if row_id < overlay.base_rows)
+        self._words = [(row_id, base.words(key)) for row_id, key in overlay._dirty]
+
+    def __len__(self) -> int:
+        return len(self._overlay)
+
+    def lookup(self, key: str):
+        """See KeywordIndex.lookup(); the index is a table position of the overlay."""
+        from app.keywords import KeywordMatch
+
+        words = self._base.words(key)
+        best = self._base.lookup(key, self._excluded, words)
+        best_row, best_words = (best.index, best.words) if best is not None else (NO_MATCH, 0)
+        for row_id, needed in self._words:
+            count = len(needed)
+            if needed and needed <= words and (count > best_words or (count == best_words and row_id < best_row)):
+                best_row, best_words = row_id, count
+        if best_row == NO_MATCH:
+            return None
+        return KeywordMatch(self._overlay.position(best_row), best_words)
@@ -1,19 +1,25 @@
-import os
+import json
+import time
+import asyncio
 import logging
-import pandas as pd
+from typing import Optional
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import PlainTextResponse
-from app.utils import VERIFY_TOKEN
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from app import metrics
+from app.utils import VERIFY_TOKEN, DATA_PATH, FAQ_DATA_MAX_PAGE, FAQ_BATCH_MAX_MESSAGES, FAQ_BATCH_MAX_WORKERS
 from app.ai_engine import faq_bot
-from app.messenger import send_text, send_image
+from app.faq_table import TableCursor, gzip_chunks, iter_json
+from app.messenger import text_payload, scheduler
+from app.attachments import attachments, image_url, send_image_answer
+from app.tenants import tenants
+from app.dispatcher import WebhookDispatcher, WebhookEvent
+from app.dedup import MessageDeduplicator
+from app.capture import capture
 
 # ================= ROUTER & LOGGER =================
 router = APIRouter()
 log = logging.getLogger("uvicorn.error")
 
-# Path to the CSV file storing FAQs
-CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "faq.csv")
-
 # ================== WEBHOOK VERIFICATION ==================
 @router.get("/webhook", response_class=PlainTextResponse)
 async def verify_webhook(request: Request):
@@ -32,43 +38,97 @@ async def verify_webhook(request: Request):
 
 
 # ================== WEBHOOK EVENTS ==================
+async def process_event(event: WebhookEvent) -> None:
+    """
+    Answer one messaging event using the FAQBot of the page it was sent to
+    and send the reply with that page's token.
+    """
+    page = await tenants.get(event.page_id)
+    answer = page.bot.get_answer(event.text)
+    capture.record_answer(event.mid, event.sender_id, event.text, answer)
+
+    # Check if answer is an image URL (format: [[IMAGE: URL]])
+    url = image_url(answer)
+    if url:
+        result = await send_image_answer(event.sender_id, url, page.images, page.sender)
+    else:
+        result = await page.sender.send(event.sender_id, text_payload(event.sender_id, answer))
+
+    if "error" in result:
+        log.warning("Failed to send reply to %s: %s (status %s)",
+                    event.sender_id, result["error"], result.get("status"))
+
+
+# Background workers; started and drained by the app lifespan
+dispatcher = WebhookDispatcher(process_event)
+
+# Message ids already received by any worker, to drop Facebook's redeliveries
+dedup = MessageDeduplicator(path=DATA_PATH + ".dedup")
+
+
 @router.post("/webhook")
 async def receive_webhook(req: Request):
     """
-    Receive messages from Facebook Messenger webhook and respond using FAQBot.
+    Receive messages from Facebook Messenger webhook and queue them for FAQBot.
+
+    Replies are sent by background workers so Facebook gets its 200 right away.
+    Redelivered events (same message.mid) are dropped. Each entry is answered
+    from the FAQ of the page it names (entry["id"], see app.tenants).
     """
-    data = await req.json()
+    body = await req.body()
+    started = time.perf_counter()
+    data = json.loads(body)
+    metrics.WEBHOOK_PARSE_SECONDS.labels().observe(time.perf_counter() - started)
+    capture.record_webhook(body)
     log.debug("Webhook received: %s", data)
 
     if "entry" in data:
         for entry in data["entry"]:
+            page_id = entry.get("id")
+            page_id = str(page_id) if page_id is not None else None
             for ev in entry.get("messaging", []):
                 sender_id = ev.get("sender", {}).get("id")
                 message = ev.get("message", {})
                 text = message.get("text")
+                mid = message.get("mid")
 
-                if sender_id and text:
-                    answer = faq_bot.get_answer(text)
-
-                    # Check if answer is an image URL (format: [[IMAGE: URL]])
-                    if isinstance(answer, str) and answer.startswith("[[IMAGE:") and answer.endswith("]]"):
-                        url = answer.replace("[[IMAGE:", "").replace("]]", "").strip()
-                        send_image(sender_id, url)
-                    else:
-                        send_text(sender_id, answer)
+                if dedup.is_duplicate(mid):
+                    metrics.WEBHOOK_EVENTS.labels("duplicate").inc()
+                    log.debug("Dropped redelivered message %s", mid)
+                elif sender_id and text:
+                    queued = await dispatcher.submit(sender_id, text, mid, page_id)
+                    if not queued:
+                        dedup.forget(mid)  # Let a redelivery through
+                    metrics.WEBHOOK_EVENTS.labels("queued" if queued else "dropped").inc()
+                else:
+                    metrics.WEBHOOK_EVENTS.labels("ignored").inc()
 
     return {"status": "ok"}
 
 
 # ================== ADMIN ENDPOINTS ==================
+async def wait_for_propagation(generation: int):
+    """
+    Wait until every worker process has applied a published FAQ generation.
+
+    Returns:
+        dict | None: Propagation report, or None without a broadcast.
+    """
+    if faq_bot.broadcast is None:
+        return None
+    return await faq_bot.broadcast.wait_for(generation)
+
+
 @router.post("/reload-faq")
 async def reload_faq():
     """
     Reload FAQ data from CSV file without restarting the server.
+    Responds once all worker processes have reloaded (or the wait timed out).
     """
     try:
-        faq_bot.reload_faq()
-        return {"status": "success", "message": "FAQ reloaded successfully"}
+        generation = await asyncio.to_thread(faq_bot.reload_faq)
+        propagation = await wait_for_propagation(generation)
+        return {"status": "success", "message": "FAQ reloaded successfully", "propagation": propagation}
     except Exception as e:
         log.error("Failed to reload FAQ: %s", e)
         return {"status": "error", "message": str(e)}
@@ -86,27 +146,225 @@ async def update_faq(req: Request):
         if not isinstance(data, list):
             raise HTTPException(status_code=400, detail="Data must be a list of {question, answer}")
 
-        # Save to CSV
-        df = pd.DataFrame(data)
-        df.to_csv(CSV_PATH, index=False, encoding="utf-8-sig")
-
-        # Reload FAQBot
-        faq_bot.reload_faq()
+        # Save to CSV (atomic replace, pending edits discarded) and reload every worker
+        generation = await asyncio.to_thread(faq_bot.replace_all, data)
+        propagation = await wait_for_propagation(generation)
 
-        return {"status": "success", "message": "FAQ updated and loaded successfully"}
+        return {"status": "success", "message": "FAQ updated and loaded successfully", "propagation": propagation}
+    except HTTPException:
+        raise
     except Exception as e:
         log.error("Failed to update FAQ: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def read_faq_entry(req: Request, required: bool) -> dict:
+    """
+    Parse and validate a {"question": "...", "answer": "..."} request body.
+
+    Args:
+        req (Request): Incoming request.
+        required (bool): Both fields must be present (create) or either (update).
+
+    Returns:
+        dict: question and answer, None for fields left out.
+    """
+    try:
+        data = await req.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Body must be {question, answer}")
+
+    entry = {}
+    for field in ("question", "answer"):
+        value = data.get(field)
+        if value is not None and not isinstance(value, str):
+            raise HTTPException(status_code=400, detail=f"{field} must be a string")
+        if value is None and required:
+            raise HTTPException(status_code=400, detail=f"{field} is required")
+        entry[field] = value
+    if entry["question"] is not None and not entry["question"].strip():
+        raise HTTPException(status_code=400, detail="question must not be empty")
+    if not required and entry["question"] is None and entry["answer"] is None:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    return entry
+
+
+async def edit_response(edit, message: str, deleted: bool = False) -> dict:
+    """Build the response of a single-entry edit once it has propagated."""
+    propagation = await wait_for_propagation(edit.generation)
+    entry: Optional[dict] = None
+    pairs = faq_bot.qa_pairs
+    if not deleted and edit.row < len(pairs):
+        question, answer = pairs[edit.row]
+        entry = {"question": question, "answer": answer}
+    return {
+        "status": "success",
+        "message": message,
+        "row": edit.row,
+        "entry": entry,
+        "etag": f'W/"{faq_bot.data_version()}"',  # Version of /faq-data after the edit
+        "propagation": propagation,
+    }
+
+
+@router.post("/faq")
+async def create_faq_entry(req: Request):
+    """
+    Append one FAQ entry without rewriting the CSV file.
+
+    Expected JSON format: {"question": "...", "answer": "..."}
+    """
+    entry = await read_faq_entry(req, required=True)
+    edit = await asyncio.to_thread(faq_bot.create_entry, entry["question"], entry["answer"])
+    return await edit_response(edit, "FAQ entry created")
+
+
+@router.put("/faq/{row}")
+async def update_faq_entry(row: int, req: Request):
+    """
+    Change the question and/or answer of the entry at a row of /faq-data.
+
+    Expected JSON format: {"question": "...", "answer": "..."} (either may be left out)
+    """
+    entry = await read_faq_entry(req, required=False)
+    try:
+        edit = await asyncio.to_thread(faq_bot.update_entry, row, entry["question"], entry["answer"])
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await edit_response(edit, "FAQ entry updated")
+
+
+@router.delete("/faq/{row}")
+async def delete_faq_entry(row: int):
+    """
+    Delete the entry at a row of /faq-data; later rows move up by one.
+    """
+    try:
+        edit = await asyncio.to_thread(faq_bot.delete_entry, row)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await edit_response(edit, "FAQ entry deleted", deleted=True)
+
+
+@router.post("/faq/compact")
+async def compact_faq():
+    """
+    Fold pending FAQ edits from the journal into the CSV file now.
+    """
+    generation = await asyncio.to_thread(faq_bot.compact)
+    propagation = await wait_for_propagation(generation)
+    return {"status": "success", "message": "FAQ journal compacted", "propagation": propagation}
+
+
+@router.post("/answer/batch")
+async def answer_batch(req: Request):
+    """
+    Answer many messages against one FAQ snapshot, e.g. to replay historical
+    traffic after an FAQ change. Nothing is sent to Messenger.
+
+    Expected JSON format: {"messages": ["...", ...], "workers": 1}
+    (workers > 1 spreads very large batches over processes).
+    """
+    try:
+        data = await req.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        raise HTTPException(status_code=400, detail="messages must be a list of strings")
+    if len(messages) > FAQ_BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"At most {FAQ_BATCH_MAX_MESSAGES} messages per batch")
+    workers = data.get("workers", 1)
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise HTTPException(status_code=400, detail="workers must be a positive integer")
+
+    answers = await asyncio.to_thread(faq_bot.get_answers, messages, min(workers, FAQ_BATCH_MAX_WORKERS))
+    rules: dict = {}
+    for answer in answers:
+        rules[answer.rule] = rules.get(answer.rule, 0) + 1
+    return {
+        "count": len(answers),
+        "rules": rules,
+        "results": [answer._asdict() for answer in answers],
+    }
+
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Report runtime statistics, e.g. FAQ snapshot generation and reload counters.
+    """
+    return {
+        "faq": faq_bot.stats(),
+        "webhook": dispatcher.stats(),
+        "dedup": dedup.stats(),
+        "outbound": scheduler.stats(),
+        "attachments": attachments.stats(),
+        "capture": capture.stats(),
+        "tenants": tenants.stats(),
+    }
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Expose per-stage latency histograms and counters in the Prometheus text
+    format, summed over the worker processes when METRICS_DIR is set.
+    """
+    body = await asyncio.to_thread(metrics.render)  # Reads the files of the other workers
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header with an ETag."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
 @router.get("/faq-data")
-async def get_faq_data():
+async def get_faq_data(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None):
     """
     Fetch current FAQ data as a JSON list for editor tools.
+    Includes edits not yet compacted into the CSV file; list positions are
+    the row numbers used by the /faq endpoints.
+
+    - ETag / If-None-Match: unchanged data returns 304 Not Modified.
+    - ?limit=N returns one page {"version", "items", "next_cursor"}; pass
+      next_cursor as ?cursor= for the next page. A cursor from an older
+      version of the data is rejected with 409.
+    - The body is streamed, gzip-compressed if the client accepts it.
     """
+    if limit is not None and not 1 <= limit <= FAQ_DATA_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {FAQ_DATA_MAX_PAGE}")
+    after = None
+    if cursor:
+        try:
+            after = TableCursor.decode(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        df = pd.read_csv(CSV_PATH, dtype=str).fillna("")
-        return df.to_dict(orient="records")
+        table = await asyncio.to_thread(faq_bot.open_table, after)
     except Exception as e:
         log.error("Failed to fetch FAQ data: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+    etag = f'W/"{table.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if after is not None and after.version != table.version:
+        table.close()
+        raise HTTPException(status_code=409, detail="FAQ data changed; fetch again from the first page")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        table.close()
+        return Response(status_code=304, headers=headers)
+
+    body = iter_json(table, limit)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    # Sync iterators are consumed in the threadpool, off the event loop
+    return StreamingResponse(body, media_type="application/json", headers=headers)
@@ -0,0 +1,231 @@
+"""
+Outbound send scheduler for the Messenger Graph API.
+
+Every reply passes through a global token bucket and a per-recipient pacer
+before it is posted. Throttled (429) and transient failures are parked in a
+retry queue until their Retry-After deadline instead of being dropped, and a
+429 also pauses the global bucket so the whole page backs off together.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from app.utils import (
+    FB_SEND_RATE,
+    FB_SEND_BURST,
+    FB_RECIPIENT_INTERVAL,
+    FB_SEND_MAX_ATTEMPTS,
+    FB_MAX_RETRY_DELAY,
+)
+
+# Number of recent delivery latencies kept for percentiles
+LATENCY_WINDOW = 1024
+
+# Prune the per-recipient pacing table when it grows past this many entries
+MAX_TRACKED_RECIPIENTS = 10000
+
+
+class TokenBucket:
+    """
+    Token bucket implemented as a virtual schedule (GCRA): each reservation
+    returns how long the caller must wait for its token.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """
+        Args:
+            rate (float): Sustained tokens per second.
+            burst (int): Tokens that may be taken back-to-back.
+        """
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self._tat = 0.0  # Theoretical arrival time of the next token
+
+    def reserve(self, now: float) -> float:
+        """
+        Take one token.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            float: Seconds to wait before using the token.
+        """
+        tat = max(self._tat, now)
+        wait = max(0.0, tat - self.tolerance - now)
+        self._tat = tat + self.interval
+        return wait
+
+    def pause_until(self, deadline: float) -> None:
+        """
+        Hand out no tokens before deadline (e.g. after a 429).
+
+        Args:
+            deadline (float): Monotonic time at which sending may resume.
+        """
+        self._tat = max(self._tat, deadline + self.tolerance)
+
+
+class SendScheduler:
+    """
+    Rate-limited, retrying front-end for Graph API sends.
+
+    Features:
+    - Global token bucket (FB_SEND_RATE messages/s, FB_SEND_BURST burst).
+    - Minimum spacing between two sends to the same recipient.
+    - Retry queue honouring Retry-After, with jittered backoff otherwise.
+    - Queue depth, throttle hits and delivery latency statistics.
+    """
+
+    def __init__(
+        self,
+        post: Callable[[dict], Awaitable[dict]],
+        rate: float = FB_SEND_RATE,
+        burst: int = FB_SEND_BURST,
+        recipient_interval: float = FB_RECIPIENT_INTERVAL,
+        max_attempts: int = FB_SEND_MAX_ATTEMPTS,
+        max_retry_delay: float = FB_MAX_RETRY_DELAY,
+        backoff_base: float = 0.5,
+    ) -> None:
+        """
+        Args:
+            post (Callable): Coroutine sending one payload without retrying;
+                failures return a dict with "error", "status", "retryable"
+                and "retry_after" keys.
+            rate (float): Sustained sends per second for the whole page.
+            burst (int): Sends allowed back-to-back before the rate applies.
+            recipient_interval (float): Minimum seconds between sends to one user.
+            max_attempts (int): Attempts per message, including the first.
+            max_retry_delay (float): Upper bound of a single retry delay.
+            backoff_base (float): Backoff of the first retry without Retry-After.
+        """
+        self.post = post
+        self.bucket = TokenBucket(rate, burst)
+        self.recipient_interval = recipient_interval
+        self.max_attempts = max(1, max_attempts)
+        self.max_retry_delay = max_retry_delay
+        self.backoff_base = backoff_base
+        self._next_slot: Dict[str, float] = {}
+
+        # Statistics
+        self.waiting = 0      # Messages waiting for a token or their recipient slot
+        self.retrying = 0     # Messages parked in the retry queue
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttle_hits = 0  # 429 responses from the Graph API
+        self.rate_limited = 0   # Sends delayed by the local limiter
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def _pace(self, recipient_id: str, now: float) -> float:
+        """
+        Reserve the recipient's next send slot and a global token.
+
+        Returns:
+            float: Seconds to wait before sending.
+        """
+        slot = max(now, self._next_slot.get(recipient_id, 0.0))
+        self._next_slot[recipient_id] = slot + self.recipient_interval
+        if len(self._next_slot) > MAX_TRACKED_RECIPIENTS:
+            self._next_slot = {r: t for r, t in self._next_slot.items() if t > now}
+        return max(slot - now, self.bucket.reserve(now))
+
+    def _retry_delay(self, result: dict, attempt: int) -> float:
+        """Delay before the next attempt: Retry-After if given, else jittered backoff."""
+        retry_after = result.get("retry_after")
+        if retry_after is not None:
+            return min(self.max_retry_delay, retry_after)
+        cap = min(self.max_retry_delay, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(cap / 2, cap)
+
+    async def send(self, recipient_id: str, payload: dict) -> dict:
+        """
+        Send a payload once the rate limits allow it, retrying transient failures.
+
+        Args:
+            recipient_id (str): Facebook user ID, used for per-recipient pacing.
+            payload (dict): Graph API message payload.
+
+        Returns:
+            dict: Graph API response, or the last fallback dict on failure.
+        """
+        submitted = time.monotonic()
+        attempt = 0
+        while True:
+            wait = self._pace(recipient_id, time.monotonic())
+            if wait > 0:
+                self.rate_limited += 1
+                self.waiting += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self.waiting -= 1
+
+            self.in_flight += 1
+            try:
+                result = await self.post(payload)
+            finally:
+                self.in_flight -= 1
+            attempt += 1
+
+            if "error" not in result:
+                self.sent += 1
+                self._latencies.append(time.monotonic() - submitted)
+                return result
+
+            if result.get("status") == 429:
+                self.throttle_hits += 1
+            if not result.get("retryable") or attempt >= self.max_attempts:
+                self.failed += 1
+                return result
+
+            delay = self._retry_delay(result, attempt)
+            if result.get("status") == 429:
+                # The throttle applies to the page, not just this recipient
+                self.bucket.pause_until(time.monotonic() + delay)
+            self.retries += 1
+            self.retrying += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.retrying -= 1
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """
+        Delivery latency percentile over the recent window.
+
+        Args:
+            q (float): Percentile in [0, 100].
+
+        Returns:
+            Optional[float]: Seconds from submission to successful delivery.
+        """
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def stats(self) -> dict:
+        """
+        Return queue depth, throttling and latency statistics.
+
+        Returns:
+            dict: Scheduler counters and delivery latency percentiles.
+        """
+        return {
+            "queue_depth": self.waiting + self.retrying,
+            "waiting": self.waiting,
+            "retrying": self.retrying,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttle_hits": self.throttle_hits,
+            "rate_limited": self.rate_limited,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p99": self.latency_percentile(99),
+        }
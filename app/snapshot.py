@@ -0,0 +1,551 @@
+"""
+Compiled, memory-mapped FAQ snapshots.
+
+`compile_snapshot()` turns the FAQ CSV into one binary file holding the
+string tables, the normalized question keys and every match index
+(exact hash table, Aho-Corasick automaton, bigram postings). `load_snapshot()`
+maps that file read-only, so all worker processes share the same pages
+through the OS page cache and start without parsing the CSV.
+
+All integers are little-endian. Arrays are 8-byte aligned sections, read
+through memoryview casts without copying.
+
+Usage:
+    python -m app.snapshot [data/faq.csv] [output.snap]
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence as SequenceABC
+from typing import Collection, Iterator, List, Optional, Sequence, Tuple
+
+from app.faq_store import FileSignature, file_signature, read_faq_pairs
+from app.matcher import (
+    CHAR_BITS,
+    MAX_VERIFY_CANDIDATES,
+    NO_MATCH,
+    AhoCorasick,
+    BaseMatcher,
+    bigram_key,
+    normalize_key,
+    same_key_chain,
+)
+
+MAGIC = b"FAQSNAP1"
+FORMAT_VERSION = 4  # 2: keys use textnorm.normalize_text(); 3: lookups can exclude rows;
+                    # 4: invisible characters are removed before NFC
+
+# Sections, in file order: (name, array typecode or None for raw bytes)
+SECTIONS: List[Tuple[str, Optional[str]]] = [
+    ("text_offsets", "Q"),  # 2n+1 byte offsets: question i, answer i, question i+1, ...
+    ("text", None),         # UTF-8 questions and answers
+    ("key_offsets", "Q"),   # n+1 byte offsets into keys
+    ("keys", None),         # UTF-8 normalized keys, each followed by a NUL separator
+    ("exact", "I"),         # Open-addressing table of row+1 (0 = empty), hashed by crc32
+    ("same_next", "I"),     # Per row: next row with the same key, or NO_MATCH
+    ("ac_start", "I"),      # Per state: first transition (CSR layout, sorted by char)
+    ("ac_char", "I"),       # Transition code points
+    ("ac_next", "I"),       # Transition targets
+    ("ac_fail", "I"),       # Failure link per state
+    ("ac_out", "I"),        # Smallest matching row per state, or NO_MATCH
+    ("ac_own", "I"),        # Row whose key ends exactly at each state, or NO_MATCH
+    ("ac_link", "I"),       # Nearest failure-chain state ending a key (0 = none)
+    ("gram_keys", "Q"),     # Sorted bigram keys
+    ("gram_start", "I"),    # Posting list start per bigram (+1 sentinel)
+    ("postings", "I"),      # Rows containing each bigram, ascending
+]
+
+# magic, version, rows, first non-empty row, separator-safe flag,
+# source mtime_ns, size, inode, then (offset, length) per section
+HEADER = struct.Struct("<8sIIII qqQ" + "QQ" * len(SECTIONS))
+
+
+def default_snapshot_path(csv_path: str) -> str:
+    """Snapshot location used for a CSV file: alongside it, with a .snap suffix."""
+    return csv_path + ".snap"
+
+
+# ================== COMPILER ==================
+
+def _build_sections(pairs: Sequence[Tuple[str, str]]) -> Tuple[dict, int, bool]:
+    """
+    Build every section of a snapshot from (question, answer) pairs.
+
+    Returns:
+        Tuple[dict, int, bool]: Section name -> bytes, first non-empty row,
+            and whether no key contains the NUL separator.
+    """
+    n = len(pairs)
+    keys = [normalize_key(q) for q, _ in pairs]
+
+    # String tables
+    text_offsets = array("Q", [0])
+    text_parts = []
+    pos = 0
+    for question, answer in pairs:
+        for value in (question, answer):
+            data = value.encode("utf-8")
+            text_parts.append(data)
+            pos += len(data)
+            text_offsets.append(pos)
+
+    key_offsets = array("Q", [0])
+    key_parts = []
+    pos = 0
+    for key in keys:
+        data = key.encode("utf-8") + b"\x00"
+        key_parts.append(data)
+        pos += len(data)
+        key_offsets.append(pos)
+
+    # Exact index: first occurrence of each key wins
+    capacity = 1
+    while capacity < 2 * max(n, 1):
+        capacity *= 2
+    exact = array("I", bytes(4 * capacity))
+    seen = set()
+    for row, key in enumerate(keys):
+        if key in seen:
+            continue
+        seen.add(key)
+        slot = zlib.crc32(key_parts[row][:-1]) & (capacity - 1)
+        while exact[slot]:
+            slot = (slot + 1) & (capacity - 1)
+        exact[slot] = row + 1
+
+    # Aho-Corasick automaton over the non-empty keys, stored as CSR arrays
+    rows = [row for row, key in enumerate(keys) if key]
+    automaton = AhoCorasick([keys[row] for row in rows], rows)
+    states = len(automaton)
+    char_mask = (1 << CHAR_BITS) - 1
+    ac_start = array("I", bytes(4 * (states + 1)))
+    ac_char = array("I")
+    ac_next = array("I")
+    transitions = sorted(automaton.delta.items())  # Sorted by (state, char)
+    for transition, target in transitions:
+        ac_start[(transition >> CHAR_BITS) + 1] += 1
+        ac_char.append(transition & char_mask)
+        ac_next.append(target)
+    for state in range(states):
+        ac_start[state + 1] += ac_start[state]
+
+    # Bigram postings for the "message contained in question" direction
+    grams = {}
+    for row in rows:
+        key = keys[row]
+        for gram in {bigram_key(key[i], key[i + 1]) for i in range(len(key) - 1)}:
+            grams.setdefault(gram, []).append(row)
+    gram_keys = array("Q", sorted(grams))
+    gram_start = array("I", [0])
+    postings = array("I")
+    for gram in gram_keys:
+        postings.extend(grams[gram])
+        gram_start.append(len(postings))
+
+    sections = {
+        "text_offsets": text_offsets.tobytes(),
+        "text": b"".join(text_parts),
+        "key_offsets": key_offsets.tobytes(),
+        "keys": b"".join(key_parts),
+        "exact": exact.tobytes(),
+        "same_next": array("I", same_key_chain(keys)).tobytes(),
+        "ac_start": ac_start.tobytes(),
+        "ac_char": ac_char.tobytes(),
+        "ac_next": ac_next.tobytes(),
+        "ac_fail": automaton.fail.tobytes(),
+        "ac_out": array("I", automaton.out).tobytes(),
+        "ac_own": array("I", automaton.own).tobytes(),
+        "ac_link": automaton.link.tobytes(),
+        "gram_keys": gram_keys.tobytes(),
+        "gram_start": gram_start.tobytes(),
+        "postings": postings.tobytes(),
+    }
+    first_nonempty = rows[0] if rows else NO_MATCH
+    separator_safe = not any("\x00" in key for key in keys)
+    return sections, first_nonempty, separator_safe
+
+
+def compile_pairs(pairs: Sequence[Tuple[str, str]], snapshot_path: str, signature: FileSignature = None) -> int:
+    """
+    Write a snapshot for the given pairs, atomically (temp file + rename).
+
+    Args:
+        pairs (Sequence[Tuple[str, str]]): Stripped (question, answer) pairs.
+        snapshot_path (str): Output file.
+        signature (FileSignature): File signature of the source CSV, stored in the header.
+
+    Returns:
+        int: Size of the snapshot in bytes.
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("FAQ snapshots are only supported on little-endian hosts")
+    sections, first_nonempty, separator_safe = _build_sections(pairs)
+
+    table = []
+    offset = HEADER.size
+    for name, _ in SECTIONS:
+        offset = (offset + 7) & ~7
+        table.extend((offset, len(sections[name])))
+        offset += len(sections[name])
+    mtime_ns, size, inode = signature or (0, 0, 0)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(pairs), first_nonempty, int(separator_safe),
+        mtime_ns, size, inode, *table,
+    )
+
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".faq-", suffix=".snap.tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for i, (name, _) in enumerate(SECTIONS):
+                f.write(b"\x00" * (table[2 * i] - f.tell()))
+                f.write(sections[name])
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return offset
+
+
+def compile_snapshot(csv_path: str, snapshot_path: Optional[str] = None, signature: FileSignature = None) -> str:
+    """
+    Compile a FAQ CSV file into a snapshot.
+
+    Args:
+        csv_path (str): Source CSV file.
+        snapshot_path (Optional[str]): Output file, next to the CSV by default.
+        signature (FileSignature): Source signature taken before reading the CSV;
+            taken here if not given.
+
+    Returns:
+        str: Path of the written snapshot.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    if signature is None:
+        signature = file_signature(csv_path)
+    try:
+        pairs = read_faq_pairs(csv_path)
+    except FileNotFoundError:
+        pairs = []
+    compile_pairs(pairs, snapshot_path, signature)
+    return snapshot_path
+
+
+# ================== READER ==================
+
+class MappedPairs(SequenceABC):
+    """Read-only sequence of (question, answer) tuples decoded from the snapshot."""
+
+    def __init__(self, snapshot: "MappedSnapshot") -> None:
+        self._offsets = snapshot.section("text_offsets")
+        self._text = snapshot.section("text")
+        self._rows = snapshot.rows
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self._rows))]
+        if row < 0:
+            row += self._rows
+        if not 0 <= row < self._rows:
+            raise IndexError("FAQ row out of range")
+        o = self._offsets
+        text = self._text
+        return (
+            str(text[o[2 * row]:o[2 * row + 1]], "utf-8"),
+            str(text[o[2 * row + 1]:o[2 * row + 2]], "utf-8"),
+        )
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for row in range(self._rows):
+            yield self[row]
+
+
+class MappedMatcher(BaseMatcher):
+    """
+    Match index answering queries directly from the memory-mapped sections.
+    Produces the same results as app.matcher.FAQMatcher.
+    """
+
+    def __init__(self, snapshot: "MappedSnapshot") -> None:
+        self.rows = snapshot.rows
+        self.first_nonempty = snapshot.first_nonempty
+        self.separator_safe = snapshot.separator_safe
+        self._mm = snapshot.mm
+        self._keys_start = snapshot.offset("keys")
+        self._keys = snapshot.section("keys")
+        self._key_offsets = snapshot.section("key_offsets")
+        self._exact = snapshot.section("exact")
+        self._same_next = snapshot.section("same_next")
+        self._ac_start = snapshot.section("ac_start")
+        self._ac_char = snapshot.section("ac_char")
+        self._ac_next = snapshot.section("ac_next")
+        self._ac_fail = snapshot.section("ac_fail")
+        self._ac_out = snapshot.section("ac_out")
+        self._ac_own = snapshot.section("ac_own")
+        self._ac_link = snapshot.section("ac_link")
+        self._gram_keys = snapshot.section("gram_keys")
+        self._gram_start = snapshot.section("gram_start")
+        self._postings = snapshot.section("postings")
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _key_bytes(self, row: int) -> memoryview:
+        """Normalized key of a row, without its separator."""
+        return self._keys[self._key_offsets[row]:self._key_offsets[row + 1] - 1]
+
+    def key(self, row: int) -> str:
+        """See BaseMatcher.key()."""
+        return str(self._key_bytes(row), "utf-8")
+
+    def exact(self, key: str, exclude: Optional[Collection[int]] = None) -> Optional[int]:
+        """See BaseMatcher.exact()."""
+        table = self._exact
+        mask = len(table) - 1
+        data = key.encode("utf-8")
+        slot = zlib.crc32(data) & mask
+        while True:
+            entry = table[slot]
+            if entry == 0:
+                return None
+            if self._key_bytes(entry - 1) == data:
+                break
+            slot = (slot + 1) & mask
+        row = entry - 1
+        if exclude:
+            while row in exclude:
+                row = self._same_next[row]
+            if row == NO_MATCH:
+                return None
+        return row
+
+    def _contained(self, key: str, exclude: Optional[Collection[int]] = None) -> int:
+        """Aho-Corasick scan of the message over the CSR transition arrays."""
+        start, chars, nexts = self._ac_start, self._ac_char, self._ac_next
+        fail, out = self._ac_fail, self._ac_out
+        if exclude:
+            own, link, same_next = self._ac_own, self._ac_link, self._same_next
+        state = 0
+        best = NO_MATCH
+        for ch in key:
+            c = ord(ch)
+            while True:
+                lo, hi = start[state], start[state + 1]
+                i = bisect_left(chars, c, lo, hi)
+                if i < hi and chars[i] == c:
+                    state = nexts[i]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if exclude:
+                # Enumerate every key ending here; see AhoCorasick.search_excluding()
+                hit = state if own[state] != NO_MATCH else link[state]
+                while hit and out[hit] < best:
+                    row = own[hit]
+                    while row in exclude:
+                        row = same_next[row]
+                    if row < best:
+                        best = row
+                    hit = link[hit]
+            elif out[state] < best:
+                best = out[state]
+                if best == 0:
+                    break
+        return best
+
+    def _postings_for(self, gram: int) -> Optional[memoryview]:
+        """Posting list of a bigram, or None if no question contains it."""
+        keys = self._gram_keys
+        i = bisect_left(keys, gram)
+        if i == len(keys) or keys[i] != gram:
+            return None
+        return self._postings[self._gram_start[i]:self._gram_start[i + 1]]
+
+    def _containing(self, key: str, limit: int, exclude: Optional[Collection[int]] = None) -> int:
+        """Smallest row below limit whose key contains the message."""
+        exclude = exclude or ()
+        if not key:
+            row = self.first_nonempty
+            while row < min(limit, self.rows) and (row in exclude or not self._key_bytes(row)):
+                row += 1
+            return row if row < min(limit, self.rows) else NO_MATCH
+        data = key.encode("utf-8")
+
+        if len(key) >= 2:
+            candidates = None
+            for i in range(len(key) - 1):
+                postings = self._postings_for(bigram_key(key[i], key[i + 1]))
+                if postings is None:
+                    return NO_MATCH
+                if candidates is None or len(postings) < len(candidates):
+                    candidates = postings
+            if len(candidates) <= MAX_VERIFY_CANDIDATES:
+                for row in candidates:
+                    if row >= limit:
+                        break
+                    if data in bytes(self._key_bytes(row)) and row not in exclude:
+                        return row
+                return NO_MATCH
+
+        end_row = min(limit, self.rows)
+        if not self.separator_safe:
+            for row in range(end_row):
+                if data in bytes(self._key_bytes(row)) and row not in exclude:
+                    return row
+            return NO_MATCH
+        if b"\x00" in data:
+            return NO_MATCH  # No key contains the separator
+
+        # Keys are stored in row order, so the first hit is the smallest row
+        start = self._keys_start
+        end = self._keys_start + self._key_offsets[end_row]
+        while True:
+            pos = self._mm.find(data, start, end)
+            if pos < 0:
+                return NO_MATCH
+            row = bisect_right(self._key_offsets, pos - self._keys_start) - 1
+            if row not in exclude:
+                return row
+            start = self._keys_start + self._key_offsets[row + 1]  # Resume after the excluded key
+
+
+class MappedSnapshot:
+    """
+    Read-only memory-mapped view of a compiled snapshot file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Map a snapshot file.
+
+        Args:
+            path (str): Snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot of this format version.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a FAQ snapshot")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self.mm, 0)
+        magic, version, rows, first_nonempty, separator_safe, mtime_ns, fsize, inode = fields[:8]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} is not a FAQ snapshot (version {FORMAT_VERSION})")
+        self.rows = rows
+        self.first_nonempty = first_nonempty
+        self.separator_safe = bool(separator_safe)
+        self.signature: FileSignature = (mtime_ns, fsize, inode)
+        self.size = size
+        self._table = {
+            name: (fields[8 + 2 * i], fields[9 + 2 * i], typecode)
+            for i, (name, typecode) in enumerate(SECTIONS)
+        }
+        self._view = memoryview(self.mm)
+        self.pairs = MappedPairs(self)
+        self.matcher = MappedMatcher(self)
+
+    def offset(self, name: str) -> int:
+        """Absolute file offset of a section."""
+        return self._table[name][0]
+
+    def section(self, name: str) -> memoryview:
+        """
+        Zero-copy view of one section.
+
+        Args:
+            name (str): Section name from SECTIONS.
+
+        Returns:
+            memoryview: Byte view, or a typed view for array sections.
+        """
+        offset, length, typecode = self._table[name]
+        view = self._view[offset:offset + length]
+        return view.cast(typecode) if typecode else view
+
+
+def load_snapshot(path: str) -> MappedSnapshot:
+    """
+    Map an existing snapshot file.
+
+    Args:
+        path (str): Snapshot file.
+
+    Returns:
+        MappedSnapshot: The mapped snapshot.
+    """
+    return MappedSnapshot(path)
+
+
+def load_or_compile(csv_path: str, signature: FileSignature, snapshot_path: Optional[str] = None) -> MappedSnapshot:
+    """
+    Map the snapshot for a CSV file, recompiling it if it is missing or stale.
+
+    Args:
+        csv_path (str): Source CSV file.
+        signature (FileSignature): Current signature of the CSV file.
+        snapshot_path (Optional[str]): Snapshot file, next to the CSV by default.
+
+    Returns:
+        MappedSnapshot: Snapshot matching the given signature.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    try:
+        snapshot = MappedSnapshot(snapshot_path)
+        if snapshot.signature == (signature or (0, 0, 0)):
+            return snapshot
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+    compile_snapshot(csv_path, snapshot_path, signature)
+    return MappedSnapshot(snapshot_path)
+
+
+def preload(csv_path: str, snapshot_path: Optional[str] = None, chunk: int = 1 << 20) -> str:
+    """
+    Bring the snapshot of a CSV file up to date and read it into the OS page
+    cache, so processes started afterwards map a warm file instead of each
+    compiling it.
+
+    Args:
+        csv_path (str): Source CSV file.
+        snapshot_path (Optional[str]): Snapshot file, next to the CSV by default.
+        chunk (int): Read size in bytes.
+
+    Returns:
+        str: Path of the snapshot file.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    load_or_compile(csv_path, file_signature(csv_path), snapshot_path)
+    with open(snapshot_path, "rb", buffering=0) as f:
+        while f.read(chunk):
+            pass
+    return snapshot_path
+
+
+if __name__ == "__main__":
+    from app.utils import DATA_PATH
+
+    source = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else None
+    written = compile_snapshot(source, target)
+    print(f"Compiled {source} -> {written} ({os.path.getsize(written)} bytes)")
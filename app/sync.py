@@ -0,0 +1,183 @@
+"""
+Cross-worker FAQ reload propagation without external services.
+
+A shared generation counter lives in a small file next to the FAQ CSV
+(`<csv>.gen`). Any worker that changes or reloads the FAQ increments it;
+every worker compares it to the value it last applied (one pread per check)
+and reloads when it moved. Each worker also writes a heartbeat file under
+`<csv>.workers/` stating the generation it has applied, so the admin
+endpoints can report when all live workers have caught up.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+from app.utils import FAQ_SYNC_INTERVAL, FAQ_PROPAGATION_TIMEOUT
+
+try:
+    import fcntl  # POSIX only; without it concurrent publishes may collide
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+log = logging.getLogger("uvicorn.error")
+
+COUNTER = struct.Struct("<Q")
+
+
+class ReloadBroadcast:
+    """
+    Generation counter and worker acknowledgements shared through files.
+    """
+
+    def __init__(self, base_path: str, interval: float = FAQ_SYNC_INTERVAL) -> None:
+        """
+        Args:
+            base_path (str): FAQ CSV path; the counter and worker files sit next to it.
+            interval (float): Heartbeat interval of the workers in seconds.
+        """
+        self.counter_path = base_path + ".gen"
+        self.workers_dir = base_path + ".workers"
+        self.interval = interval
+        self.pid = os.getpid()
+        self._fd: Optional[int] = None
+
+    # ================== GENERATION COUNTER ==================
+    def _counter_fd(self) -> int:
+        """File descriptor of the counter file, opened once per process."""
+        if self._fd is None or self.pid != os.getpid():
+            # Re-open after fork so each process owns its descriptor
+            self.pid = os.getpid()
+            self._fd = os.open(self.counter_path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def current(self) -> int:
+        """
+        Read the shared generation counter.
+
+        Returns:
+            int: Latest published generation (0 if nothing was published yet).
+        """
+        data = os.pread(self._counter_fd(), COUNTER.size, 0)
+        return COUNTER.unpack(data)[0] if len(data) == COUNTER.size else 0
+
+    def publish(self) -> int:
+        """
+        Increment the shared generation counter so all workers reload.
+
+        Returns:
+            int: The new generation.
+        """
+        fd = self._counter_fd()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            generation = self.current() + 1
+            os.pwrite(fd, COUNTER.pack(generation), 0)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return generation
+
+    # ================== WORKER ACKNOWLEDGEMENTS ==================
+    def acknowledge(self, generation: int) -> None:
+        """
+        Record (and heartbeat) the generation this worker has applied.
+
+        Args:
+            generation (int): Shared generation the worker's FAQ data reflects.
+        """
+        os.makedirs(self.workers_dir, exist_ok=True)
+        path = os.path.join(self.workers_dir, str(os.getpid()))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"{generation} {time.time():.3f}")
+        os.replace(tmp_path, path)
+
+    def retire(self) -> None:
+        """Remove this worker's acknowledgement file (on shutdown)."""
+        try:
+            os.unlink(os.path.join(self.workers_dir, str(os.getpid())))
+        except FileNotFoundError:
+            pass
+
+    def worker_states(self) -> Dict[int, Tuple[int, float]]:
+        """
+        Read the acknowledgements of live workers; stale files are removed.
+
+        Returns:
+            Dict[int, Tuple[int, float]]: pid -> (applied generation, last heartbeat).
+        """
+        states: Dict[int, Tuple[int, float]] = {}
+        deadline = time.time() - 3 * self.interval - 1.0
+        try:
+            names = os.listdir(self.workers_dir)
+        except FileNotFoundError:
+            return states
+        for name in names:
+            if not name.isdigit():
+                continue
+            path = os.path.join(self.workers_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    generation, heartbeat = f.read().split()
+                generation, heartbeat = int(generation), float(heartbeat)
+            except (OSError, ValueError):
+                continue
+            if heartbeat < deadline:
+                try:
+                    os.unlink(path)  # Worker exited or hung
+                except FileNotFoundError:
+                    pass
+                continue
+            states[int(name)] = (generation, heartbeat)
+        return states
+
+    async def wait_for(self, generation: int, timeout: float = FAQ_PROPAGATION_TIMEOUT) -> dict:
+        """
+        Wait until every live worker has applied a generation.
+
+        Args:
+            generation (int): Generation returned by publish().
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            dict: "propagated" flag, worker counts and time waited.
+        """
+        started = time.monotonic()
+        while True:
+            states = self.worker_states()
+            behind = [pid for pid, (applied, _) in states.items() if applied < generation]
+            waited = time.monotonic() - started
+            if not behind or waited >= timeout:
+                return {
+                    "generation": generation,
+                    "propagated": not behind,
+                    "workers": len(states),
+                    "pending_workers": len(behind),
+                    "seconds": round(waited, 3),
+                }
+            await asyncio.sleep(min(0.05, self.interval / 4))
+
+
+async def run_sync_loop(bot, interval: float = FAQ_SYNC_INTERVAL) -> None:
+    """
+    Keep one worker's FAQBot converged with the shared generation.
+
+    Checks for changes every interval (so idle workers catch up too) and
+    heartbeats the applied generation. Runs until cancelled.
+
+    Args:
+        bot (FAQBot): Bot whose broadcast is used.
+        interval (float): Seconds between checks.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(bot.refresh, True)
+            bot.broadcast.acknowledge(bot.applied_generation)
+        except Exception:
+            log.exception("FAQ sync check failed")
+        await asyncio.sleep(interval)
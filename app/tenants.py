@@ -0,0 +1,380 @@
+"""
+Multi-page tenancy: one process answering many Facebook pages.
+
+Every webhook entry names the page it was sent to (entry["id"]). Pages
+listed in FB_PAGES_CONFIG get their own FAQ file, access token, send
+scheduler (rate limits are per page) and image attachment cache:
+
+    {
+        "104729381234": {"access_token_env": "SHOP_A_TOKEN"},
+        "209384756123": {"faq": "/srv/faq/shop-b.csv", "access_token": "EAAB..."}
+    }
+
+"faq" defaults to <FB_PAGES_DIR>/<page id>/faq.csv and relative paths are
+taken from the config file's directory; a page without a token sends with
+PAGE_ACCESS_TOKEN. Pages not listed are answered by the default page
+(DATA_PATH, PAGE_ACCESS_TOKEN), as before.
+
+A page's FAQ bot is loaded on its first message, off the event loop, and
+the least recently used pages are unloaded once their estimated memory
+exceeds FAQ_TENANT_MEMORY_MB, so hundreds of pages can share a process
+without loading every FAQ at startup. With FAQ snapshots (the default) a
+reload after eviction maps the compiled .snap file instead of parsing the
+CSV again. The config file is re-read when it changes, off the event loop.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app import metrics
+from app.ai_engine import AnswerCache, FAQBot, faq_bot
+from app.attachments import AttachmentCache, attachments, run_attachment_sync
+from app.faq_store import FileSignature, file_signature
+from app.messenger import messenger, scheduler
+from app.scheduler import SendScheduler
+from app.utils import (
+    PAGE_ACCESS_TOKEN,
+    FB_PAGES_CONFIG,
+    FB_PAGES_DIR,
+    FAQ_SYNC_INTERVAL,
+    FAQ_TENANT_MEMORY_MB,
+    FAQ_TENANT_CACHE_SIZE,
+)
+
+log = logging.getLogger("uvicorn.error")
+
+# Estimated bytes per byte of FAQ CSV, measured on generated 1k-10k row
+# FAQs: a mapped snapshot file is 7.1-7.5 times the CSV (its heap is
+# negligible), in-memory indexing holds all rows as Python objects
+# (tracemalloc), and ranked and keyword mode add their indexes either way
+SNAPSHOT_BYTES_PER_CSV_BYTE = 7
+MEMORY_BYTES_PER_CSV_BYTE = 25
+RANKED_BYTES_PER_CSV_BYTE = 5
+KEYWORD_BYTES_PER_CSV_BYTE = 8
+
+# Fixed cost of a loaded page: bot, scheduler, caches and their tables
+PAGE_OVERHEAD_BYTES = 256 * 1024
+
+
+class Page:
+    """FAQ bot, send scheduler and image attachments answering one Facebook page."""
+
+    def __init__(
+        self,
+        page_id: Optional[str],
+        bot: FAQBot,
+        sender: SendScheduler,
+        images: AttachmentCache,
+        footprint: int = 0,
+    ) -> None:
+        """
+        Args:
+            page_id (Optional[str]): Page id, None for the default page.
+            bot (FAQBot): Bot answering the page's messages.
+            sender (SendScheduler): Scheduler posting with the page's token.
+            images (AttachmentCache): attachment_ids uploaded for the page.
+            footprint (int): Estimated memory of the page in bytes.
+        """
+        self.page_id = page_id
+        self.bot = bot
+        self.sender = sender
+        self.images = images
+        self.footprint = footprint
+        self.upload_task: Optional[asyncio.Task] = None
+        self.loaded_at = time.time()
+
+
+def estimate_footprint(bot: FAQBot) -> int:
+    """
+    Estimated memory of a loaded FAQ bot, from the size of its CSV file.
+
+    Args:
+        bot (FAQBot): Loaded bot.
+
+    Returns:
+        int: Bytes.
+    """
+    try:
+        size = os.path.getsize(bot.csv_path)
+    except OSError:
+        size = 0
+    snapshot = bot.snapshot
+    per_byte = SNAPSHOT_BYTES_PER_CSV_BYTE if snapshot.mapped is not None else MEMORY_BYTES_PER_CSV_BYTE
+    if snapshot.fuzzy is not None:
+        per_byte += RANKED_BYTES_PER_CSV_BYTE
+    if snapshot.keywords is not None:
+        per_byte += KEYWORD_BYTES_PER_CSV_BYTE
+    return PAGE_OVERHEAD_BYTES + size * per_byte
+
+
+def read_pages_config(path: str, pages_dir: str) -> Optional[Dict[str, dict]]:
+    """
+    Read the page config file.
+
+    Args:
+        path (str): JSON file mapping page ids to {"faq", "access_token",
+            "access_token_env", "attachments"} (all optional).
+        pages_dir (str): Directory of the per-page default files.
+
+    Returns:
+        Optional[Dict[str, dict]]: page id -> resolved {"faq", "access_token",
+            "attachments"}; empty if the file is missing, None if it is unreadable.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable page config %s (%s)", path, e)
+        return None
+    if not isinstance(data, dict):
+        log.warning("Ignoring page config %s: expected an object of page ids", path)
+        return None
+
+    base = os.path.dirname(os.path.abspath(path))
+    pages = {}
+    for page_id, entry in data.items():
+        if not isinstance(entry, dict):
+            log.warning("Ignoring page %s in %s: expected an object", page_id, path)
+            continue
+        page_id = str(page_id)
+        page_dir = os.path.join(pages_dir, page_id)
+        token_env = entry.get("access_token_env")
+        token = entry.get("access_token") or (os.getenv(token_env, "") if token_env else "")
+        if not token:
+            log.warning("Page %s has no access token, sending with PAGE_ACCESS_TOKEN", page_id)
+        faq = entry.get("faq") or os.path.join(page_dir, "faq.csv")
+        images = entry.get("attachments") or os.path.join(page_dir, "attachments.json")
+        pages[page_id] = {
+            "faq": os.path.join(base, faq),
+            "access_token": token or PAGE_ACCESS_TOKEN,
+            "attachments": os.path.join(base, images),
+        }
+    return pages
+
+
+class TenantRegistry:
+    """
+    Page id -> Page, loading pages lazily and evicting them by LRU.
+
+    Features:
+    - Config re-read when its file changes, and page footprints updated
+      after FAQ reloads (checked every check_interval, on a worker thread).
+    - One load per page at a time, on a worker thread.
+    - LRU eviction past memory_budget; the page just used is always kept.
+    - Unknown pages and events without a page id use the default page.
+    """
+
+    def __init__(
+        self,
+        default: Page,
+        config_path: str = FB_PAGES_CONFIG,
+        pages_dir: str = FB_PAGES_DIR,
+        memory_budget: int = int(FAQ_TENANT_MEMORY_MB * 1024 * 1024),
+        cache_size: int = FAQ_TENANT_CACHE_SIZE,
+        check_interval: float = FAQ_SYNC_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            default (Page): Page answering messages to unconfigured pages.
+            config_path (str): Page config file (see read_pages_config()).
+            pages_dir (str): Directory of the per-page default files.
+            memory_budget (int): Estimated bytes of loaded pages before the
+                least recently used ones are unloaded.
+            cache_size (int): Answer cache entries per page.
+            check_interval (float): Minimum seconds between config file checks.
+        """
+        self.default = default
+        self.config_path = config_path
+        self.pages_dir = pages_dir
+        self.memory_budget = memory_budget
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._config: Dict[str, dict] = {}
+        self._signature: FileSignature = None
+        self._next_check = 0.0
+        self._pages: "OrderedDict[str, Page]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.memory = 0  # Estimated bytes of the loaded pages
+        self.hits = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.config_reloads = 0
+        self.refresh()
+
+    # ================== CONFIG ==================
+    def refresh(self) -> None:
+        """Re-read the config file if it changed (blocking; at startup)."""
+        self._next_check = time.monotonic() + self.check_interval
+        changed = self._read_config()
+        if changed is not None:
+            self._apply_config(*changed)
+
+    async def _check(self) -> None:
+        """
+        Periodic check from get(): re-read the config file and re-estimate
+        the loaded pages on a worker thread, then apply the results.
+        """
+        self._next_check = time.monotonic() + self.check_interval  # One check at a time
+        pages = list(self._pages.values())
+        changed, footprints = await asyncio.to_thread(self._scan, pages)
+        for page, footprint in zip(pages, footprints):
+            if self._pages.get(page.page_id) is page and footprint != page.footprint:
+                self.memory += footprint - page.footprint  # The page's FAQ was reloaded
+                page.footprint = footprint
+        if changed is not None:
+            self._apply_config(*changed)
+        self._evict()
+
+    def _scan(self, pages: List[Page]) -> Tuple[Optional[Tuple[FileSignature, Dict[str, dict]]], List[int]]:
+        """Blocking part of _check(): config changes and current page footprints."""
+        return self._read_config(), [estimate_footprint(page.bot) for page in pages]
+
+    def _read_config(self) -> Optional[Tuple[FileSignature, Dict[str, dict]]]:
+        """(signature, config) if the config file changed and is readable, else None (blocking)."""
+        signature = file_signature(self.config_path)
+        if signature == self._signature:
+            return None
+        config = read_pages_config(self.config_path, self.pages_dir)
+        if config is None:
+            return None  # Keep serving the last good config
+        return signature, config
+
+    def _apply_config(self, signature: FileSignature, config: Dict[str, dict]) -> None:
+        """Switch to a new config; unload pages whose entry changed."""
+        self._signature = signature
+        if config != self._config:
+            for page_id in [p for p in self._pages if config.get(p) != self._config.get(p)]:
+                self._unload(page_id)
+            self._config = config
+            self.config_reloads += 1
+            log.info("Page config %s: %d page(s)", self.config_path, len(config))
+
+    # ================== LOOKUP ==================
+    async def get(self, page_id: Optional[str]) -> Page:
+        """
+        Page answering messages sent to page_id, loading it if needed.
+
+        Args:
+            page_id (Optional[str]): entry["id"] of the webhook event.
+
+        Returns:
+            Page: The page's tenant, or the default page.
+        """
+        if time.monotonic() >= self._next_check:
+            await self._check()
+        if page_id is None or page_id not in self._config:
+            return self.default
+        page = self._pages.get(page_id)
+        if page is not None:
+            self._pages.move_to_end(page_id)
+            self.hits += 1
+            metrics.FAQ_TENANT_EVENTS.labels("hit").inc()
+            return page
+
+        task = self._loading.get(page_id)
+        if task is None:
+            task = asyncio.create_task(self._load(page_id, self._config[page_id]))
+            self._loading[page_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(page_id, None))
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            log.exception("Could not load the FAQ of page %s, answering from the default page", page_id)
+            return self.default
+
+    def _open_bot(self, page_id: str, entry: dict) -> FAQBot:
+        """Load a page's FAQ bot (blocking; runs on a worker thread)."""
+        if not os.path.exists(entry["faq"]):
+            log.warning("FAQ file %s of page %s not found", entry["faq"], page_id)
+        return FAQBot(entry["faq"], cache=AnswerCache(maxsize=self.cache_size))
+
+    async def _load(self, page_id: str, entry: dict) -> Page:
+        """Load a page off the event loop, then make room for it."""
+        started = time.perf_counter()
+        try:
+            bot = await asyncio.to_thread(self._open_bot, page_id, entry)
+        except Exception:
+            self.load_errors += 1
+            raise
+        metrics.FAQ_TENANT_LOAD_SECONDS.labels().observe(time.perf_counter() - started)
+        metrics.FAQ_TENANT_EVENTS.labels("load").inc()
+        self.loads += 1
+
+        token = entry["access_token"]
+        sender = SendScheduler(functools.partial(messenger.post, max_retries=0, access_token=token))
+        images = AttachmentCache(
+            entry["attachments"], upload=functools.partial(messenger.upload_attachment, access_token=token),
+        )
+        page = Page(page_id, bot, sender, images, estimate_footprint(bot))
+        if self._config.get(page_id) != entry:
+            return page  # The config changed during the load: serve this message, keep nothing
+        if images.enabled:
+            os.makedirs(os.path.dirname(entry["attachments"]), exist_ok=True)
+            page.upload_task = asyncio.create_task(run_attachment_sync(bot, images))
+        self._pages[page_id] = page
+        self.memory += page.footprint
+        log.info("Loaded FAQ of page %s (%d rows, ~%.1f MB)",
+                 page_id, len(bot.snapshot.qa_pairs), page.footprint / 1024 / 1024)
+        self._evict()
+        return page
+
+    def _unload(self, page_id: str) -> None:
+        """Forget a loaded page and stop its image uploads."""
+        page = self._pages.pop(page_id)
+        self.memory -= page.footprint
+        if page.upload_task is not None:
+            page.upload_task.cancel()
+
+    def _evict(self) -> None:
+        """Unload least recently used pages until the loaded ones fit the budget."""
+        while self.memory > self.memory_budget and len(self._pages) > 1:
+            page_id = next(iter(self._pages))
+            self._unload(page_id)
+            self.evictions += 1
+            metrics.FAQ_TENANT_EVENTS.labels("evict").inc()
+            log.info("Unloaded FAQ of page %s (memory budget)", page_id)
+
+    async def close(self) -> None:
+        """Stop the image uploads of the loaded pages."""
+        tasks = [page.upload_task for page in self._pages.values() if page.upload_task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Configured and loaded pages, memory estimate and load/eviction counters."""
+        return {
+            "config": self.config_path,
+            "configured": len(self._config),
+            "loaded": len(self._pages),
+            "loading": len(self._loading),
+            "memory_bytes": self.memory,
+            "memory_budget": self.memory_budget,
+            "hits": self.hits,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "config_reloads": self.config_reloads,
+            "pages": {
+                page_id: {
+                    "rows": len(page.bot.snapshot.qa_pairs),
+                    "footprint": page.footprint,
+                    "sent": page.sender.sent,
+                    "failed": page.sender.failed,
+                }
+                for page_id, page in self._pages.items()
+            },
+        }
+
+
+# Shared registry for the FastAPI app; the default page is the single-page setup
+tenants = TenantRegistry(Page(None, faq_bot, scheduler, attachments))
@@ -0,0 +1,177 @@
+"""
+Text normalization and Thai word segmentation for FAQ matching.
+
+normalize_text() is the single normalization pipeline used for questions
+(once, when an index is built) and messages (once per lookup):
+
+1. Zero-width and other invisible characters are removed.
+2. Unicode NFC, so precomposed and decomposed forms compare equal.
+3. Thai typing variants are folded: a repeated tone mark or vowel sign
+   counts once, and NIKHAHIT + SARA AA is written as SARA AM.
+4. Case folding to lowercase and collapsing of whitespace runs.
+
+ThaiSegmenter splits normalized text into words: Thai runs (written without
+spaces) by longest dictionary match over a trie, everything else at
+whitespace and punctuation.
+"""
+
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+# Invisible characters that copy-pasted or mobile-typed text often carries:
+# zero-width space/non-joiner/joiner, word joiner, BOM and soft hyphen
+ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u00ad"))
+
+# A Thai vowel sign, tone mark or other combining mark typed twice in a row
+_REPEATED_MARK = re.compile("([\u0e31\u0e34-\u0e3a\u0e47-\u0e4e])\\1+")
+
+# NIKHAHIT (+ optional tone mark) + SARA AA, which renders like SARA AM
+_SPLIT_SARA_AM = re.compile("\u0e4d([\u0e48-\u0e4b]?)\u0e32")
+
+# Runs of Thai letters and signs, and runs of other word characters (incl. Thai digits)
+_TOKEN_RUN = re.compile("([\u0e01-\u0e4e]+)|([^\\W\u0e01-\u0e4e]+)")
+
+# Bundled Thai word list; FAQ_THAI_DICT may name a file with more words
+DEFAULT_DICTIONARY = os.path.join(os.path.dirname(__file__), "thai_words.txt")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a question or message for matching.
+
+    Args:
+        text (str): Raw text.
+
+    Returns:
+        str: Normalized text; see the module docstring for the steps.
+    """
+    # Invisible characters go first: one between a letter and its combining
+    # mark would otherwise keep NFC from composing them
+    text = unicodedata.normalize("NFC", text.translate(ZERO_WIDTH))
+    if "\u0e4d" in text:
+        text = _SPLIT_SARA_AM.sub("\\1\u0e33", text)
+    text = _REPEATED_MARK.sub(r"\1", text)
+    return " ".join(text.lower().split())
+
+
+def load_words(path: str) -> List[str]:
+    """
+    Read a word list: one word per line, "#" starts a comment.
+
+    Args:
+        path (str): Word list file.
+
+    Returns:
+        List[str]: Normalized words.
+    """
+    words = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            word = normalize_text(line.split("#", 1)[0])
+            if word:
+                words.append(word)
+    return words
+
+
+class ThaiSegmenter:
+    """
+    Dictionary-based word segmenter (longest matching over a character trie).
+
+    Characters of a Thai run that start no dictionary word are kept together
+    as one unknown token up to the next position where a word starts.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        """
+        Build the trie.
+
+        Args:
+            words (Iterable[str]): Normalized dictionary words.
+        """
+        self._trie: Dict[str, dict] = {}
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        """Add one normalized word (whitespace-free) to the dictionary."""
+        if not word or " " in word:
+            return
+        node = self._trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        if "" not in node:
+            node[""] = {}  # End-of-word marker
+            self.size += 1
+
+    def _longest(self, text: str, start: int) -> int:
+        """Length of the longest dictionary word starting at text[start], 0 if none."""
+        node = self._trie
+        longest = 0
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if "" in node:
+                longest = i - start + 1
+        return longest
+
+    def _segment_thai(self, run: str, tokens: List[str]) -> None:
+        """Append the words of one run of Thai letters to tokens."""
+        i = 0
+        unknown_start = -1
+        while i < len(run):
+            length = self._longest(run, i)
+            if length:
+                if unknown_start >= 0:
+                    tokens.append(run[unknown_start:i])
+                    unknown_start = -1
+                tokens.append(run[i:i + length])
+                i += length
+            else:
+                if unknown_start < 0:
+                    unknown_start = i
+                i += 1
+        if unknown_start >= 0:
+            tokens.append(run[unknown_start:])
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Split normalized text into words.
+
+        Args:
+            text (str): Output of normalize_text().
+
+        Returns:
+            List[str]: Words in text order.
+        """
+        tokens: List[str] = []
+        for thai, other in _TOKEN_RUN.findall(text):
+            if thai:
+                self._segment_thai(thai, tokens)
+            else:
+                tokens.append(other)
+        return tokens
+
+
+_default_segmenter: Optional[ThaiSegmenter] = None
+
+
+def default_segmenter() -> ThaiSegmenter:
+    """
+    Segmenter over the bundled word list plus FAQ_THAI_DICT, loaded once.
+
+    Returns:
+        ThaiSegmenter: Shared segmenter.
+    """
+    global _default_segmenter
+    if _default_segmenter is None:
+        from app.utils import FAQ_THAI_DICT
+
+        words = load_words(DEFAULT_DICTIONARY)
+        if FAQ_THAI_DICT:
+            words += load_words(FAQ_THAI_DICT)
+        _default_segmenter = ThaiSegmenter(words)
+    return _default_segmenter
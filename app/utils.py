@@ -21,8 +21,135 @@ VERIFY_TOKEN: str = os.getenv("VERIFY_TOKEN", "default-verify-token")
 # Backend host URL (used for webhooks or API calls)
 BACKEND_HOST: str = os.getenv("BACKEND_HOST", "http://127.0.0.1:8000")
 
-# Facebook Graph API URL to send messages
-FB_API_URL: str = "https://graph.facebook.com/v21.0/me/messages"
+# Facebook Graph API URL to send messages (override to point at a local stub)
+FB_API_URL: str = os.getenv("FB_API_URL", "https://graph.facebook.com/v21.0/me/messages")
+
+# Outbound HTTP tuning for the async Messenger client
+FB_MAX_CONNECTIONS: int = int(os.getenv("FB_MAX_CONNECTIONS", "20"))
+FB_MAX_CONCURRENCY: int = int(os.getenv("FB_MAX_CONCURRENCY", "10"))
+FB_MAX_RETRIES: int = int(os.getenv("FB_MAX_RETRIES", "3"))
+FB_TIMEOUT: float = float(os.getenv("FB_TIMEOUT", "5"))
+
+# Outbound send scheduling: global rate limit, per-recipient pacing and retries
+FB_SEND_RATE: float = float(os.getenv("FB_SEND_RATE", "40"))
+FB_SEND_BURST: int = int(os.getenv("FB_SEND_BURST", "20"))
+FB_RECIPIENT_INTERVAL: float = float(os.getenv("FB_RECIPIENT_INTERVAL", "0.1"))
+FB_SEND_MAX_ATTEMPTS: int = int(os.getenv("FB_SEND_MAX_ATTEMPTS", "5"))
+FB_MAX_RETRY_DELAY: float = float(os.getenv("FB_MAX_RETRY_DELAY", "60"))
+
+# Image answers: upload each image URL once and reply with its attachment_id.
+# The upload endpoint defaults to the message_attachments sibling of FB_API_URL.
+FB_ATTACHMENT_REUSE: bool = os.getenv("FB_ATTACHMENT_REUSE", "true").lower() in ("1", "true", "yes")
+FB_ATTACHMENT_URL: str = os.getenv("FB_ATTACHMENT_URL", FB_API_URL.rsplit("/", 1)[0] + "/message_attachments")
+FB_ATTACHMENT_CACHE: str = os.getenv(
+    "FB_ATTACHMENT_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "attachments.json"),
+)
+FB_ATTACHMENT_CONCURRENCY: int = int(os.getenv("FB_ATTACHMENT_CONCURRENCY", "4"))
+
+# Multi-page tenancy: JSON file mapping page ids (the webhook entry "id") to
+# their own FAQ file and access token, and the directory holding each page's
+# files by default (<FB_PAGES_DIR>/<page id>/faq.csv). Pages not listed are
+# answered from DATA_PATH with PAGE_ACCESS_TOKEN.
+FB_PAGES_CONFIG: str = os.getenv(
+    "FB_PAGES_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pages.json"),
+)
+FB_PAGES_DIR: str = os.getenv(
+    "FB_PAGES_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pages"),
+)
+
+# ================== WEBHOOK PROCESSING ==================
+
+# Background workers answering webhook events (one queue shard each)
+WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+
+# Total number of events that may wait for a worker
+WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Events answered at once across all workers (a sender's messages still in
+# order); a slow or retrying send holds one of them
+WEBHOOK_MAX_IN_FLIGHT: int = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "200"))
+
+# Seconds the webhook handler waits for queue space before dropping an event
+WEBHOOK_ENQUEUE_TIMEOUT: float = float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "2"))
+
+# Seconds allowed on shutdown to finish queued events
+WEBHOOK_DRAIN_TIMEOUT: float = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+# Recently seen message ids remembered, by all workers together, to drop
+# redelivered webhook events (0 disables), and for how many seconds after
+# they were last seen
+WEBHOOK_DEDUP_SIZE: int = int(os.getenv("WEBHOOK_DEDUP_SIZE", "20000"))
+WEBHOOK_DEDUP_TTL: float = float(os.getenv("WEBHOOK_DEDUP_TTL", "3600"))
+
+# Opt-in capture of webhook payloads and chosen answers for tools/replay.py:
+# directory of the capture files (empty disables capture), file size at
+# which a file is rotated, rotated files kept, and records buffered in memory
+WEBHOOK_CAPTURE_DIR: str = os.getenv("WEBHOOK_CAPTURE_DIR", "")
+WEBHOOK_CAPTURE_MAX_BYTES: int = int(os.getenv("WEBHOOK_CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))
+WEBHOOK_CAPTURE_BACKUPS: int = int(os.getenv("WEBHOOK_CAPTURE_BACKUPS", "5"))
+WEBHOOK_CAPTURE_BUFFER: int = int(os.getenv("WEBHOOK_CAPTURE_BUFFER", "10000"))
+
+# Directory where each worker process flushes its metric values, so that
+# /metrics sums all workers (empty: a scrape sees only the worker serving it).
+# run.py creates a fresh one for production servers when it is unset
+METRICS_DIR: str = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+# ================== FAQ MATCHING ==================
+
+# Fall back to ranked fuzzy matching when no exact/partial match is found
+FAQ_RANKED_MODE: bool = os.getenv("FAQ_RANKED_MODE", "false").lower() in ("1", "true", "yes")
+
+# Minimum cosine similarity for a ranked answer to be used
+FAQ_RANKED_MIN_SCORE: float = float(os.getenv("FAQ_RANKED_MIN_SCORE", "0.5"))
+
+# Number of ranked candidates returned by FAQBot.rank()
+FAQ_RANKED_TOP_K: int = int(os.getenv("FAQ_RANKED_TOP_K", "3"))
+
+# Keyword matching (all words of a question found in the message, via the
+# Thai word segmenter) when the exact and partial rules find nothing. Off by
+# default: the keyword index is built in every worker on every reload
+FAQ_KEYWORD_MODE: bool = os.getenv("FAQ_KEYWORD_MODE", "false").lower() in ("1", "true", "yes")
+
+# Extra word list for the Thai segmenter (one word per line), e.g. product names
+FAQ_THAI_DICT: str = os.getenv("FAQ_THAI_DICT", "")
+
+# Default path to the FAQ CSV file
+DATA_PATH: str = os.getenv(
+    "FAQ_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "faq.csv"),
+)
+
+# Serve FAQs from a compiled, memory-mapped snapshot next to the CSV file
+FAQ_SNAPSHOT: bool = os.getenv("FAQ_SNAPSHOT", "true").lower() in ("1", "true", "yes")
+
+# Seconds between cross-worker reload checks, and how long the admin
+# endpoints wait for all workers to apply a reload
+FAQ_SYNC_INTERVAL: float = float(os.getenv("FAQ_SYNC_INTERVAL", "1"))
+FAQ_PROPAGATION_TIMEOUT: float = float(os.getenv("FAQ_PROPAGATION_TIMEOUT", "5"))
+
+# Journal entries (single-entry FAQ edits) after which they are compacted into the CSV file
+FAQ_JOURNAL_COMPACT_ENTRIES: int = int(os.getenv("FAQ_JOURNAL_COMPACT_ENTRIES", "200"))
+
+# Largest page size accepted by /faq-data?limit=
+FAQ_DATA_MAX_PAGE: int = int(os.getenv("FAQ_DATA_MAX_PAGE", "10000"))
+
+# Largest number of messages accepted by POST /answer/batch, and most worker processes it may use
+FAQ_BATCH_MAX_MESSAGES: int = int(os.getenv("FAQ_BATCH_MAX_MESSAGES", "1000000"))
+FAQ_BATCH_MAX_WORKERS: int = int(os.getenv("FAQ_BATCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+# Answer cache entries (0 disables) and their time-to-live in seconds (0 = none)
+FAQ_CACHE_SIZE: int = int(os.getenv("FAQ_CACHE_SIZE", "4096"))
+FAQ_CACHE_TTL: float = float(os.getenv("FAQ_CACHE_TTL", "0"))
+
+# Per-page FAQ bots are loaded on a page's first message and the least
+# recently used ones unloaded past this estimated memory budget (MB), with
+# a smaller answer cache each than the default page's
+FAQ_TENANT_MEMORY_MB: float = float(os.getenv("FAQ_TENANT_MEMORY_MB", "256"))
+FAQ_TENANT_CACHE_SIZE: int = int(os.getenv("FAQ_TENANT_CACHE_SIZE", "512"))
 
 # ================== VALIDATION / WARNINGS ==================
 
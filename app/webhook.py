@@ -1,9 +1,11 @@
+import logging
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import PlainTextResponse
 from app.utils import VERIFY_TOKEN  # Import from utils securely
 
-# ================= ROUTER =================
+# ================= ROUTER & LOGGER =================
 router = APIRouter()
+log = logging.getLogger("uvicorn.error")
 
 # ================== WEBHOOK VERIFICATION ==================
 @router.get("/webhook", response_class=PlainTextResponse)
@@ -21,8 +23,7 @@ async def verify_webhook(request: Request):
     hub_verify_token = request.query_params.get("hub.verify_token")
 
     # Log the incoming verification request
-    # (Use logger in production; print for quick debugging)
-    print("Received verification request:", hub_verify_token)
+    log.debug("Received verification request: %s", hub_verify_token)
 
     if hub_mode == "subscribe" and hub_verify_token == VERIFY_TOKEN:
         # Return the challenge token to confirm subscription
@@ -2,19 +2,170 @@
 Run script for starting the FAQ Chatbot FastAPI server on Render.
 
 Uses environment variable PORT to determine the listening port.
+
+Modes:
+    python run.py          Production: one worker process per available CPU
+                           (CPU affinity and container CPU quota;
+                           WEB_CONCURRENCY or --workers to override),
+                           uvloop/httptools when installed, no auto-reload.
+    python run.py --dev    Development: a single process that reloads on
+                           code changes.
+
+In production the FAQ snapshot is compiled and read into the page cache
+before the workers start, so every worker maps the same warm file instead
+of each compiling it. On SIGTERM the workers stop accepting connections,
+finish in-flight requests (up to --graceful-timeout seconds) and then drain
+the queued webhook events (WEBHOOK_DRAIN_TIMEOUT) before exiting. The
+workers share a metrics directory, so /metrics reports all of them.
 """
 
+import argparse
+import glob
+import importlib.util
+import logging
 import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
 import uvicorn
 
-if __name__ == "__main__":
-    # Get port from environment variable (Render provides PORT automatically)
-    port = int(os.getenv("PORT", 8000))
-
-    # Start FastAPI app using Uvicorn
-    uvicorn.run(
-        "app.main:app",  # path to FastAPI app
-        host="0.0.0.0",  # listen on all interfaces
-        port=port,
-        reload=True      # keep True for development, False for production
+log = logging.getLogger("uvicorn.error")
+
+
+def read_text(path: str) -> Optional[str]:
+    """Contents of a small file, or None if it cannot be read."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """
+    Whole CPUs allowed by the container's cgroup CPU quota (at least 1), or
+    None without a quota. Reads cgroup v2 cpu.max, else cgroup v1
+    cpu.cfs_quota_us / cpu.cfs_period_us.
+    """
+    # cgroup v2: "<quota> <period>" or "max <period>", in this process's cgroup
+    candidates = ["/sys/fs/cgroup/cpu.max"]
+    for line in (read_text("/proc/self/cgroup") or "").splitlines():
+        if line.startswith("0::/") and line != "0::/":
+            candidates.insert(0, "/sys/fs/cgroup" + line[3:] + "/cpu.max")
+    for path in candidates:
+        fields = (read_text(path) or "").split()
+        if len(fields) == 2:
+            if fields[0] == "max":
+                return None
+            try:
+                return max(1, int(fields[0]) // int(fields[1]))
+            except (ValueError, ZeroDivisionError):
+                return None
+
+    # cgroup v1: a quota of -1 means unlimited
+    for directory in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        quota = read_text(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = read_text(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota is None or period is None:
+            continue
+        try:
+            quota_us, period_us = int(quota), int(period)
+        except ValueError:
+            return None
+        return max(1, quota_us // period_us) if quota_us > 0 and period_us > 0 else None
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may use: the CPUs it may run on (CPU
+    affinity), capped by a container CPU quota (cgroup cpu.max).
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit is not None else cpus
+
+
+def installed(module: str) -> bool:
+    """Whether an optional module can be imported."""
+    return importlib.util.find_spec(module) is not None
+
+
+def preload_faq() -> None:
+    """Compile the FAQ snapshot if it is stale and warm it, before the workers start."""
+    from app.snapshot import preload
+    from app.utils import DATA_PATH, FAQ_SNAPSHOT
+
+    if not FAQ_SNAPSHOT or not os.path.exists(DATA_PATH):
+        return
+    started = time.perf_counter()
+    try:
+        path = preload(DATA_PATH)
+    except (OSError, ValueError) as e:
+        log.warning("Could not preload the FAQ snapshot (%s), workers will build it", e)
+        return
+    log.info("FAQ snapshot %s ready in %.2fs", path, time.perf_counter() - started)
+
+
+def prepare_metrics_dir() -> str:
+    """
+    Give the workers an empty shared metrics directory (app.metrics): the
+    one in METRICS_DIR, emptied, or a new temporary one exported to them.
+    """
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        directory = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="faq-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.unlink(path)  # Values of an earlier server run
+    return directory
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Start the FAQ Chatbot server")
+    parser.add_argument("--dev", action="store_true", help="single process with auto-reload")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    # Render provides PORT automatically
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 0)),
+        help="worker processes in production (default: available CPUs)",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", 10)),
+        help="seconds to finish in-flight requests on shutdown",
     )
+    parser.add_argument("--access-log", action="store_true", help="log every request in production")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.dev:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+    else:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+        preload_faq()
+        own_metrics_dir = not os.getenv("METRICS_DIR")
+        metrics_dir = prepare_metrics_dir()
+        try:
+            uvicorn.run(
+                "app.main:app",
+                host=args.host,
+                port=args.port,
+                workers=args.workers or available_cpus(),
+                loop="uvloop" if installed("uvloop") else "asyncio",
+                http="httptools" if installed("httptools") else "h11",
+                lifespan="on",
+                access_log=args.access_log,
+                timeout_graceful_shutdown=args.graceful_timeout,
+            )
+        finally:
+            if own_metrics_dir:
+                shutil.rmtree(metrics_dir, ignore_errors=True)
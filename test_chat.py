@@ -1,18 +1,18 @@
 """
 Test script for interacting with the FAQBot in console.
-Auto-reloads CSV data on every question to ensure latest FAQ is used.
+Checks the CSV file on every question to ensure latest FAQ is used.
 """
 
 from app.ai_engine import FAQBot
 
 class FAQBotAutoReload(FAQBot):
     """
-    Subclass of FAQBot that reloads the FAQ CSV every time
-    a question is asked. Useful for testing with frequently
+    Subclass of FAQBot that checks the FAQ CSV for changes every
+    time a question is asked. Useful for testing with frequently
     updated FAQ data.
     """
     def get_answer(self, question: str) -> str:
-        self.load_data()  # Reload FAQ data to get the latest updates
+        self.refresh(force=True)  # Reload FAQ data if the CSV file changed
         return super().get_answer(question)
 
 def simulate_chat():
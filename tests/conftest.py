@@ -0,0 +1,24 @@
+"""
+Point the app's data files at a scratch directory before any app module is
+imported, so the test run never writes snapshots, broadcast files or caches
+into the checkout's data/ directory.
+"""
+
+import os
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="faq-tests-")
+
+shutil.copy(os.path.join(ROOT, "data", "faq.csv"), DATA_DIR)
+os.environ["FAQ_DATA_PATH"] = os.path.join(DATA_DIR, "faq.csv")
+os.environ["FB_ATTACHMENT_CACHE"] = os.path.join(DATA_DIR, "attachments.json")
+os.environ["FB_PAGES_CONFIG"] = os.path.join(DATA_DIR, "pages.json")
+os.environ["FB_PAGES_DIR"] = os.path.join(DATA_DIR, "pages")
+os.environ.pop("WEBHOOK_CAPTURE_DIR", None)
+os.environ.pop("METRICS_DIR", None)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,115 @@
+"""Image answers by attachment_id against tools.fake_graph (served in-process)."""
+
+import asyncio
+import functools
+import json
+
+import httpx
+
+from app.attachments import AttachmentCache, send_image_answer
+from app.messenger import MessengerClient
+from app.scheduler import SendScheduler
+from tools import fake_graph
+
+BASE_URL = "http://graph.test/v21.0/me"
+IMAGE = "https://example.com/menu.png"
+
+
+class Graph:
+    """A fake Graph API with the page's client, send scheduler and attachment cache."""
+
+    def __init__(self, tmp_path):
+        self.messages = []
+        self.fake = fake_graph.FakeGraphAPI(
+            latency=0.01, jitter=0, fetch_latency=0,
+            on_delivery=lambda recipient, message, at: self.messages.append(message),
+        )
+        self.client = MessengerClient(
+            api_url=f"{BASE_URL}/messages", attachment_url=f"{BASE_URL}/message_attachments",
+        )
+        self.client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.fake.app))
+        self.sender = SendScheduler(
+            functools.partial(self.client.post, max_retries=0), rate=1000, burst=1000, recipient_interval=0,
+        )
+        self.cache = AttachmentCache(str(tmp_path / "attachments.json"), upload=self.client.upload_attachment, enabled=True)
+
+    async def send(self, recipient_id="u1"):
+        return await send_image_answer(recipient_id, IMAGE, cache=self.cache, sender=self.sender)
+
+    async def settle(self):
+        """Wait for the background uploads."""
+        while self.cache._pending:
+            await asyncio.gather(*self.cache._pending.values())
+
+    def sources(self):
+        return [fake_graph.image_source(message) for message in self.messages]
+
+
+def run(tmp_path, scenario):
+    async def main():
+        graph = Graph(tmp_path)
+        try:
+            await scenario(graph)
+        finally:
+            await graph.client.aclose()
+        return graph
+    return asyncio.run(main())
+
+
+def test_uploads_once_then_reuses_the_id(tmp_path):
+    async def scenario(graph):
+        assert "error" not in await graph.send()
+        await graph.settle()
+        for _ in range(3):
+            assert "error" not in await graph.send()
+
+    graph = run(tmp_path, scenario)
+    assert graph.fake.uploads == 1
+    assert graph.sources() == ["url", "attachment_id", "attachment_id", "attachment_id"]
+    issued = list(graph.fake.attachments)
+    assert json.loads((tmp_path / "attachments.json").read_text()) == {IMAGE: issued[0]}
+
+
+def test_stale_id_is_uploaded_again(tmp_path):
+    async def scenario(graph):
+        await graph.send()
+        await graph.settle()
+        graph.fake.attachments.clear()  # Facebook no longer knows the id
+        assert "error" not in await graph.send()
+        await graph.settle()
+        assert "error" not in await graph.send()
+
+    graph = run(tmp_path, scenario)
+    assert graph.fake.uploads == 2
+    assert graph.cache.rejected == 1
+    assert graph.sources() == ["url", "url", "attachment_id"]
+
+
+def test_concurrent_first_sends_upload_once(tmp_path):
+    async def scenario(graph):
+        results = await asyncio.gather(*(graph.send(f"u{i}") for i in range(10)))
+        assert all("error" not in r for r in results)
+        await graph.settle()
+
+    graph = run(tmp_path, scenario)
+    assert graph.fake.uploads == 1
+    assert [graph.cache.get(IMAGE)] == list(graph.fake.attachments)
+
+
+def test_other_client_errors_keep_the_id(tmp_path):
+    invalid_recipient = {"error": {"message": "(#100) The parameter recipient is invalid", "code": 100}}
+
+    class Sender:
+        sent = 0
+
+        async def send(self, recipient_id, payload):
+            self.sent += 1
+            return {"error": "400 Bad Request", "status": 400, "text": json.dumps(invalid_recipient), "retryable": False}
+
+    cache = AttachmentCache(str(tmp_path / "attachments.json"), enabled=True)
+    cache._ids[IMAGE] = "42"
+    sender = Sender()
+    result = asyncio.run(send_image_answer("u1", IMAGE, cache=cache, sender=sender))
+    assert result["status"] == 400
+    assert sender.sent == 1
+    assert cache.get(IMAGE) == "42" and cache.rejected == 0
@@ -0,0 +1,65 @@
+"""Batch answering in worker processes: one lazily started pool, reused across batches."""
+
+import asyncio
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI
+
+from app import batch, routes
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+from app.matcher import normalize_key
+
+
+def write(path, pairs):
+    write_faq(str(path), ({"question": q, "answer": a} for q, a in pairs))
+
+
+def test_importing_the_engine_does_not_load_the_global_bot():
+    code = "import app.ai_engine as engine, app.batch; print('faq_bot' in vars(engine))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_pool_is_reused_and_follows_faq_changes(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [(f"question {i}", f"answer {i}") for i in range(50)])
+    bot = FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0))
+    keys = [normalize_key(f"question {i}") for i in range(50)] + ["nothing like it"]
+    try:
+        first = batch.answer_in_pool(bot, bot.snapshot, keys, 2)
+        pool = batch._pool
+        assert first == bot.answer_keys(bot.snapshot, keys)
+
+        write(csv_path, [(f"question {i}", f"new answer {i}") for i in range(50)])
+        bot.refresh(force=True)
+        second = batch.answer_in_pool(bot, bot.snapshot, keys, 2)
+        assert batch._pool is pool  # Same worker processes, reloaded
+        assert second == bot.answer_keys(bot.snapshot, keys)
+        assert second[0].answer == "new answer 0"
+    finally:
+        batch.shutdown_pool()
+    assert batch._pool is None
+
+
+def test_batch_endpoint_validates_workers(tmp_path, monkeypatch):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("question 0", "answer 0")])
+    monkeypatch.setattr(routes, "faq_bot", FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0)))
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            ok = await client.post("/answer/batch", json={"messages": ["question 0"], "workers": 1})
+            rejected = [
+                (await client.post("/answer/batch", json={"messages": ["question 0"], "workers": workers})).status_code
+                for workers in (True, 0, "2", 1.5)
+            ]
+            return ok, rejected
+
+    ok, rejected = asyncio.run(main())
+    assert ok.status_code == 200 and "answer 0" in ok.text
+    assert rejected == [400, 400, 400, 400]
@@ -0,0 +1,76 @@
+"""AnswerCache: LRU eviction, TTL expiry and invalidation on a new FAQ generation."""
+
+import time
+
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+from app.sync import ReloadBroadcast
+
+
+def write(path, pairs):
+    write_faq(str(path), ({"question": q, "answer": a} for q, a in pairs))
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(maxsize=2, ttl=0)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # "b" is now the least recently used
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = AnswerCache(maxsize=10, ttl=5)
+    cache.put("a", "1")
+    now[0] += 4.9
+    assert cache.get("a") == "1"
+    now[0] += 0.1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(maxsize=0)
+    cache.put("a", "1")
+    assert cache.get("a") is None and cache.stats()["size"] == 0
+
+
+def test_reload_starts_a_new_generation(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("hello", "old answer")])
+    bot = FAQBot(str(csv_path), check_interval=3600, cache=AnswerCache(maxsize=10, ttl=0))
+    assert bot.get_answer("hello") == "old answer"
+    assert bot.get_answer("hello") == "old answer"
+    assert bot.cache.hits == 1
+
+    write(csv_path, [("hello", "new answer, longer")])
+    bot.refresh(force=True)
+    assert bot.get_answer("hello") == "new answer, longer"  # Same message, new generation: a miss
+    assert bot.cache.hits == 1
+
+    bot.reload_faq()  # Unchanged file, still a new generation
+    assert bot.get_answer("hello") == "new answer, longer"
+    assert bot.cache.hits == 1
+
+
+def test_edit_by_another_worker_invalidates_cached_answers(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("hello", "old answer")])
+
+    def worker():
+        return FAQBot(
+            str(csv_path), check_interval=3600, cache=AnswerCache(maxsize=10, ttl=0),
+            broadcast=ReloadBroadcast(str(csv_path)),
+        )
+
+    first, second = worker(), worker()
+    assert first.get_answer("hello") == "old answer"
+    second.update_entry(0, answer="edited answer")
+    first.refresh(force=True)
+    assert first.get_answer("hello") == "edited answer"
+    assert first.cache.hits == 0
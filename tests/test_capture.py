@@ -0,0 +1,69 @@
+"""Webhook traffic capture: JSON lines, size-based rotation, drops when the buffer is full."""
+
+import json
+import os
+import threading
+
+from app.capture import TrafficCapture
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json_lines(tmp_path):
+    capture = TrafficCapture(str(tmp_path), max_bytes=1 << 20, backups=2, buffer=100)
+    capture.record_webhook(b'{"object": "page"}')  # Not started: ignored
+    capture.start()
+    capture.record_webhook(b'{"object": "page",\n "entry": []}')
+    capture.record_answer("m1", "u1", "ราคา", "100 บาท")
+    capture.stop()
+
+    lines = read_lines(capture.path)
+    assert os.path.basename(capture.path) == f"requests-{os.getpid()}.jsonl"
+    assert lines[0]["type"] == "webhook" and lines[0]["payload"] == {"object": "page", "entry": []}
+    assert {k: lines[1][k] for k in ("type", "mid", "sender", "text", "answer")} == {
+        "type": "answer", "mid": "m1", "sender": "u1", "text": "ราคา", "answer": "100 บาท",
+    }
+    assert capture.stats()["records"] == 2 and not capture.enabled
+
+
+def test_files_rotate_and_keep_the_backups(tmp_path):
+    capture = TrafficCapture(str(tmp_path), max_bytes=400, backups=2, buffer=1000)
+    capture.start()
+    for i in range(60):
+        capture.record_answer(f"m{i}", "u1", "question", "answer")
+    capture.stop()
+
+    stats = capture.stats()
+    assert stats["records"] == 60 and stats["dropped"] == 0 and stats["rotations"] > 2
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(capture.path) + suffix for suffix in ("", ".1", ".2")
+    )
+    kept = []
+    for path in (f"{capture.path}.2", f"{capture.path}.1", capture.path):  # Oldest first
+        assert os.path.getsize(path) <= 400
+        kept.extend(line["mid"] for line in read_lines(path))
+    assert kept == [f"m{i}" for i in range(60 - len(kept), 60)]  # The newest records, in order
+
+
+def test_full_buffer_drops_records(tmp_path, monkeypatch):
+    release = threading.Event()
+    run = TrafficCapture._run
+
+    def blocked_writer(self):
+        release.wait(5)
+        run(self)
+
+    monkeypatch.setattr(TrafficCapture, "_run", blocked_writer)
+    capture = TrafficCapture(str(tmp_path), buffer=3)
+    capture.start()
+    for i in range(10):
+        capture.record_answer(f"m{i}", "u1", "question", "answer")
+    assert capture.stats()["dropped"] == 7
+    release.set()
+    capture.stop()
+
+    assert [line["mid"] for line in read_lines(capture.path)] == ["m0", "m1", "m2"]
+    assert capture.stats()["records"] == 3
@@ -0,0 +1,83 @@
+"""MessageDeduplicator: time window, eviction, and sharing between worker processes."""
+
+import subprocess
+import sys
+import time
+
+from app.dedup import MessageDeduplicator
+
+WORKER = """
+import sys
+from app.dedup import MessageDeduplicator
+dedup = MessageDeduplicator(maxsize=1000, ttl=60, path=sys.argv[1])
+print(" ".join(str(int(dedup.is_duplicate(mid))) for mid in sys.argv[2:]))
+"""
+
+
+def run_worker(path, *mids):
+    out = subprocess.run([sys.executable, "-c", WORKER, str(path), *mids], capture_output=True, text=True, check=True)
+    return [bool(int(flag)) for flag in out.stdout.split()]
+
+
+def test_ids_are_shared_between_worker_processes(tmp_path):
+    path = tmp_path / "faq.csv.dedup"
+    here = MessageDeduplicator(maxsize=1000, ttl=60, path=str(path))
+    assert here.is_duplicate("m1") is False
+    assert run_worker(path, "m1", "m2", "m2") == [True, False, True]
+    assert here.is_duplicate("m2") is True
+    assert here.stats()["size"] == 2 and here.stats()["shared"] is True
+
+    here.forget("m2")  # Dropped event: let the redelivery through, in every worker
+    assert run_worker(path, "m2") == [False]
+
+
+def test_table_of_another_size_is_reset(tmp_path):
+    path = str(tmp_path / "faq.csv.dedup")
+    MessageDeduplicator(maxsize=1000, ttl=60, path=path).is_duplicate("m1")
+    smaller = MessageDeduplicator(maxsize=16, ttl=60, path=path)
+    assert smaller.is_duplicate("m1") is False
+    assert smaller.is_duplicate("m1") is True
+
+
+def test_ids_are_forgotten_after_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    dedup = MessageDeduplicator(maxsize=100, ttl=10)
+    assert dedup.is_duplicate("m1") is False
+    now[0] += 9
+    assert dedup.is_duplicate("m1") is True  # Seen again: the window restarts
+    now[0] += 9
+    assert dedup.is_duplicate("m1") is True
+    now[0] += 10
+    assert dedup.is_duplicate("m1") is False
+    assert len(dedup) == 1
+    now[0] += 10
+    assert len(dedup) == 0
+
+
+def test_least_recently_seen_id_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    dedup = MessageDeduplicator(maxsize=4, ttl=60)  # One bucket: plain LRU
+    for mid in ("a", "b", "c", "d"):
+        now[0] += 1
+        dedup.is_duplicate(mid)
+    now[0] += 1
+    assert dedup.is_duplicate("a") is True  # "b" is now the least recently seen
+    now[0] += 1
+    assert dedup.is_duplicate("e") is False
+    assert dedup.evictions == 1
+    assert [dedup.is_duplicate(mid) for mid in ("a", "c", "d", "e")] == [True, True, True, True]
+    assert dedup.is_duplicate("b") is False
+
+
+def test_size_is_bounded_and_zero_disables():
+    dedup = MessageDeduplicator(maxsize=64, ttl=60)
+    for i in range(1000):
+        dedup.is_duplicate(f"m{i}")
+    assert len(dedup) <= 64 and dedup.evictions >= 1000 - 64
+    assert dedup.stats()["checked"] == 1000 and dedup.stats()["suppressed"] == 0
+
+    disabled = MessageDeduplicator(maxsize=0)
+    assert [disabled.is_duplicate("m1"), disabled.is_duplicate("m1")] == [False, False]
+    assert disabled.is_duplicate(None) is False and len(disabled) == 0
@@ -0,0 +1,75 @@
+"""WebhookDispatcher: per-sender order without head-of-line blocking across senders."""
+
+import asyncio
+import time
+
+from app.dispatcher import WebhookDispatcher
+
+
+def test_slow_sender_does_not_block_its_shard():
+    done = {}
+
+    async def handler(event):
+        if event.sender_id == "slow":
+            await asyncio.sleep(0.5)  # e.g. a send waiting out a Retry-After
+        done[event.text] = time.monotonic()
+
+    async def run():
+        dispatcher = WebhookDispatcher(handler, workers=1, max_in_flight=10)
+        await dispatcher.start()
+        started = time.monotonic()
+        await dispatcher.submit("slow", "slow-1")
+        for i in range(5):
+            await dispatcher.submit(f"user{i}", f"fast-{i}")
+        await dispatcher.stop()
+        return started
+
+    started = asyncio.run(run())
+    assert all(done[f"fast-{i}"] - started < 0.25 for i in range(5))
+    assert done["slow-1"] - started >= 0.5
+
+
+def test_messages_of_one_sender_stay_in_order():
+    handled = []
+
+    async def handler(event):
+        await asyncio.sleep(0.05 if event.text.endswith("0") else 0)
+        handled.append((event.sender_id, event.text))
+
+    async def run():
+        dispatcher = WebhookDispatcher(handler, workers=2, max_in_flight=50)
+        await dispatcher.start()
+        for i in range(10):
+            for sender in ("a", "b", "c"):
+                await dispatcher.submit(sender, f"{sender}{i}")
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    for sender in ("a", "b", "c"):
+        assert [text for s, text in handled if s == sender] == [f"{sender}{i}" for i in range(10)]
+    assert stats["processed"] == 30 and stats["in_flight"] == 0
+
+
+def test_in_flight_limit_applies_backpressure():
+    running = 0
+    peak = 0
+
+    async def handler(event):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    async def run():
+        dispatcher = WebhookDispatcher(handler, workers=2, max_in_flight=3)
+        await dispatcher.start()
+        for i in range(20):
+            await dispatcher.submit(f"user{i}", "hi")
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert peak <= 3
+    assert stats["processed"] == 20
@@ -0,0 +1,105 @@
+"""/faq-data: ETag and 304, cursor pagination over journal edits, streamed gzip bodies."""
+
+import asyncio
+import gzip
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from app import faq_table, routes
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+from app.faq_table import gzip_chunks, iter_json
+
+PLAIN = {"Accept-Encoding": "identity"}
+
+
+def make_bot(tmp_path, rows):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), ({"question": f"question {i}", "answer": f"answer {i}"} for i in range(rows)))
+    return FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0))
+
+
+def run(bot, monkeypatch, scenario):
+    monkeypatch.setattr(routes, "faq_bot", bot)
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+def test_unchanged_data_returns_304(tmp_path, monkeypatch):
+    bot = make_bot(tmp_path, 3)
+
+    async def scenario(client):
+        first = await client.get("/faq-data", headers=PLAIN)
+        etag = first.headers["etag"]
+        assert first.status_code == 200 and etag.startswith('W/"')
+        for tag in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+            cached = await client.get("/faq-data", headers={**PLAIN, "If-None-Match": tag})
+            assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+
+        bot.create_entry("question 3", "answer 3")
+        changed = await client.get("/faq-data", headers={**PLAIN, "If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+        return changed.json()
+
+    assert len(run(bot, monkeypatch, scenario)) == 4
+
+
+def test_pages_follow_the_cursor_over_journal_edits(tmp_path, monkeypatch):
+    bot = make_bot(tmp_path, 10)
+    bot.update_entry(2, answer="edited")
+    bot.delete_entry(5)
+    bot.create_entry("question 10", "answer 10")
+
+    async def scenario(client):
+        full = (await client.get("/faq-data", headers=PLAIN)).json()
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/faq-data", params=params, headers=PLAIN)).json()
+            pages.append(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        stale = (await client.get("/faq-data", params={"limit": 4}, headers=PLAIN)).json()["next_cursor"]
+        bot.create_entry("question 11", "answer 11")
+        conflict = await client.get("/faq-data", params={"limit": 4, "cursor": stale}, headers=PLAIN)
+        invalid = await client.get("/faq-data", params={"cursor": "not a cursor"}, headers=PLAIN)
+        too_small = await client.get("/faq-data", params={"limit": 0}, headers=PLAIN)
+        return full, pages, [r.status_code for r in (conflict, invalid, too_small)]
+
+    full, pages, statuses = run(bot, monkeypatch, scenario)
+    assert [len(items) for items in pages] == [4, 4, 2]
+    assert [item for items in pages for item in items] == full
+    assert [row["question"] for row in full] == [f"question {i}" for i in range(11) if i != 5]
+    assert full[2]["answer"] == "edited"
+    assert statuses == [409, 400, 400]
+
+
+def test_gzip_body_is_streamed_in_chunks(tmp_path, monkeypatch):
+    bot = make_bot(tmp_path, 50)
+    monkeypatch.setattr(faq_table, "CHUNK_ROWS", 8)
+    chunks = list(iter_json(bot.open_table()))
+    assert len(chunks) == 2 + 7  # Brackets around 50 rows in chunks of 8
+    assert json.loads(b"".join(chunks)) == [{"question": f"question {i}", "answer": f"answer {i}"} for i in range(50)]
+    compressed = list(gzip_chunks(iter(chunks)))
+    assert gzip.decompress(b"".join(compressed)) == b"".join(chunks)
+
+    async def scenario(client):
+        plain = await client.get("/faq-data", headers=PLAIN)
+        async with client.stream("GET", "/faq-data", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            return plain, response.headers, raw
+
+    plain, headers, raw = run(bot, monkeypatch, scenario)
+    assert "content-encoding" not in plain.headers
+    assert headers["content-encoding"] == "gzip" and headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(raw) == plain.content
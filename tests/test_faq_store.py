@@ -0,0 +1,62 @@
+"""FAQ CSV reader/writer: what pd.read_csv(dtype=str).fillna("") used to return."""
+
+import os
+
+from app.faq_store import NA_VALUES, open_faq_rows, read_faq_pairs, read_faq_records, write_faq
+
+TRICKY = [
+    {"question": "opening\nhours?", "answer": 'we say "9 to 5", mostly'},
+    {"question": " padded ", "answer": "a,b,c"},
+    {"question": "สวัสดี ครับ", "answer": "\r\nline\r\nbreaks\r\n"},
+    {"question": "no answer", "answer": None},
+]
+
+
+def test_round_trip_keeps_quotes_newlines_and_extra_columns(tmp_path):
+    path = str(tmp_path / "faq.csv")
+    records = TRICKY + [{"question": "tagged", "answer": "yes", "tag": "x"}]
+    assert write_faq(path, records) == 5
+    assert read_faq_records(path) == [
+        {"question": r["question"], "answer": r["answer"] or "", "tag": r.get("tag", "")} for r in records
+    ]
+    assert read_faq_pairs(path)[:2] == [("opening\nhours?", 'we say "9 to 5", mostly'), ("padded", "a,b,c")]
+
+
+def test_byte_order_mark_is_written_and_optional_on_read(tmp_path):
+    path = tmp_path / "faq.csv"
+    write_faq(str(path), [{"question": "hello", "answer": "hi"}])
+    assert path.read_bytes().startswith(b"\xef\xbb\xbfquestion,answer")
+    path.write_bytes(path.read_bytes()[3:])
+    assert read_faq_pairs(str(path)) == [("hello", "hi")]
+
+
+def test_na_markers_blank_lines_and_short_rows(tmp_path):
+    path = tmp_path / "faq.csv"
+    markers = sorted(NA_VALUES - {""})
+    lines = ["question,answer", ""] + [f"{m},{m}" for m in markers] + ["", "only a question", "NAN,nil"]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    records = read_faq_records(str(path))
+    assert records[:len(markers)] == [{"question": "", "answer": ""}] * len(markers)
+    assert records[len(markers):] == [
+        {"question": "only a question", "answer": ""},
+        {"question": "NAN", "answer": "nil"},  # Not a pandas default marker: kept
+    ]
+
+
+def test_offsets_resume_after_any_row(tmp_path):
+    path = str(tmp_path / "faq.csv")
+    write_faq(path, TRICKY)
+    rows = list(open_faq_rows(path))
+    assert [row for row, _ in rows] == read_faq_records(path)
+    assert rows[-1][1] == os.path.getsize(path)
+    for i, (_, offset) in enumerate(rows):
+        assert [row for row, _ in open_faq_rows(path, offset)] == [row for row, _ in rows[i + 1:]]
+
+
+def test_rewrite_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "faq.csv"
+    write_faq(str(path), [{"question": "a", "answer": "1"}])
+    os.chmod(path, 0o600)
+    write_faq(str(path), [{"question": "b", "answer": "2"}])
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert [p.name for p in tmp_path.iterdir()] == ["faq.csv"]  # No temporary file left behind
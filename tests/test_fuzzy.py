@@ -0,0 +1,82 @@
+"""Ranked matching: top-k order, ties and the min_score cutoff."""
+
+import random
+
+import numpy as np
+
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+from app.fuzzy import FuzzyIndex
+from app.matcher import normalize_key
+
+from test_matcher import random_case
+
+
+def dense_top_k(index, questions, message, k, min_score=0.0, exclude=()):
+    """Score every question by a dense dot product, then sort: best first, ties by index."""
+    query = index.text_vector(normalize_key(message))
+    scored = []
+    for row, question in enumerate(questions):
+        if not normalize_key(question):
+            continue  # Empty questions are never ranked
+        vector = index.text_vector(normalize_key(question))
+        score = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+        if row not in exclude and score > 0.0 and score >= min_score:
+            scored.append((round(score, 12), row))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return scored[:k]
+
+
+def test_top_k_matches_dense_scoring():
+    rng = random.Random(3)
+    for rows in (1, 30, 400):
+        questions, messages = random_case(rng, rows, alphabet="abcd กขค")
+        index = FuzzyIndex(questions)
+        exclude = set(rng.sample(range(rows), rows // 4))
+        for message in messages[:60]:
+            for k, min_score in ((1, 0.0), (3, 0.0), (5, 0.4)):
+                ranked = index.top_k(message, k, min_score, exclude=exclude)
+                expected = dense_top_k(index, questions, message, k, min_score, exclude)
+                assert [m.index for m in ranked] == [row for _, row in expected], message
+                assert np.allclose([m.score for m in ranked], [score for score, _ in expected])
+
+
+def test_best_many_agrees_with_top_k():
+    rng = random.Random(4)
+    questions, messages = random_case(rng, 200, alphabet="abcd กขค")
+    index = FuzzyIndex(questions)
+    best = index.best_many(messages, min_score=0.3, chunk=7)
+    for message, match in zip(messages, best):
+        top = index.top_k(message, 1, 0.3)
+        if not top:
+            assert match is None, message
+        else:
+            assert match.index == top[0].index and np.isclose(match.score, top[0].score), message
+
+
+def test_ties_keep_file_order_and_min_score_cuts_off():
+    index = FuzzyIndex(["opening hours", "delivery fee", "opening hours", "opening times"])
+    ranked = index.top_k("opening hours", k=3)
+    assert [m.index for m in ranked] == [0, 2, 3]
+    assert ranked[0].score == ranked[1].score > ranked[2].score
+    assert [m.index for m in index.top_k("opening hours", k=3, min_score=0.99)] == [0, 2]
+    assert index.top_k("zzzz", k=3) == []
+    assert index.top_k("opening hours", k=0) == []
+
+
+def test_bot_rank_and_answer_respect_min_score(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    pairs = [("what are your opening hours", "9 to 5"), ("how much is delivery", "50 baht")]
+    write_faq(str(csv_path), ({"question": q, "answer": a} for q, a in pairs))
+
+    def make_bot(min_score):
+        return FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0), ranked=True, min_score=min_score, top_k=2)
+
+    bot = make_bot(0.5)
+    ranked = bot.rank("what are yuor openin hours")  # Typos: no exact or partial match
+    assert [r.answer for r in ranked] == ["9 to 5"]
+    assert ranked[0].score >= 0.5
+    assert bot.get_answer("what are yuor openin hours") == "9 to 5"
+    assert len(make_bot(0.0).rank("delivery hours", k=5)) == 2
+    assert all(r.score >= 0.5 for r in bot.rank("delivery hours", k=5))
+    assert bot.get_answer("qqqq") == "Sorry, I do not understand your question."
@@ -0,0 +1,119 @@
+"""FAQ edit journal: overlay matching, replay, compaction and torn appends."""
+
+import random
+
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import read_faq_pairs, write_faq
+from app.journal import apply_entries
+from app.matcher import FAQMatcher, normalize_key
+from app.overlay import FAQOverlay
+from app.snapshot import compile_pairs, load_snapshot
+
+from test_matcher import baseline, random_case
+
+
+def random_entries(rng, rows, count, text):
+    """Valid create/update/delete entries for a table of `rows` rows."""
+    entries = []
+    for _ in range(count):
+        op = rng.choice(("create", "update", "delete")) if rows else "create"
+        if op == "create":
+            entries.append({"op": "create", "question": text(), "answer": "new"})
+            rows += 1
+        elif op == "update":
+            entries.append({"op": "update", "row": rng.randrange(rows), "question": text(), "answer": "edited"})
+        else:
+            entries.append({"op": "delete", "row": rng.randrange(rows)})
+            rows -= 1
+    return entries
+
+
+def test_overlay_matches_the_original_rules_on_the_edited_table(tmp_path):
+    rng = random.Random(11)
+    for rows, mapped in ((0, False), (3, False), (30, True), (300, False), (300, True)):
+        questions, messages = random_case(rng, rows)
+        pairs = [(q, f"answer {i}") for i, q in enumerate(questions)]
+        if mapped:
+            compile_pairs(pairs, str(tmp_path / "faq.snap"))
+            matcher = load_snapshot(str(tmp_path / "faq.snap")).matcher
+        else:
+            matcher = FAQMatcher(questions)
+        base = FAQOverlay(pairs, matcher)
+        entries = random_entries(rng, rows, rng.randint(1, 25), lambda: rng.choice(questions + messages))
+
+        edited = base.apply(entries)
+        records = apply_entries([{"question": q, "answer": a} for q, a in pairs], entries)
+        assert list(edited.pairs) == [(r["question"], r["answer"]) for r in records]
+
+        edited_questions = [q for q, _ in edited.pairs]
+        for message in messages:
+            key = normalize_key(message)
+            assert edited.matcher.match(key) == baseline(edited_questions, message), (entries, message)
+        assert list(base.pairs) == pairs  # Applying edits leaves the old table alone
+
+
+def test_invalid_entries_are_skipped():
+    pairs = [("hello", "hi")]
+    entries = [{"op": "delete", "row": 5}, {"op": "rename"}, {"op": "update", "row": 0, "question": "hey", "answer": "yo"}]
+    edited = FAQOverlay(pairs, FAQMatcher(["hello"])).apply(entries)
+    assert list(edited.pairs) == [("hey", "yo")]
+    assert edited.entries == 1
+
+
+def make_bot(csv_path, **options):
+    return FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0), **options)
+
+
+def test_journal_is_replayed_by_a_new_bot(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}, {"question": "price", "answer": "10"}])
+    bot = make_bot(csv_path)
+    bot.create_entry("opening hours", "9 to 5")
+    bot.update_entry(1, answer="12")
+    bot.delete_entry(0)
+
+    for use_snapshot in (True, False):
+        replayed = make_bot(csv_path, use_snapshot=use_snapshot)
+        assert list(replayed.qa_pairs) == [("price", "12"), ("opening hours", "9 to 5")]
+        assert replayed.get_answer("opening hours?") == "9 to 5"
+        assert replayed.get_answer("hello") == "Sorry, I do not understand your question."
+    assert read_faq_pairs(str(csv_path)) == [("hello", "hi"), ("price", "10")]  # Not compacted yet
+
+
+def test_compaction_writes_the_edits_back(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}])
+    bot = make_bot(csv_path, compact_after=3)
+    bot.create_entry("a", "1")
+    bot.create_entry("b", "2")
+    assert read_faq_pairs(str(csv_path)) == [("hello", "hi")]
+    bot.create_entry("c", "3")  # Third entry: compacted into the CSV
+    assert read_faq_pairs(str(csv_path)) == [("hello", "hi"), ("a", "1"), ("b", "2"), ("c", "3")]
+    assert not (tmp_path / "faq.csv.journal").exists()
+
+    bot.delete_entry(0)
+    bot.compact()
+    assert read_faq_pairs(str(csv_path)) == [("a", "1"), ("b", "2"), ("c", "3")]
+    assert list(make_bot(csv_path).qa_pairs) == [("a", "1"), ("b", "2"), ("c", "3")]
+
+
+def test_torn_journal_tail_is_ignored_then_cut_off(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}])
+    make_bot(csv_path).create_entry("a", "1")
+    with open(tmp_path / "faq.csv.journal", "ab") as f:
+        f.write(b'{"op": "create", "question": "torn", "ans')  # Crash in the middle of an append
+
+    bot = make_bot(csv_path)
+    assert list(bot.qa_pairs) == [("hello", "hi"), ("a", "1")]
+    bot.create_entry("b", "2")
+    assert list(make_bot(csv_path).qa_pairs) == [("hello", "hi"), ("a", "1"), ("b", "2")]
+    assert b"torn" not in (tmp_path / "faq.csv.journal").read_bytes()
+
+
+def test_journal_of_another_csv_version_is_ignored(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}])
+    make_bot(csv_path).create_entry("a", "1")
+    write_faq(str(csv_path), [{"question": "edited by hand", "answer": "yes"}])
+    assert list(make_bot(csv_path).qa_pairs) == [("edited by hand", "yes")]
@@ -0,0 +1,78 @@
+"""FAQMatcher against the original first-match-wins rules of FAQBot.get_answer."""
+
+import random
+
+from app.matcher import MAX_VERIFY_CANDIDATES, FAQMatcher, normalize_key
+
+
+def baseline(questions, message):
+    """The pre-index rules: exact, then substring either way, first row wins."""
+    msg = message.strip().lower()
+    for i, question in enumerate(questions):
+        if question.lower() == msg:
+            return i, "exact"
+    for i, question in enumerate(questions):
+        q_lower = question.lower()
+        if q_lower and (q_lower in msg or msg in q_lower):
+            return i, "partial"
+    return None
+
+
+def random_text(rng, alphabet, longest):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, longest)))
+
+
+def random_case(rng, rows, alphabet="abAB กข"):
+    """Questions and messages over a tiny alphabet, so rules collide often."""
+    # One space at most in a row and none at the ends: normalization also
+    # collapses whitespace, which the original rules did not
+    def text(longest):
+        return " ".join(random_text(rng, alphabet, longest).split())
+
+    questions = [text(5) for _ in range(rows)]
+    messages = [text(8) for _ in range(200)] + rng.sample(questions, min(20, rows))
+    return questions, messages
+
+
+def test_matches_the_original_rules_on_random_input():
+    rng = random.Random(2)
+    for rows in (0, 1, 5, 40, 1500):  # 1500 rows: posting lists longer than MAX_VERIFY_CANDIDATES
+        questions, messages = random_case(rng, rows)
+        matcher = FAQMatcher(questions)
+        for message in messages:
+            assert matcher.match(normalize_key(message)) == baseline(questions, message), (questions, message)
+
+
+def test_rarest_bigram_and_corpus_search_paths_agree():
+    questions = ["x" * 3 + str(i) for i in range(MAX_VERIFY_CANDIDATES * 3)] + ["hello world", "world"]
+    matcher = FAQMatcher(questions)
+    for message in ("xxx", "xx", "x", "world", "o w", "hello world!", "12", "7"):
+        assert matcher.match(normalize_key(message)) == baseline(questions, message), message
+
+
+def test_first_row_wins_and_empty_questions_never_match():
+    matcher = FAQMatcher(["", "price list", "price", "Price"])
+    assert tuple(matcher.match("price")) == (2, "exact")
+    assert tuple(matcher.match("the price list please")) == (1, "partial")
+    assert tuple(matcher.match("pri")) == (1, "partial")
+    assert matcher.match("opening hours") is None
+    assert matcher.exact("") == 0  # An empty message still equals an empty question
+
+
+def test_excluded_rows_are_skipped_by_every_rule():
+    rng = random.Random(3)
+    for rows in (5, 40, 1500):
+        questions, messages = random_case(rng, rows)
+        questions += questions[:rows // 2]  # Duplicates: an excluded row gives way to its twin
+        matcher = FAQMatcher(questions)
+        exclude = frozenset(rng.sample(range(len(questions)), len(questions) // 3))
+        kept = [i for i in range(len(questions)) if i not in exclude]
+        for message in messages:
+            key = normalize_key(message)
+            expected = baseline([questions[i] for i in kept], message)
+            exact, partial = matcher.exact(key, exclude), matcher.partial(key, exclude)
+            assert exact == (kept[expected[0]] if expected and expected[1] == "exact" else None), message
+            if expected is None:
+                assert partial is None, message
+            elif expected[1] == "partial":
+                assert partial == kept[expected[0]], message
@@ -0,0 +1,163 @@
+"""
+MessengerClient against local stubs of the Graph API: scripted responses
+(httpx.MockTransport) for retries, and tools.fake_graph served on a local
+port, like FB_API_URL would point at, for connection pooling.
+"""
+
+import asyncio
+import inspect
+import time
+
+import httpx
+
+from app import messenger
+from app.messenger import MessengerClient
+from tools import fake_graph
+from tools.loadgen import start_fake_graph
+
+API_URL = "http://graph.test/v21.0/me/messages"
+
+
+def scripted(*responses):
+    """MockTransport answering with responses in order; returns (transport, requests)."""
+    requests = []
+    queue = list(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        response = queue.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return httpx.MockTransport(handler), requests
+
+
+def stub_client(transport: httpx.MockTransport, **options) -> MessengerClient:
+    client = MessengerClient(api_url=API_URL, access_token="PAGE_TOKEN", backoff_base=0.001, **options)
+    client._client = httpx.AsyncClient(transport=transport)
+    return client
+
+
+def post(client: MessengerClient, payload: dict = None, **options) -> dict:
+    async def run():
+        try:
+            return await client.post(payload or messenger.text_payload("u1", "hi"), **options)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_retries_server_errors_until_success():
+    transport, requests = scripted(
+        httpx.Response(500), httpx.Response(503), httpx.Response(200, json={"message_id": "m1"}),
+    )
+    result = post(stub_client(transport, max_retries=3))
+    assert result == {"message_id": "m1"}
+    assert len(requests) == 3
+
+
+def test_retries_network_errors():
+    transport, requests = scripted(httpx.ConnectError("refused"), httpx.Response(200, json={"message_id": "m1"}))
+    assert post(stub_client(transport)) == {"message_id": "m1"}
+    assert len(requests) == 2
+
+
+def test_waits_for_retry_after():
+    transport, requests = scripted(
+        httpx.Response(429, headers={"Retry-After": "0.3"}), httpx.Response(200, json={"message_id": "m1"}),
+    )
+    started = time.monotonic()
+    assert post(stub_client(transport)) == {"message_id": "m1"}
+    assert time.monotonic() - started >= 0.3
+    assert len(requests) == 2
+
+
+def test_gives_up_after_max_retries():
+    transport, requests = scripted(*[httpx.Response(500) for _ in range(3)])
+    result = post(stub_client(transport, max_retries=2))
+    assert result["status"] == 500 and result["retryable"]
+    assert len(requests) == 3
+
+
+def test_does_not_retry_client_errors():
+    transport, requests = scripted(httpx.Response(400, json={"error": {"code": 100}}))
+    result = post(stub_client(transport))
+    assert result["status"] == 400 and not result["retryable"]
+    assert len(requests) == 1
+
+
+def test_reports_retry_after_without_retrying():
+    transport, _ = scripted(httpx.Response(429, headers={"Retry-After": "7"}))
+    result = post(stub_client(transport), max_retries=0)
+    assert result["status"] == 429 and result["retry_after"] == 7.0
+
+
+def test_success_without_json_body():
+    transport, _ = scripted(httpx.Response(200, content=b""))
+    assert post(stub_client(transport)) == {"status": 200}
+
+
+def test_sends_page_access_token():
+    transport, requests = scripted(httpx.Response(200, json={}), httpx.Response(200, json={}))
+    client = stub_client(transport)
+
+    async def run():
+        await client.post(messenger.text_payload("u1", "hi"))
+        await client.post(messenger.text_payload("u1", "hi"), access_token="OTHER_PAGE")
+        await client.aclose()
+
+    asyncio.run(run())
+    assert [r.url.params["access_token"] for r in requests] == ["PAGE_TOKEN", "OTHER_PAGE"]
+
+
+def test_reuses_pooled_connections():
+    fake = fake_graph.FakeGraphAPI(latency=0.01, jitter=0)
+
+    async def run():
+        server, task = await start_fake_graph(fake, "127.0.0.1", 0)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        client = MessengerClient(api_url=f"http://127.0.0.1:{port}/v21.0/me/messages", max_connections=4)
+        try:
+            for i in range(10):
+                assert "error" not in await client.send_text(f"u{i}", "hi")
+            sequential = len(server.server_state.connections)
+            results = await asyncio.gather(*(client.send_text(f"u{i}", "hi") for i in range(40)))
+            concurrent = len(server.server_state.connections)
+        finally:
+            await client.aclose()
+            server.should_exit = True
+            await task
+        return sequential, concurrent, results
+
+    sequential, concurrent, results = asyncio.run(run())
+    assert sequential == 1
+    assert concurrent <= 4
+    assert all("error" not in r for r in results)
+    assert fake.delivered == 50
+
+
+def test_send_functions_are_awaitable_with_blocking_variants(monkeypatch):
+    class EmptyResponse:
+        status_code = 200
+        text = ""
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            raise ValueError("empty body")
+
+    class Session:
+        def post(self, url, params, json, timeout):
+            self.sent = (url, params, json)
+            return EmptyResponse()
+
+    session = Session()
+    monkeypatch.setattr(messenger, "_session", session)
+    assert inspect.iscoroutinefunction(messenger.send_text)
+    assert inspect.iscoroutinefunction(messenger.send_image)
+    assert messenger.send_text_sync("u1", "hi") == {"status": 200}
+    assert session.sent[2] == messenger.text_payload("u1", "hi")
+    assert messenger.send_image_sync("u1", "https://example.com/a.png") == {"status": 200}
+    assert session.sent[2] == messenger.image_payload("u1", "https://example.com/a.png")
@@ -0,0 +1,95 @@
+"""Prometheus metrics: the text exposition format, summed over worker processes."""
+
+import asyncio
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI
+
+from app import metrics, routes
+
+WORKER = """
+import sys
+from app import metrics
+metrics.WEBHOOK_EVENTS.labels("queued").inc(3)
+metrics.FAQ_MATCH_SECONDS.labels("exact").observe(0.002)
+metrics.flush(sys.argv[1])
+"""
+
+
+def run_worker(directory):
+    subprocess.run([sys.executable, "-c", WORKER, str(directory)], check=True)
+
+
+def test_values_are_summed_over_workers(tmp_path):
+    run_worker(tmp_path)
+    run_worker(tmp_path)  # An exited worker still counts: counters never go backwards
+    metrics.FAQ_TENANT_EVENTS.labels("evict").inc()
+
+    local = {metric.name: metric.values() for metric in metrics._REGISTRY}
+    totals = metrics.collect(str(tmp_path))  # Flushes this process too
+    assert totals["webhook_events_total"][("queued",)] == local["webhook_events_total"].get(("queued",), 0) + 6
+    assert totals["faq_tenant_events_total"][("evict",)] == local["faq_tenant_events_total"][("evict",)]
+    counts, total = totals["faq_match_seconds"][("exact",)]
+    local_counts, local_total = local["faq_match_seconds"].get(("exact",), ([0], 0.0))
+    assert sum(counts) == sum(local_counts) + 2 and abs(total - local_total - 0.004) < 1e-9
+    assert len(list(tmp_path.glob("*.json"))) == 3
+    assert "pid=" not in metrics.render(str(tmp_path))
+
+
+def parse(body):
+    """Sample lines as {(name, labels): value}, and the HELP/TYPE names in order."""
+    samples, typed = {}, []
+    for line in body.splitlines():
+        if line.startswith("# TYPE "):
+            typed.append(line.split()[2])
+        elif line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            name, _, labels = series.partition("{")
+            samples[(name, labels.rstrip("}"))] = float(value)
+    return samples, typed
+
+
+def test_exposition_format():
+    metrics.FAQ_MATCH_SECONDS.labels("exact").observe(0.0003)
+    metrics.FAQ_MATCH_SECONDS.labels("exact").observe(20.0)  # Above the highest bucket
+    metrics.MESSENGER_SEND_SECONDS.labels('te"xt\n', "200").observe(0.01)
+    metrics.FAQ_TENANT_EVENTS.labels("hit").inc()
+    metrics.WEBHOOK_PARSE_SECONDS.labels().observe(0.001)
+    body = metrics.render("")
+    samples, typed = parse(body)
+
+    assert body.endswith("\n")
+    assert typed == [metric.name for metric in metrics._REGISTRY]
+    assert "# HELP faq_match_seconds Time to match" in body
+    assert "# TYPE faq_tenant_events_total counter" in body and "# TYPE faq_match_seconds histogram" in body
+    assert samples[("faq_tenant_events_total", 'result="hit"')] >= 1
+
+    buckets = [
+        (float(labels.split('le="')[1].rstrip('"').replace("+Inf", "inf")), value)
+        for (name, labels), value in samples.items()
+        if name == "faq_match_seconds_bucket" and labels.startswith('result="exact"')
+    ]
+    assert [bound for bound, _ in buckets] == list(metrics.LATENCY_BUCKETS) + [float("inf")]
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)  # Cumulative
+    assert counts[-1] == samples[("faq_match_seconds_count", 'result="exact"')] > counts[-2]
+    assert samples[("faq_match_seconds_sum", 'result="exact"')] >= 20.0003
+    assert 'messenger_send_seconds_count{kind="te\\"xt\\n",status="200"} 1' in body  # Escaped label
+    assert 'webhook_parse_seconds_bucket{le="0.001"} ' in body  # No labels: only le
+    assert ("webhook_parse_seconds_count", "") in samples
+
+
+def test_metrics_endpoint():
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    async def scrape():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(scrape())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert parse(response.text)[1] == [metric.name for metric in metrics._REGISTRY]
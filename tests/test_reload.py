@@ -0,0 +1,82 @@
+"""FAQBot reloads: built off the request path and outside FAQBot.lock."""
+
+import threading
+import time
+
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+
+
+def write(path, pairs):
+    write_faq(str(path), ({"question": q, "answer": a} for q, a in pairs))
+
+
+def slow_builds(bot, seconds, observed):
+    """Make index builds of bot take `seconds`, recording whether bot.lock was held."""
+    build = bot._build
+
+    def slow(signature):
+        observed.append(bot.lock.locked())
+        time.sleep(seconds)
+        return build(signature)
+
+    bot._build = slow
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_get_answer_does_not_wait_for_a_reload(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("hello", "old answer")])
+    bot = FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0))
+    observed = []
+    slow_builds(bot, 0.5, observed)
+
+    write(csv_path, [("hello", "new answer, longer")])
+    started = time.monotonic()
+    assert bot.get_answer("hello") == "old answer"
+    assert bot.get_answer("hello") == "old answer"
+    assert time.monotonic() - started < 0.2
+
+    wait_for(lambda: bot.get_answer("hello") == "new answer, longer")
+    assert observed == [False]  # Built once, without holding bot.lock
+
+
+def test_blocking_refresh_leaves_the_lock_free(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("hello", "old answer")])
+    bot = FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0))
+    observed = []
+    slow_builds(bot, 0.5, observed)
+
+    write(csv_path, [("hello", "new answer, longer")])
+    sync = threading.Thread(target=bot.refresh, args=(True,))  # Like app.sync's loop
+    sync.start()
+    wait_for(lambda: observed)
+    started = time.monotonic()
+    with bot.lock:  # What editors and the request path would wait for
+        assert time.monotonic() - started < 0.1
+    assert bot.get_answer("hello") == "old answer"
+    sync.join()
+    assert bot.get_answer("hello") == "new answer, longer"
+
+
+def test_edit_during_a_reload_is_kept(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write(csv_path, [("hello", "hi")])
+    bot = FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0))
+    observed = []
+    slow_builds(bot, 0.3, observed)
+
+    reload = threading.Thread(target=bot.load_data)
+    reload.start()
+    wait_for(lambda: observed)
+    bot.create_entry("opening hours", "9 to 5")
+    reload.join()
+    assert bot.get_answer("opening hours") == "9 to 5"
+    assert bot.get_answer("hello") == "hi"
@@ -0,0 +1,44 @@
+"""Worker count of the production server: CPU affinity capped by the cgroup CPU quota."""
+
+import run
+
+
+def fake_files(monkeypatch, files):
+    monkeypatch.setattr(run, "read_text", files.get)
+
+
+def test_cgroup_v2_quota(monkeypatch):
+    fake_files(monkeypatch, {
+        "/proc/self/cgroup": "0::/kubepods/pod1/app",
+        "/sys/fs/cgroup/kubepods/pod1/app/cpu.max": "250000 100000",
+    })
+    assert run.cgroup_cpu_limit() == 2
+
+
+def test_cgroup_v2_without_quota(monkeypatch):
+    fake_files(monkeypatch, {"/proc/self/cgroup": "0::/", "/sys/fs/cgroup/cpu.max": "max 100000"})
+    assert run.cgroup_cpu_limit() is None
+
+
+def test_cgroup_v1_quota(monkeypatch):
+    fake_files(monkeypatch, {
+        "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us": "50000",
+        "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us": "100000",
+    })
+    assert run.cgroup_cpu_limit() == 1  # Half a CPU still gets one worker
+
+
+def test_cgroup_v1_unlimited(monkeypatch):
+    fake_files(monkeypatch, {
+        "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "-1",
+        "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000",
+    })
+    assert run.cgroup_cpu_limit() is None
+
+
+def test_available_cpus_is_capped_by_the_quota(monkeypatch):
+    monkeypatch.setattr(run.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    monkeypatch.setattr(run, "cgroup_cpu_limit", lambda: 4)
+    assert run.available_cpus() == 4
+    monkeypatch.setattr(run, "cgroup_cpu_limit", lambda: None)
+    assert run.available_cpus() == 16
@@ -0,0 +1,62 @@
+"""Compiled, memory-mapped snapshots: same rows and matches as the in-memory index."""
+
+import random
+
+from app.faq_store import file_signature, write_faq
+from app.matcher import FAQMatcher, normalize_key
+from app.snapshot import compile_pairs, load_or_compile, load_snapshot
+
+from test_matcher import baseline, random_case
+
+
+def test_mapped_matcher_matches_the_original_rules(tmp_path):
+    rng = random.Random(9)
+    for rows in (0, 1, 7, 60, 1500):
+        questions, messages = random_case(rng, rows)
+        pairs = [(q, f"answer {i}") for i, q in enumerate(questions)]
+        path = str(tmp_path / f"faq-{rows}.snap")
+        compile_pairs(pairs, path)
+        snapshot = load_snapshot(path)
+        memory = FAQMatcher(questions)
+        for message in messages:
+            key = normalize_key(message)
+            assert snapshot.matcher.match(key) == baseline(questions, message), (questions, message)
+            assert snapshot.matcher.match(key) == memory.match(key)
+
+
+def test_mapped_matcher_skips_excluded_rows(tmp_path):
+    rng = random.Random(10)
+    for rows in (7, 60, 1500):
+        questions, messages = random_case(rng, rows)
+        questions += questions[:rows // 2]
+        compile_pairs([(q, "") for q in questions], str(tmp_path / "faq.snap"))
+        mapped = load_snapshot(str(tmp_path / "faq.snap")).matcher
+        memory = FAQMatcher(questions)
+        exclude = frozenset(rng.sample(range(len(questions)), len(questions) // 3))
+        for message in messages:
+            key = normalize_key(message)
+            assert mapped.exact(key, exclude) == memory.exact(key, exclude), message
+            assert mapped.partial(key, exclude) == memory.partial(key, exclude), message
+
+
+def test_rows_and_keys_round_trip(tmp_path):
+    pairs = [("สวัสดี ครับ", "hello"), ("Price\nlist", 'a "quoted" answer'), ("", "empty question"), ("emoji 🙂", "")]
+    path = str(tmp_path / "faq.snap")
+    compile_pairs(pairs, path)
+    snapshot = load_snapshot(path)
+    assert list(snapshot.pairs) == pairs
+    assert snapshot.pairs[-1] == pairs[-1] and snapshot.pairs[1:3] == pairs[1:3]
+    assert [snapshot.matcher.key(i) for i in range(len(pairs))] == [normalize_key(q) for q, _ in pairs]
+
+
+def test_stale_snapshot_is_recompiled(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}])
+    first = load_or_compile(str(csv_path), file_signature(str(csv_path)))
+    assert list(first.pairs) == [("hello", "hi")]
+
+    write_faq(str(csv_path), [{"question": "hello", "answer": "hi"}, {"question": "bye", "answer": "see you"}])
+    second = load_or_compile(str(csv_path), file_signature(str(csv_path)))
+    assert second.signature == file_signature(str(csv_path))
+    assert list(second.pairs) == [("hello", "hi"), ("bye", "see you")]
+    assert list(first.pairs) == [("hello", "hi")]  # Mapped readers keep the old file
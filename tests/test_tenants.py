@@ -0,0 +1,71 @@
+"""TenantRegistry: config and footprint checks run off the event loop."""
+
+import asyncio
+import json
+import threading
+
+from app import tenants as tenants_module
+from app.faq_store import write_faq
+from app.tenants import Page, TenantRegistry
+
+
+def write(path, pairs):
+    write_faq(str(path), ({"question": q, "answer": a} for q, a in pairs))
+
+
+def registry(tmp_path):
+    default = Page(None, None, None, None)
+    return TenantRegistry(
+        default, config_path=str(tmp_path / "pages.json"), pages_dir=str(tmp_path / "pages"),
+        check_interval=0,
+    )
+
+
+def configure(tmp_path, *page_ids):
+    for page_id in page_ids:
+        (tmp_path / "pages" / page_id).mkdir(parents=True, exist_ok=True)
+        write(tmp_path / "pages" / page_id / "faq.csv", [("hello", f"hi from {page_id}")])
+    (tmp_path / "pages.json").write_text(json.dumps({p: {"access_token": f"T{p}"} for p in page_ids}))
+
+
+def test_config_is_reread_off_the_event_loop(tmp_path, monkeypatch):
+    configure(tmp_path, "1")
+    tenants = registry(tmp_path)
+    threads = []
+    read = tenants_module.read_pages_config
+
+    def tracked(*args):
+        threads.append(threading.current_thread())
+        return read(*args)
+
+    monkeypatch.setattr(tenants_module, "read_pages_config", tracked)
+
+    async def run():
+        assert (await tenants.get("1")).bot.get_answer("hello") == "hi from 1"
+        configure(tmp_path, "1", "2")
+        page = await tenants.get("2")
+        await tenants.close()
+        return page
+
+    page = asyncio.run(run())
+    assert page.page_id == "2" and page.bot.get_answer("hello") == "hi from 2"
+    assert threads and threading.main_thread() not in threads
+
+
+def test_footprint_follows_faq_reloads(tmp_path):
+    configure(tmp_path, "1")
+    tenants = registry(tmp_path)
+    csv_path = tmp_path / "pages" / "1" / "faq.csv"
+
+    async def run():
+        page = await tenants.get("1")
+        before = tenants.memory
+        write(csv_path, [(f"question {i}", f"answer {i}") for i in range(2000)])
+        page.bot.refresh(force=True)
+        await tenants.get("1")
+        await tenants.close()
+        return page, before
+
+    page, before = asyncio.run(run())
+    assert tenants.memory > before
+    assert tenants.memory == page.footprint == tenants_module.estimate_footprint(page.bot)
@@ -0,0 +1,68 @@
+"""Thai-aware normalization, word segmentation and keyword matching."""
+
+import random
+import unicodedata
+
+from app.ai_engine import AnswerCache, FAQBot
+from app.faq_store import write_faq
+from app.keywords import KeywordIndex
+from app.textnorm import ThaiSegmenter, load_words, normalize_text
+
+WORDS = ["ราคา", "สินค้า", "ส่ง", "จัดส่ง", "ค่า", "ค่าส่ง", "เวลา", "เปิด", "ร้าน"]
+
+
+def test_typing_variants_normalize_to_one_key():
+    assert normalize_text("นํ้า") == normalize_text("น้ำ") == "น้ำ"  # NIKHAHIT + SARA AA
+    assert normalize_text("ค่่า") == "ค่า"  # Tone mark typed twice
+    assert normalize_text("ราคา​สินค้า­") == "ราคาสินค้า"  # Zero-width space, soft hyphen
+    assert normalize_text("Café  MENU\t\n") == "café menu"  # NFC, case, whitespace
+    assert normalize_text("﻿") == ""
+
+
+def test_normalization_is_idempotent():
+    rng = random.Random(18)
+    alphabet = "กขคนราAaé \t่้ําำิ​́"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        once = normalize_text(text)
+        assert normalize_text(once) == once, repr(text)
+        assert unicodedata.is_normalized("NFC", once)
+
+
+def test_longest_dictionary_match_and_unknown_runs():
+    segmenter = ThaiSegmenter(WORDS)
+    assert segmenter.tokenize("ราคาสินค้า") == ["ราคา", "สินค้า"]
+    assert segmenter.tokenize("ค่าจัดส่ง") == ["ค่า", "จัดส่ง"]
+    assert segmenter.tokenize("ค่าส่งกี่บาท") == ["ค่าส่ง", "กี่บาท"]  # Longest word, then an unknown run
+    assert segmenter.tokenize("กขราคา") == ["กข", "ราคา"]
+    assert segmenter.tokenize(normalize_text("ราคา iPhone-15, ร้านเปิด?")) == ["ราคา", "iphone", "15", "ร้าน", "เปิด"]
+    assert segmenter.tokenize("") == []
+
+
+def test_word_list_file(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("# Product names\nไอโฟน\n  ค่่า  # typed twice\n\n", encoding="utf-8")
+    assert load_words(str(path)) == ["ไอโฟน", "ค่า"]
+    segmenter = ThaiSegmenter(load_words(str(path)))
+    assert segmenter.size == 2
+    assert segmenter.tokenize("ค่าไอโฟน") == ["ค่า", "ไอโฟน"]
+
+
+def test_keyword_index_matches_reordered_words():
+    index = KeywordIndex(["ราคาสินค้า", "ค่าส่ง", "ค่าส่งสินค้า", "เวลาเปิดร้าน"], ThaiSegmenter(WORDS))
+    assert index.words("ราคาสินค้าครับ") == frozenset({"ราคา", "สินค้า"})  # Stopword dropped
+    assert index.lookup("สินค้านี้ราคาเท่าไหร่").index == 0
+    assert index.lookup("สินค้านี้ค่าส่งเท่าไหร่") == (2, 2)  # Most specific question wins
+    assert index.lookup("ร้านเปิดกี่โมง") is None  # "เวลา" is missing
+    assert index.lookup("สินค้าค่าส่ง", exclude={2}).index == 1
+
+
+def test_bot_answers_through_normalization_and_keywords(tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    write_faq(str(csv_path), [
+        {"question": "นํ้าราคาเท่าไหร่", "answer": "10 บาท"},
+        {"question": "เวลาเปิดร้าน", "answer": "9 โมง"},
+    ])
+    bot = FAQBot(str(csv_path), check_interval=0, cache=AnswerCache(maxsize=0), keywords=True)
+    assert bot.get_answer("น้ำ​ราคาเท่่าไหร่") == "10 บาท"  # Exact after normalization
+    assert bot.get_answer("ร้านเปิดกี่โมง เวลาไหน") == "9 โมง"  # Keywords in another order
@@ -0,0 +1,326 @@
+"""
+Micro-benchmark of the FAQ matching engine with scaling curves.
+
+Generates synthetic FAQ files (Thai and Latin questions of realistic
+length) from 10 up to 1M entries and measures for each size:
+
+- load time (cold: CSV parsed and indexed/compiled; warm: existing
+  snapshot mapped) and reload time;
+- p50/p99 latency of FAQBot.get_answer() for exact, substring
+  (question inside a longer message, and message inside a question),
+  and miss cases, with the answer cache disabled;
+- memory per entry (Python heap retained by the bot, and snapshot file).
+
+Every timing is taken --repeat times and the median is kept, together
+with its run-to-run spread (<metric>_noise, relative). Results are written
+as JSON. With --baseline the run is compared against an earlier result
+file and exits with status 1 if a median load/reload time, p50 latency or
+memory figure got worse than the threshold plus the measured noise
+allows. p99 latencies are reported but never fail the check: a few hundred
+samples cannot pin the tail down run to run.
+
+Usage:
+    python -m tools.bench_matcher --sizes 10,1000,100000 --output bench.json
+    python -m tools.bench_matcher --baseline bench.json --threshold 0.25
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai_engine import AnswerCache, FAQBot  # noqa: E402
+from app.faq_store import write_faq  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+LOOKUP_CASES = ("exact", "contains_question", "inside_question", "miss")
+
+# Suffix of the relative run-to-run spread stored next to a repeated timing
+NOISE_SUFFIX = "_noise"
+
+# A metric only regresses once it grew by this many times its measured noise
+NOISE_FACTOR = 2.0
+
+# Building blocks of the synthetic questions
+THAI_ONSETS = ["ก", "ข", "ค", "ง", "จ", "ช", "ด", "ต", "ท", "น", "บ", "ป", "พ", "ม", "ย", "ร", "ล", "ว", "ส", "ห", "อ"]
+THAI_VOWELS = ["า", "ิ", "ี", "ุ", "ู", "ะ", "ั", "ำ", "เ", "แ", "โ", "ไ"]
+THAI_CODAS = ["", "", "น", "ง", "ม", "ก", "ด", "บ", "ย"]
+THAI_TEMPLATES = ["{}ราคาเท่าไหร่", "{}ส่งได้ไหม", "มี{}ไหม", "{}ใช้ยังไง", "สั่ง{}ได้ที่ไหน", "{}คืนได้ไหม"]
+LATIN_SYLLABLES = ["ka", "ro", "mi", "tel", "san", "po", "dex", "lu", "ven", "qui", "tor", "ba", "ne", "strum"]
+LATIN_TEMPLATES = [
+    "how much is the {}", "do you ship {} abroad", "can i return the {}",
+    "what sizes does the {} come in", "is the {} in stock", "how do i use the {}",
+]
+FILLER_WORDS = ["please", "thanks", "hello", "สวัสดีครับ", "ขอบคุณค่ะ", "อยากทราบว่า", "หน่อยครับ"]
+
+
+def _thai_word(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(THAI_ONSETS) + rng.choice(THAI_VOWELS) + rng.choice(THAI_CODAS)
+        for _ in range(rng.randint(2, 4))
+    )
+
+
+def _latin_word(rng: random.Random) -> str:
+    return "".join(rng.choice(LATIN_SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def generate_questions(n: int, seed: int = 0) -> List[str]:
+    """
+    Build n distinct synthetic questions, about half Thai (unsegmented) and
+    half Latin, 15-60 characters long like real customer FAQs.
+
+    Args:
+        n (int): Number of questions.
+        seed (int): Random seed, so runs are comparable.
+
+    Returns:
+        List[str]: Questions.
+    """
+    rng = random.Random(seed)
+    questions: List[str] = []
+    seen = set()
+    while len(questions) < n:
+        if rng.random() < 0.5:
+            product = "".join(_thai_word(rng) for _ in range(rng.randint(1, 2)))
+            question = rng.choice(THAI_TEMPLATES).format(product)
+        else:
+            product = " ".join(_latin_word(rng) for _ in range(rng.randint(1, 3)))
+            question = rng.choice(LATIN_TEMPLATES).format(product)
+        if question not in seen:
+            seen.add(question)
+            questions.append(question)
+    return questions
+
+
+def lookup_messages(questions: List[str], count: int, seed: int = 1) -> Dict[str, List[str]]:
+    """
+    Messages for each lookup case.
+
+    Args:
+        questions (List[str]): Questions of the FAQ.
+        count (int): Messages per case.
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, List[str]]: Case name -> messages.
+    """
+    rng = random.Random(seed)
+    picks = [rng.choice(questions) for _ in range(count)]
+    misses = []
+    for _ in range(count):
+        # Out-of-vocabulary words: no question contains them and they contain no question
+        misses.append(" ".join("zq" + _latin_word(rng) for _ in range(rng.randint(2, 5))))
+    inside = []
+    for q in picks:
+        start = rng.randint(0, max(0, len(q) - 8))
+        inside.append(q[start:start + rng.randint(6, 12)])
+    return {
+        "exact": [f"  {q.upper()} " if rng.random() < 0.5 else q for q in picks],
+        "contains_question": [f"{rng.choice(FILLER_WORDS)} {q} {rng.choice(FILLER_WORDS)}" for q in picks],
+        "inside_question": inside,
+        "miss": misses,
+    }
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def timed(fn) -> Tuple[float, object]:
+    """Run fn() and return (seconds, result)."""
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def summarize(results: Dict[str, float], name: str, values: List[float]) -> None:
+    """Store the median of repeated measurements and their relative spread."""
+    median = statistics.median(values)
+    results[name] = median
+    results[name + NOISE_SUFFIX] = (max(values) - min(values)) / median if median > 0 else 0.0
+
+
+def bench_size(n: int, mode: str, lookups: int, ranked: bool, workdir: str, repeat: int = 5) -> Dict[str, float]:
+    """
+    Benchmark one FAQ size in one mode.
+
+    Args:
+        n (int): Number of FAQ entries.
+        mode (str): "snapshot" (memory-mapped) or "memory".
+        lookups (int): Messages timed per lookup case and round.
+        ranked (bool): Enable the ranked fuzzy fallback.
+        workdir (str): Scratch directory.
+        repeat (int): Rounds of every timing; the median is reported.
+
+    Returns:
+        Dict[str, float]: Metric name -> value (seconds, bytes or counts).
+    """
+    directory = tempfile.mkdtemp(dir=workdir)
+    csv_path = os.path.join(directory, "faq.csv")
+    questions = generate_questions(n)
+    write_faq(csv_path, ({"question": q, "answer": f"answer {i}"} for i, q in enumerate(questions)))
+    use_snapshot = mode == "snapshot"
+    repeat = max(1, repeat)
+
+    def make_bot() -> FAQBot:
+        return FAQBot(csv_path, cache=AnswerCache(maxsize=0), use_snapshot=use_snapshot, ranked=ranked)
+
+    def cold_bot() -> Tuple[float, FAQBot]:
+        if use_snapshot:
+            for path in glob.glob(csv_path + ".snap*"):
+                os.remove(path)  # Compile the snapshot again
+        return timed(make_bot)
+
+    cold = []
+    for _ in range(repeat):
+        bot = None  # Drop the previous round's bot before building the next
+        seconds, bot = cold_bot()
+        cold.append(seconds)
+    results = {
+        "entries": n,
+        "snapshot_bytes_per_entry": bot.stats()["mapped_bytes"] / n,
+    }
+    summarize(results, "load_cold_s", cold)
+    if use_snapshot:
+        summarize(results, "load_warm_s", [timed(make_bot)[0] for _ in range(repeat)])
+    summarize(results, "reload_s", [timed(bot.load_data)[0] for _ in range(repeat)])
+
+    # Heap retained by a bot, measured on a separate (untimed) build since
+    # tracing slows allocation down considerably
+    gc.collect()
+    tracemalloc.start()
+    traced = make_bot()
+    results["heap_bytes_per_entry"] = tracemalloc.get_traced_memory()[0] / n
+    tracemalloc.stop()
+    del traced
+
+    cases = lookup_messages(questions, lookups)
+    for messages in cases.values():
+        for message in messages[:50]:
+            bot.get_answer(message)  # Warm up
+    rounds: Dict[str, List[List[float]]] = {case: [] for case in cases}
+    for _ in range(repeat):
+        # Cases interleaved per round, so a noisy moment hits all of them alike
+        for case, messages in cases.items():
+            samples = []
+            for message in messages:
+                started = time.perf_counter()
+                bot.get_answer(message)
+                samples.append(time.perf_counter() - started)
+            rounds[case].append(samples)
+    for case, samples_per_round in rounds.items():
+        summarize(results, f"{case}_p50_s", [percentile(samples, 50) for samples in samples_per_round])
+        summarize(results, f"{case}_p99_s", [percentile(samples, 99) for samples in samples_per_round])
+
+    del bot
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, floor: float) -> Tuple[List[str], List[str]]:
+    """
+    Find metrics that regressed against a baseline run.
+
+    A metric regresses when it grew by more than threshold (relative) plus
+    NOISE_FACTOR times the larger run-to-run spread of the two runs, and
+    for timings also by more than floor seconds. p99 latencies
+    are only reported: they are too noisy to fail a run on.
+
+    Returns:
+        Tuple[List[str], List[str]]: Regressions, and p99 growth beyond the
+            threshold (informational), one line each.
+    """
+    regressions, tail = [], []
+    for key, metrics in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            continue
+        for name, value in metrics.items():
+            before = old.get(name)
+            if name == "entries" or name.endswith(NOISE_SUFFIX) or not before:
+                continue
+            grew = value - before
+            noise = max(metrics.get(name + NOISE_SUFFIX, 0.0), old.get(name + NOISE_SUFFIX, 0.0))
+            allowed = threshold + NOISE_FACTOR * noise
+            if value <= before * (1 + allowed) or (name.endswith("_s") and grew <= floor):
+                continue
+            line = f"{key} {name}: {before:.6g} -> {value:.6g} (+{grew / before:.0%}, allowed +{allowed:.0%})"
+            (tail if name.endswith("_p99_s") else regressions).append(line)
+    return regressions, tail
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FAQBot loading and matching.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated FAQ sizes (up to 1000000)")
+    parser.add_argument("--modes", default="snapshot,memory", help="snapshot and/or memory")
+    parser.add_argument("--lookups", type=int, default=2000, help="Messages timed per lookup case and round")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds of every timing (median reported)")
+    parser.add_argument("--ranked", action="store_true", help="Enable ranked fuzzy matching")
+    parser.add_argument("--output", default="bench_results.json", help="JSON result file")
+    parser.add_argument("--baseline", help="Earlier result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--floor", type=float, default=2e-5, help="Ignore timing changes below this (seconds)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    modes = [m for m in args.modes.split(",") if m]
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "ranked": args.ranked,
+        "lookups": args.lookups,
+        "repeat": args.repeat,
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="faq-bench-")
+    try:
+        for mode in modes:
+            for n in sizes:
+                metrics = bench_size(n, mode, args.lookups, args.ranked, workdir, args.repeat)
+                report["results"][f"{mode}/{n}"] = metrics
+                print(
+                    f"{mode:8} {n:>8}  load {metrics['load_cold_s']:8.3f}s  reload {metrics['reload_s']:8.3f}s  "
+                    + "  ".join(f"{case} p50/p99 {metrics[case + '_p50_s'] * 1e6:.0f}/{metrics[case + '_p99_s'] * 1e6:.0f}us"
+                                for case in LOOKUP_CASES)
+                    + f"  heap {metrics['heap_bytes_per_entry']:.0f} B/entry",
+                    flush=True,
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, tail = compare(report, baseline, args.threshold, args.floor)
+        for line in tail:
+            print("p99 (not gated)", line)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Local stand-in for the Messenger Graph API send endpoint, for load tests.
+
+Accepts POST /{version}/me/messages like graph.facebook.com, after an
+artificial latency, and injects throttling (429 with Retry-After) and
+server errors (500) at configurable rates. Images sent by URL cost an
+extra fetch latency (Facebook downloads them); POST
+/{version}/me/message_attachments uploads an image once and returns an
+attachment_id that later messages can reference instead. Point the app at it with
+
+    FB_API_URL=http://127.0.0.1:8900/v21.0/me/messages
+
+Run standalone with `python -m tools.fake_graph`, or embed FakeGraphAPI in
+a load generator (tools.loadgen) to be told about every delivered reply.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Graph API error bodies, as returned by Facebook
+THROTTLED_ERROR = {"error": {"message": "(#613) Calls to this api have exceeded the rate limit.", "code": 613}}
+SERVER_ERROR = {"error": {"message": "An unexpected error has occurred.", "code": 2, "is_transient": True}}
+UNKNOWN_ATTACHMENT_ERROR = {"error": {"message": "(#100) No matching attachment found", "code": 100}}
+
+
+def image_source(message: dict) -> Optional[str]:
+    """How a message carries its image: "url", "attachment_id", or None for no image."""
+    attachment = message.get("attachment")
+    payload = attachment.get("payload", {}) if isinstance(attachment, dict) else {}
+    if "attachment_id" in payload:
+        return "attachment_id"
+    return "url" if "url" in payload else None
+
+
+class FakeGraphAPI:
+    """
+    Fake Graph API send endpoint with latency and fault injection.
+
+    Features:
+    - Latency drawn uniformly from latency +/- jitter seconds.
+    - 429 responses with a Retry-After header at throttle_rate.
+    - 500 responses at error_rate.
+    - fetch_latency added to every image given by URL (sends and uploads).
+    - 400 for messages referencing an attachment_id it never issued.
+    - Counters of requests, deliveries, uploads and injected faults.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        fetch_latency: float = 0.2,
+        on_delivery: Optional[Callable[[str, dict, float], None]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            latency (float): Mean response time in seconds.
+            jitter (float): Maximum deviation from the mean in seconds.
+            error_rate (float): Share of requests answered with 500.
+            throttle_rate (float): Share of requests answered with 429.
+            retry_after (float): Retry-After seconds sent with a 429.
+            fetch_latency (float): Extra seconds to "download" an image given by URL.
+            on_delivery (Optional[Callable]): Called with (recipient id,
+                message, time.monotonic()) for every accepted message.
+            seed (Optional[int]): Random seed for reproducible fault patterns.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.fetch_latency = fetch_latency
+        self.on_delivery = on_delivery
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.attachments = {}  # attachment_id -> uploaded URL
+
+        self.requests = 0
+        self.delivered = 0
+        self.uploads = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.errors = 0
+        self.app = self._build_app()
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Graph API")
+
+        @app.post("/{version}/me/messages")
+        async def send_message(version: str, request: Request):
+            return await self.handle(await request.json())
+
+        @app.post("/{version}/me/message_attachments")
+        async def upload_attachment(version: str, request: Request):
+            return await self.handle(await request.json(), upload=True)
+
+        @app.get("/stats")
+        async def get_stats():
+            return self.stats()
+
+        return app
+
+    async def handle(self, payload: dict, upload: bool = False) -> JSONResponse:
+        """
+        Answer one send or upload request like the Graph API would.
+
+        Args:
+            payload (dict): Message payload ({"recipient": ..., "message": ...}).
+            upload (bool): Attachment upload instead of a send.
+
+        Returns:
+            JSONResponse: 200 with message_id (attachment_id for an upload),
+                400 for an unknown attachment_id, or an injected 429/500.
+        """
+        self.requests += 1
+        message = payload.get("message", {})
+        source = image_source(message)
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if source == "url":
+            delay += self.fetch_latency
+        if delay:
+            await asyncio.sleep(delay)
+
+        draw = self._random.random()
+        if draw < self.throttle_rate:
+            self.throttled += 1
+            return JSONResponse(THROTTLED_ERROR, status_code=429, headers={"Retry-After": f"{self.retry_after:g}"})
+        if draw < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return JSONResponse(SERVER_ERROR, status_code=500)
+
+        if upload:
+            attachment_id = str(next(self._ids))
+            self.attachments[attachment_id] = message.get("attachment", {}).get("payload", {}).get("url")
+            self.uploads += 1
+            return JSONResponse({"attachment_id": attachment_id})
+        if source == "attachment_id" and message["attachment"]["payload"]["attachment_id"] not in self.attachments:
+            self.rejected += 1
+            return JSONResponse(UNKNOWN_ATTACHMENT_ERROR, status_code=400)
+
+        recipient_id = str(payload.get("recipient", {}).get("id", ""))
+        self.delivered += 1
+        if self.on_delivery is not None:
+            self.on_delivery(recipient_id, message, time.monotonic())
+        return JSONResponse({"recipient_id": recipient_id, "message_id": f"m_fake_{next(self._ids)}"})
+
+    def stats(self) -> dict:
+        """Request and fault counters."""
+        return {
+            "requests": self.requests,
+            "delivered": self.delivered,
+            "uploads": self.uploads,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the fake Graph API options to a command-line parser."""
+    parser.add_argument("--graph-host", default="127.0.0.1", help="Fake Graph API host")
+    parser.add_argument("--graph-port", type=int, default=8900, help="Fake Graph API port")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="Mean send latency (seconds)")
+    parser.add_argument("--graph-jitter", type=float, default=0.02, help="Send latency jitter (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of sends answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of sends answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of a 429 (seconds)")
+    parser.add_argument("--fetch-latency", type=float, default=0.2, help="Extra latency of an image sent by URL (seconds)")
+
+
+def from_arguments(args: argparse.Namespace, on_delivery=None) -> FakeGraphAPI:
+    """Create a FakeGraphAPI from parsed add_arguments() options."""
+    return FakeGraphAPI(
+        latency=args.graph_latency,
+        jitter=args.graph_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        fetch_latency=args.fetch_latency,
+        on_delivery=on_delivery,
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake Messenger Graph API for load tests.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    fake = from_arguments(args)
+    print(f"Set FB_API_URL=http://{args.graph_host}:{args.graph_port}/v21.0/me/messages")
+    uvicorn.run(fake.app, host=args.graph_host, port=args.graph_port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+End-to-end load generator for the webhook → FAQBot → Graph API path.
+
+Posts Messenger webhook payloads (batched entry[].messaging[] events, like
+Facebook delivers them under load) to a running app at a fixed target rate,
+and runs a fake Graph API (tools.fake_graph) in the same process to receive
+the replies. Reply latency is measured from the webhook POST to the moment
+the fake Graph API accepts the reply, so it covers queueing, matching, send
+scheduling and retries.
+
+Start the app against the fake Graph API first, e.g.
+
+    FB_API_URL=http://127.0.0.1:8900/v21.0/me/messages FB_SEND_RATE=1000 \\
+        uvicorn app.main:app --port 8000
+
+then run
+
+    python -m tools.loadgen --rate 200 --duration 30 --batch 5
+
+Messages are sent open-loop (on schedule, whatever the app's response
+time), so a saturated app shows up as growing latency rather than a lower
+offered rate. The send scheduler's FB_SEND_RATE caps replies per second;
+raise it to measure the app's own ceiling.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.faq_store import read_faq_pairs  # noqa: E402
+from tools import fake_graph  # noqa: E402
+
+DEFAULT_FAQ = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "faq.csv")
+PAGE_ID = "load-test-page"
+FILLER_WORDS = ["สวัสดีครับ", "ขอบคุณค่ะ", "อยากทราบว่า", "หน่อยครับ", "hello", "please", "thanks"]
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of samples, None if empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def message_texts(faq_path: str, count: int, miss_rate: float, rng: random.Random) -> List[str]:
+    """
+    Build a pool of realistic user messages from the FAQ questions.
+
+    Messages are the questions themselves, questions wrapped in greetings
+    (partial matches), and at miss_rate texts no question matches.
+
+    Args:
+        faq_path (str): FAQ CSV file.
+        count (int): Pool size.
+        miss_rate (float): Share of messages without an FAQ match.
+        rng (random.Random): Random source.
+
+    Returns:
+        List[str]: Messages.
+    """
+    try:
+        questions = [q for q, _ in read_faq_pairs(faq_path) if q.strip()]
+    except FileNotFoundError:
+        questions = []
+    texts = []
+    for _ in range(count):
+        if not questions or rng.random() < miss_rate:
+            texts.append(" ".join(f"zq{rng.randrange(10 ** 6)}" for _ in range(rng.randint(2, 5))))
+        elif rng.random() < 0.5:
+            texts.append(rng.choice(questions))
+        else:
+            texts.append(f"{rng.choice(FILLER_WORDS)} {rng.choice(questions)} {rng.choice(FILLER_WORDS)}")
+    return texts
+
+
+def webhook_payload(events: List[Tuple[str, str]], mids) -> dict:
+    """
+    Messenger webhook body for a batch of (sender id, text) events.
+
+    Facebook may put several messaging events in one entry and several
+    entries in one request; the batch is split across up to two entries.
+
+    Args:
+        events (List[Tuple[str, str]]): Messages in order.
+        mids: Iterator of unique message id numbers.
+
+    Returns:
+        dict: Webhook JSON body.
+    """
+    now_ms = int(time.time() * 1000)
+    messaging = [
+        {
+            "sender": {"id": sender_id},
+            "recipient": {"id": PAGE_ID},
+            "timestamp": now_ms,
+            "message": {"mid": f"m_load_{next(mids)}", "text": text},
+        }
+        for sender_id, text in events
+    ]
+    split = (len(messaging) + 1) // 2
+    entries = [messaging[:split], messaging[split:]] if len(messaging) > 1 else [messaging]
+    return {
+        "object": "page",
+        "entry": [{"id": PAGE_ID, "time": now_ms, "messaging": chunk} for chunk in entries],
+    }
+
+
+class ReplyTracker:
+    """
+    Match replies seen by the fake Graph API to the messages that caused them.
+
+    The app answers each sender's messages in arrival order, so replies are
+    matched first-in first-out per sender.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Dict[str, Deque[float]] = {}  # Sender -> send times of unanswered messages
+        self.latencies: List[float] = []
+        self.kind_latencies: Dict[str, List[float]] = {}  # "text", "image_url" or "image_attachment_id"
+        self.unexpected = 0
+        self.first_reply: Optional[float] = None
+        self.last_reply: Optional[float] = None
+
+    def expect(self, sender_id: str, sent_at: float) -> None:
+        """Register a message that should get one reply."""
+        self.pending.setdefault(sender_id, deque()).append(sent_at)
+
+    def cancel(self, sender_id: str, sent_at: float) -> None:
+        """Forget a message the webhook did not accept."""
+        queue = self.pending.get(sender_id)
+        if queue and sent_at in queue:
+            queue.remove(sent_at)
+
+    def delivered(self, recipient_id: str, message: dict, at: float) -> None:
+        """FakeGraphAPI on_delivery callback."""
+        queue = self.pending.get(recipient_id)
+        if not queue:
+            self.unexpected += 1
+            return
+        latency = at - queue.popleft()
+        self.latencies.append(latency)
+        source = fake_graph.image_source(message)
+        self.kind_latencies.setdefault(f"image_{source}" if source else "text", []).append(latency)
+        if self.first_reply is None:
+            self.first_reply = at
+        self.last_reply = at
+
+    def outstanding(self) -> int:
+        """Messages still waiting for a reply."""
+        return sum(len(q) for q in self.pending.values())
+
+
+class LoadGenerator:
+    """
+    Open-loop webhook traffic at a target message rate.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        tracker: ReplyTracker,
+        texts: List[str],
+        senders: int,
+        rng: random.Random,
+    ) -> None:
+        """
+        Args:
+            client (httpx.AsyncClient): Client for the app.
+            url (str): Webhook URL of the app.
+            tracker (ReplyTracker): Receives the expected replies.
+            texts (List[str]): Message pool.
+            senders (int): Number of distinct simulated users.
+            rng (random.Random): Random source.
+        """
+        self.client = client
+        self.url = url
+        self.tracker = tracker
+        self.texts = texts
+        self.sender_ids = [f"load-user-{i}" for i in range(max(1, senders))]
+        self.rng = rng
+        self._mids = itertools.count(1)
+
+        self.messages = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.ack_latencies: List[float] = []
+
+    async def _post(self, events: List[Tuple[str, str]]) -> None:
+        """Post one webhook request and record its acknowledgement time."""
+        payload = webhook_payload(events, self._mids)
+        sent_at = time.monotonic()
+        for sender_id, _ in events:
+            self.tracker.expect(sender_id, sent_at)
+        try:
+            res = await self.client.post(self.url, json=payload)
+            ok = res.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        self.requests += 1
+        if ok:
+            self.ack_latencies.append(time.monotonic() - sent_at)
+            self.messages += len(events)
+        else:
+            self.failed_requests += 1
+            for sender_id, _ in events:
+                self.tracker.cancel(sender_id, sent_at)
+
+    async def run(self, rate: float, duration: float, batch: int) -> float:
+        """
+        Send batches of messages on a fixed schedule.
+
+        Args:
+            rate (float): Target messages per second.
+            duration (float): Seconds to generate traffic for.
+            batch (int): Messaging events per webhook request.
+
+        Returns:
+            float: Monotonic start time.
+        """
+        interval = batch / rate
+        tasks = set()
+        started = time.monotonic()
+        for k in itertools.count():
+            due = started + k * interval
+            if due - started >= duration:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            events = [(self.rng.choice(self.sender_ids), self.rng.choice(self.texts)) for _ in range(batch)]
+            task = asyncio.create_task(self._post(events))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        return started
+
+
+async def start_fake_graph(fake: fake_graph.FakeGraphAPI, host: str, port: int):
+    """Serve the fake Graph API in this event loop; returns (server, task)."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(fake.app, host=host, port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Raises the start-up error, e.g. port in use
+            raise RuntimeError("Fake Graph API stopped during start-up")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 2)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Run one load test and return the report."""
+    rng = random.Random(args.seed)
+    tracker = ReplyTracker()
+    fake = fake_graph.from_arguments(args, on_delivery=tracker.delivered)
+    server, server_task = await start_fake_graph(fake, args.graph_host, args.graph_port)
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.target, timeout=30, limits=limits) as client:
+        try:
+            await client.get("/stats")
+        except httpx.HTTPError as e:
+            server.should_exit = True
+            await server_task
+            raise SystemExit(f"App not reachable at {args.target}: {e}")
+
+        generator = LoadGenerator(
+            client, "/webhook", tracker, message_texts(args.faq, 1000, args.miss_rate, rng), args.senders, rng,
+        )
+        started = await generator.run(args.rate, args.duration, args.batch)
+        generated = time.monotonic() - started
+
+        # Wait for the remaining replies
+        deadline = time.monotonic() + args.drain
+        while tracker.outstanding() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        try:
+            app_stats = (await client.get("/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            app_stats = None
+
+    server.should_exit = True
+    await server_task
+
+    replies = len(tracker.latencies)
+    reply_span = (tracker.last_reply - started) if tracker.last_reply is not None else 0.0
+    return {
+        "config": {
+            "target": args.target,
+            "rate": args.rate,
+            "duration": args.duration,
+            "batch": args.batch,
+            "senders": args.senders,
+            "graph_latency": args.graph_latency,
+            "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate,
+            "fetch_latency": args.fetch_latency,
+        },
+        "webhook": {
+            "messages": generator.messages,
+            "requests": generator.requests,
+            "failed_requests": generator.failed_requests,
+            "offered_rate": round(generator.messages / generated, 2) if generated else None,
+            "ack_p50_ms": _ms(percentile(generator.ack_latencies, 50)),
+            "ack_p99_ms": _ms(percentile(generator.ack_latencies, 99)),
+        },
+        "replies": {
+            "delivered": replies,
+            "unanswered": tracker.outstanding(),
+            "unexpected": tracker.unexpected,
+            "throughput": round(replies / reply_span, 2) if reply_span else None,
+            "p50_ms": _ms(percentile(tracker.latencies, 50)),
+            "p90_ms": _ms(percentile(tracker.latencies, 90)),
+            "p99_ms": _ms(percentile(tracker.latencies, 99)),
+            "max_ms": _ms(max(tracker.latencies) if tracker.latencies else None),
+            "by_kind": {
+                kind: {
+                    "delivered": len(samples),
+                    "p50_ms": _ms(percentile(samples, 50)),
+                    "p99_ms": _ms(percentile(samples, 99)),
+                }
+                for kind, samples in sorted(tracker.kind_latencies.items())
+            },
+        },
+        "graph_api": fake.stats(),
+        "app": app_stats,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the webhook → reply path of a running app.")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="Base URL of the running app")
+    parser.add_argument("--rate", type=float, default=50, help="Target messages per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of traffic")
+    parser.add_argument("--batch", type=int, default=1, help="Messaging events per webhook request")
+    parser.add_argument("--senders", type=int, default=500, help="Distinct simulated users")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Share of messages without an FAQ match")
+    parser.add_argument("--faq", default=DEFAULT_FAQ, help="FAQ CSV to draw questions from")
+    parser.add_argument("--connections", type=int, default=50, help="Concurrent webhook connections")
+    parser.add_argument("--drain", type=float, default=30, help="Seconds to wait for replies after the run")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    fake_graph.add_arguments(parser)
+    args = parser.parse_args()
+    if args.rate <= 0 or args.batch < 1:
+        parser.error("--rate must be positive and --batch at least 1")
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0 if report["replies"]["unanswered"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Replay captured webhook traffic (app/capture.py) against a running app.
+
+Reads one or more capture files (or directories of them, rotated files
+included), posts the webhook payloads to the app in their original order
+and spacing divided by --speed, and compares every reply with the answer
+captured for the same message. Replies are received by a fake Graph API
+(tools.fake_graph) run in this process, like tools.loadgen.
+
+Start the app against the fake Graph API, e.g.
+
+    FB_API_URL=http://127.0.0.1:8900/v21.0/me/messages FB_SEND_RATE=1000 \\
+        uvicorn app.main:app --port 8000
+
+then run
+
+    python -m tools.replay data/capture --speed 10
+
+Message ids are given a per-run suffix so the app does not drop the
+replayed events as redeliveries. The command exits with status 1 if any
+answer changed or a reply is missing.
+"""
+
+import argparse
+import asyncio
+import copy
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import fake_graph  # noqa: E402
+from tools.loadgen import _ms, percentile, start_fake_graph  # noqa: E402
+
+IMAGE_PREFIX = "[[IMAGE:"
+IMAGE_SUFFIX = "]]"
+
+# Changed answers listed in the report
+MAX_CHANGES = 20
+
+
+def capture_files(paths: List[str]) -> List[str]:
+    """Capture files named by paths; a directory stands for all its capture files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl*"))))
+        else:
+            files.append(path)
+    return files
+
+
+def read_capture(files: List[str]) -> Tuple[List[Tuple[float, dict]], Dict[str, str], int]:
+    """
+    Load capture records from files.
+
+    Args:
+        files (List[str]): Capture files, in any order.
+
+    Returns:
+        Tuple: (timestamp, webhook payload) in time order, mid -> captured
+            answer, and the number of unreadable lines.
+    """
+    webhooks: List[Tuple[float, dict]] = []
+    answers: Dict[str, str] = {}
+    bad = 0
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    kind = record["type"]
+                    if kind == "webhook":
+                        webhooks.append((float(record["ts"]), record["payload"]))
+                    elif kind == "answer" and record.get("mid"):
+                        answers[record["mid"]] = record["answer"]
+                except (ValueError, KeyError, TypeError):
+                    bad += 1
+    webhooks.sort(key=lambda item: item[0])
+    return webhooks, answers, bad
+
+
+def text_events(payload: dict) -> Iterator[dict]:
+    """Messaging events of a payload that the app answers (sender and text present)."""
+    for entry in payload.get("entry", []):
+        for event in entry.get("messaging", []):
+            if event.get("sender", {}).get("id") and event.get("message", {}).get("text"):
+                yield event
+
+
+def delivered_answer(message: dict, fake: fake_graph.FakeGraphAPI) -> str:
+    """A delivered reply written like an FAQ answer ([[IMAGE: <url>]] for images)."""
+    payload = (message.get("attachment") or {}).get("payload", {})
+    source = fake_graph.image_source(message)
+    if source == "url":
+        return f"{IMAGE_PREFIX} {payload['url']}{IMAGE_SUFFIX}"
+    if source == "attachment_id":
+        return f"{IMAGE_PREFIX} {fake.attachments.get(payload['attachment_id'])}{IMAGE_SUFFIX}"
+    return message.get("text", "")
+
+
+def same_answer(before: str, after: str) -> bool:
+    """Compare answers, ignoring the spacing inside an [[IMAGE: ...]] marker."""
+    if before.startswith(IMAGE_PREFIX) and after.startswith(IMAGE_PREFIX):
+        before, after = before.replace(" ", ""), after.replace(" ", "")
+    return before == after
+
+
+class ReplayTracker:
+    """
+    Pair replies with the replayed messages and compare the answers.
+
+    The app answers each sender in order, but a sender's messages can still
+    be answered out of order across worker processes, so a reply is paired
+    with the sender's oldest pending message whose captured answer it
+    matches, and only otherwise with the oldest pending message.
+    """
+
+    def __init__(self, answers: Dict[str, str]) -> None:
+        """
+        Args:
+            answers (Dict[str, str]): Captured answer per original message id.
+        """
+        self.answers = answers
+        self.fake: Optional[fake_graph.FakeGraphAPI] = None
+        self.pending: Dict[str, Deque[Tuple[str, str, float]]] = {}  # Sender -> (mid, text, sent at)
+        self.latencies: List[float] = []
+        self.same = 0
+        self.changes: List[dict] = []
+        self.changed = 0
+        self.uncaptured = 0  # Replies to messages without a captured answer
+        self.unexpected = 0
+
+    def expect(self, sender_id: str, mid: str, text: str, sent_at: float) -> None:
+        """Register a replayed message that should get one reply."""
+        self.pending.setdefault(sender_id, deque()).append((mid, text, sent_at))
+
+    def cancel(self, sender_id: str, sent_at: float) -> None:
+        """Forget the messages of a webhook request the app did not accept."""
+        queue = self.pending.get(sender_id)
+        if queue:
+            self.pending[sender_id] = deque(item for item in queue if item[2] != sent_at)
+
+    def delivered(self, recipient_id: str, message: dict, at: float) -> None:
+        """FakeGraphAPI on_delivery callback."""
+        queue = self.pending.get(recipient_id)
+        if not queue:
+            self.unexpected += 1
+            return
+        after = delivered_answer(message, self.fake)
+        for i, (mid, _, _) in enumerate(queue):
+            before = self.answers.get(mid)
+            if before is not None and same_answer(before, after):
+                break
+        else:
+            i = 0
+        mid, text, sent_at = queue[i]
+        del queue[i]
+        self.latencies.append(at - sent_at)
+        before = self.answers.get(mid)
+        if before is None:
+            self.uncaptured += 1
+            return
+        if same_answer(before, after):
+            self.same += 1
+            return
+        self.changed += 1
+        if len(self.changes) < MAX_CHANGES:
+            self.changes.append({"mid": mid, "text": text, "before": before, "after": after})
+
+    def outstanding(self) -> int:
+        """Messages still waiting for a reply."""
+        return sum(len(q) for q in self.pending.values())
+
+
+async def replay(
+    client: httpx.AsyncClient, tracker: ReplayTracker, webhooks: List[Tuple[float, dict]], speed: float, suffix: str,
+) -> Tuple[int, int, float]:
+    """
+    Post the captured payloads on their original schedule divided by speed.
+    A request waits for the acknowledgement of earlier requests from the
+    same senders, so their messages reach the app in the captured order.
+
+    Returns:
+        Tuple[int, int, float]: Requests posted, requests failed, seconds taken.
+    """
+    tasks = set()
+    failed = 0
+    seen = set()  # Redeliveries in the capture are dropped by the app again
+
+    last: Dict[str, asyncio.Task] = {}  # Sender -> latest request with a message from them
+
+    async def post(payload: dict, earlier: List[asyncio.Task]) -> None:
+        nonlocal failed
+        if earlier:
+            await asyncio.gather(*earlier, return_exceptions=True)
+        sent_at = time.monotonic()
+        senders = []
+        for event in text_events(payload):
+            mid = event["message"].get("mid") or ""
+            sender_id = event["sender"]["id"]
+            if mid:
+                event["message"]["mid"] = mid + suffix
+                if mid in seen:
+                    continue
+                seen.add(mid)
+            tracker.expect(sender_id, mid, event["message"]["text"], sent_at)
+            senders.append(sender_id)
+        try:
+            ok = (await client.post("/webhook", json=payload)).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if not ok:
+            failed += 1
+            for sender_id in senders:
+                tracker.cancel(sender_id, sent_at)
+
+    started = time.monotonic()
+    first = webhooks[0][0] if webhooks else 0.0
+    for ts, payload in webhooks:
+        if speed > 0:
+            delay = started + (ts - first) / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        senders = {event["sender"]["id"] for event in text_events(payload)}
+        earlier = [last[s] for s in senders if s in last and not last[s].done()]
+        task = asyncio.create_task(post(copy.deepcopy(payload), earlier))
+        for sender_id in senders:
+            last[sender_id] = task
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return len(webhooks), failed, time.monotonic() - started
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Replay the capture and return the report."""
+    files = capture_files(args.paths)
+    webhooks, answers, bad = read_capture(files)
+    if args.limit:
+        webhooks = webhooks[:args.limit]
+    if not webhooks:
+        raise SystemExit("No webhook records found in " + ", ".join(args.paths))
+
+    tracker = ReplayTracker(answers)
+    fake = fake_graph.from_arguments(args, on_delivery=tracker.delivered)
+    tracker.fake = fake
+    server, server_task = await start_fake_graph(fake, args.graph_host, args.graph_port)
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.target, timeout=30, limits=limits) as client:
+        try:
+            await client.get("/stats")
+        except httpx.HTTPError as e:
+            server.should_exit = True
+            await server_task
+            raise SystemExit(f"App not reachable at {args.target}: {e}")
+
+        requests, failed, took = await replay(client, tracker, webhooks, args.speed, f".replay{int(time.time())}")
+        deadline = time.monotonic() + args.drain
+        while tracker.outstanding() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    server.should_exit = True
+    await server_task
+
+    original = webhooks[-1][0] - webhooks[0][0]
+    return {
+        "capture": {
+            "files": len(files),
+            "webhooks": len(webhooks),
+            "answers": len(answers),
+            "unreadable_lines": bad,
+            "span_seconds": round(original, 3),
+        },
+        "replay": {
+            "speed": args.speed,
+            "requests": requests,
+            "failed_requests": failed,
+            "seconds": round(took, 3),
+        },
+        "answers": {
+            "same": tracker.same,
+            "changed": tracker.changed,
+            "uncaptured": tracker.uncaptured,
+            "missing": tracker.outstanding(),
+            "unexpected": tracker.unexpected,
+        },
+        "latency": {
+            "p50_ms": _ms(percentile(tracker.latencies, 50)),
+            "p99_ms": _ms(percentile(tracker.latencies, 99)),
+        },
+        "changes": tracker.changes,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured webhook traffic and compare the answers.")
+    parser.add_argument("paths", nargs="+", help="Capture files or directories (WEBHOOK_CAPTURE_DIR)")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="Base URL of the running app")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up over the original timing (0: as fast as possible)")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N webhook requests")
+    parser.add_argument("--connections", type=int, default=50, help="Concurrent webhook connections")
+    parser.add_argument("--drain", type=float, default=30, help="Seconds to wait for replies after the replay")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    fake_graph.add_arguments(parser)
+    args = parser.parse_args()
+    if args.speed < 0:
+        parser.error("--speed must not be negative")
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    answers = report["answers"]
+    return 1 if answers["changed"] or answers["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())